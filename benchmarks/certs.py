@@ -0,0 +1,77 @@
+"""Throw-away certificate authority for the loopback benchmarks
+
+Requires the ``cryptography`` package, which is already installed as
+a dependency of paramiko.
+"""
+import datetime
+import os
+import tempfile
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+
+def _name(common_name):
+    return x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, common_name)])
+
+
+def _issue(subject, key, issuer, issuer_key, is_ca):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    builder = (
+        x509.CertificateBuilder()
+        .subject_name(_name(subject))
+        .issuer_name(_name(issuer))
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=30))
+        .add_extension(x509.BasicConstraints(ca=is_ca, path_length=None), True)
+    )
+    if not is_ca:
+        builder = builder.add_extension(
+            x509.SubjectAlternativeName([x509.DNSName("localhost")]), False
+        )
+    return builder.sign(issuer_key, hashes.SHA256())
+
+
+def _write(directory, name, data):
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def make_certs(directory=None):
+    """Create a CA plus a server and a client certificate signed by it
+
+    :return: dict with paths for ``ca``, ``server_cert``,
+             ``server_key``, ``client_cert`` and ``client_key``
+    """
+    directory = directory or tempfile.mkdtemp(prefix="netconf-bench-")
+    ca_key = ec.generate_private_key(ec.SECP256R1())
+    ca_cert = _issue("bench-ca", ca_key, "bench-ca", ca_key, True)
+    paths = {
+        "ca": _write(
+            directory, "ca.pem", ca_cert.public_bytes(serialization.Encoding.PEM)
+        )
+    }
+    for role in ("server", "client"):
+        key = ec.generate_private_key(ec.SECP256R1())
+        cert = _issue(role, key, "bench-ca", ca_key, False)
+        paths[role + "_cert"] = _write(
+            directory,
+            role + ".pem",
+            cert.public_bytes(serialization.Encoding.PEM),
+        )
+        paths[role + "_key"] = _write(
+            directory,
+            role + ".key",
+            key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption(),
+            ),
+        )
+    return paths
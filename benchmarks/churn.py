@@ -0,0 +1,88 @@
+"""Connect/close churn against NetconfSimulator, tracking leaked resources
+
+Opens and closes sessions in a loop and reports the cycle rate along
+with the thread count, open file descriptors and RSS of the process,
+which should stay flat::
+
+    python benchmarks/churn.py --transport ssh --cycles 100000
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+
+sys.path.insert(0, __file__.rsplit("/", 2)[0])
+
+from e2e import Target  # noqa: E402
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        # Peak rather than current RSS; kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1e6 if sys.platform == "darwin" else 1e3)
+
+
+def open_fds():
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return -1
+
+
+def sample(cycle, start):
+    return {
+        "cycle": cycle,
+        "cycles_per_s": cycle / (time.perf_counter() - start) if cycle else 0.0,
+        "threads": threading.active_count(),
+        "fds": open_fds(),
+        "rss_mb": rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transport", default="tcp", choices=["tcp", "tls", "ssh"])
+    parser.add_argument("--cycles", type=int, default=100000)
+    parser.add_argument("--report-every", type=int, default=5000)
+    parser.add_argument(
+        "--graceful",
+        type=float,
+        metavar="SECONDS",
+        help="Send <close-session> and wait up to SECONDS for the reply",
+    )
+    parser.add_argument("--json", help="Write the samples to this file")
+    args = parser.parse_args()
+    # Resets from clients hanging up are expected
+    logging.getLogger("paramiko").setLevel(logging.CRITICAL)
+
+    target = Target(args.transport)
+    samples = []
+    with target.simulator() as server:
+        start = time.perf_counter()
+        samples.append(sample(0, start))
+        for cycle in range(1, args.cycles + 1):
+            session = target.connect(server)
+            session.close(timeout=args.graceful)
+            if cycle % args.report_every == 0 or cycle == args.cycles:
+                samples.append(sample(cycle, start))
+                print(
+                    "{cycle:>8} cycles  {cycles_per_s:>7.1f}/s  threads={threads:<4} "
+                    "fds={fds:<5} rss={rss_mb:.1f} MB".format(**samples[-1])
+                )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(samples, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""End-to-end benchmarks of Session and Manager against NetconfSimulator
+
+Measures RPC rate and latency percentiles, reply throughput and
+notification rate over each transport and framing mode::
+
+    python benchmarks/e2e.py --transports tcp ssh --json e2e.json
+"""
+import argparse
+import json
+import logging
+import socket
+import ssl
+import sys
+import time
+
+sys.path.insert(0, __file__.rsplit("/", 2)[0])
+
+from certs import make_certs  # noqa: E402
+
+from netconf_client.connect import TlsContext, connect_ssh, connect_tls  # noqa: E402
+from netconf_client.ncclient import Manager  # noqa: E402
+from netconf_client.session import Session  # noqa: E402
+from netconf_client.simulator import NetconfSimulator  # noqa: E402
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100.0))]
+
+
+class Target:
+    """Creates simulators and client sessions for one transport"""
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.server_context = None
+        self.client_context = None
+        if transport == "tls":
+            paths = make_certs()
+            self.server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            self.server_context.load_cert_chain(
+                paths["server_cert"], paths["server_key"]
+            )
+            self.client_context = TlsContext(
+                keyfile=paths["client_key"],
+                certfile=paths["client_cert"],
+                ca_certs=paths["ca"],
+            )
+
+    def simulator(self, **kwds):
+        return NetconfSimulator(
+            transport=self.transport, ssl_context=self.server_context, **kwds
+        )
+
+    def connect(self, server):
+        if self.transport == "tcp":
+            sock = socket.create_connection(("127.0.0.1", server.port))
+            return Session(sock)
+        if self.transport == "tls":
+            return connect_tls(
+                host="127.0.0.1", port=server.port, context=self.client_context
+            )
+        return connect_ssh(
+            host="127.0.0.1", port=server.port, username="bench", password="bench"
+        )
+
+
+def bench_manager_rpc(target, base11, seconds):
+    latencies = []
+    with target.simulator(base11=base11) as server:
+        mgr = Manager(target.connect(server))
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            mgr.get()
+            latencies.append(time.perf_counter() - start)
+        mgr.session.close()
+    return {
+        "rpc_per_s": len(latencies) / sum(latencies),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def bench_session_pipelined(target, base11, seconds, depth=64):
+    count = 0
+    with target.simulator(base11=base11) as server:
+        session = target.connect(server)
+        start = time.perf_counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            futures = [
+                session.send_rpc(
+                    b'<rpc message-id="%d" xmlns="urn:ietf:params:xml:ns:netconf:base:1.0">'
+                    b"<get/></rpc>" % i
+                )
+                for i in range(depth)
+            ]
+            for f in futures:
+                f.result()
+            count += depth
+        elapsed = time.perf_counter() - start
+        session.close()
+    return {"rpc_per_s": count / elapsed}
+
+
+def bench_throughput(target, base11, seconds, reply_size):
+    received = 0
+    with target.simulator(base11=base11, reply_size=reply_size) as server:
+        mgr = Manager(target.connect(server))
+        start = time.perf_counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            received += len(mgr.get().raw_reply)
+        elapsed = time.perf_counter() - start
+        mgr.session.close()
+    return {"mb_per_s": received / elapsed / 1e6}
+
+
+def bench_notifications(target, base11, seconds):
+    count = 0
+    with target.simulator(base11=base11, notification_rate=1e6) as server:
+        mgr = Manager(target.connect(server))
+        mgr.create_subscription()
+        mgr.take_notification(timeout=5)
+        start = time.perf_counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            if mgr.take_notification(timeout=1) is not None:
+                count += 1
+        elapsed = time.perf_counter() - start
+        mgr.session.close()
+    return {"notifications_per_s": count / elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--transports", nargs="+", default=["tcp", "tls", "ssh"])
+    parser.add_argument("--reply-size", type=int, default=1000000)
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+    # Resets from clients hanging up are expected
+    logging.getLogger("paramiko").setLevel(logging.CRITICAL)
+
+    results = {}
+    for transport in args.transports:
+        target = Target(transport)
+        for base11 in (False, True):
+            prefix = "{}/{}".format(transport, "1.1" if base11 else "1.0")
+            benches = {
+                "manager_rpc": lambda: bench_manager_rpc(target, base11, args.seconds),
+                "session_pipelined": lambda: bench_session_pipelined(
+                    target, base11, args.seconds
+                ),
+                "throughput": lambda: bench_throughput(
+                    target, base11, args.seconds, args.reply_size
+                ),
+                "notifications": lambda: bench_notifications(
+                    target, base11, args.seconds
+                ),
+            }
+            for name, bench in benches.items():
+                key = "{}/{}".format(prefix, name)
+                results[key] = bench()
+                print(
+                    "{:<32} {}".format(
+                        key,
+                        "  ".join(
+                            "{}={:.1f}".format(k, v) for k, v in results[key].items()
+                        ),
+                    )
+                )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
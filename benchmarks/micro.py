@@ -0,0 +1,265 @@
+"""Microbenchmarks of the pure-Python hot paths
+
+Covers the framers, the RPC builders in :mod:`netconf_client.rpc`,
+:class:`DataReply` construction, :class:`RpcError` parsing,
+``_pretty_xml`` and column extraction against per-entry dicts.
+Results can be saved as JSON and compared against a stored
+baseline::
+
+    python benchmarks/micro.py --save baseline.json
+    python benchmarks/micro.py --compare baseline.json --threshold 0.10
+
+With ``--compare`` the exit status is 1 if any benchmark is slower
+than the baseline by more than the threshold.
+"""
+import argparse
+import json
+import platform
+import sys
+import timeit
+
+sys.path.insert(0, __file__.rsplit("/", 2)[0])
+
+from lxml import etree  # noqa: E402
+
+from netconf_client import rpc  # noqa: E402
+from netconf_client.columns import ColumnExtractor  # noqa: E402
+from netconf_client.constants import DELIMITER_10  # noqa: E402
+from netconf_client.error import RpcError  # noqa: E402
+from netconf_client.ncclient import DataReply, _pretty_xml  # noqa: E402
+from netconf_client.parser import (  # noqa: E402
+    parse_messages_10_from_buf,
+    parse_messages_11_from_buf,
+)
+from netconf_client.session import frame_message_11  # noqa: E402
+from netconf_client.simulator import frame, make_data  # noqa: E402
+
+MESSAGE_SIZES = (1000, 100000, 1000000)
+RECV_SIZES = (1024, 65536)
+CHUNK_SIZES = (4096, 65536)
+
+RPC_ERROR = b"""<rpc-reply message-id="101" xmlns="urn:ietf:params:xml:ns:netconf:base:1.0">
+<rpc-error><error-type>application</error-type><error-tag>invalid-value</error-tag>
+<error-severity>error</error-severity><error-message>MTU value 25000 is not within range</error-message>
+<error-info><bad-element>mtu</bad-element></error-info></rpc-error></rpc-reply>"""
+
+
+def reply(size):
+    return (
+        b'<rpc-reply message-id="1" xmlns="urn:ietf:params:xml:ns:netconf:base:1.0">'
+        + make_data(size)
+        + b"</rpc-reply>"
+    )
+
+
+def feed_10(stream, recv_size):
+    buf = b""
+    pos = 0
+    count = 0
+    for i in range(0, len(stream), recv_size):
+        r = stream[i : i + recv_size]
+        buf += r
+        (msgs, buf, pos) = parse_messages_10_from_buf(buf, pos, len(r))
+        count += len(msgs)
+    return count
+
+
+def feed_11(stream, recv_size):
+    buf = b""
+    partial = []
+    chunk_length = 0
+    count = 0
+    for i in range(0, len(stream), recv_size):
+        buf += stream[i : i + recv_size]
+        (msgs, buf, partial, chunk_length) = parse_messages_11_from_buf(
+            buf, partial, chunk_length
+        )
+        count += len(msgs)
+    return count
+
+
+def to_dicts(ele):
+    # What extraction commonly looks like without ColumnExtractor
+    return [
+        {etree.QName(leaf).localname: leaf.text for leaf in entry}
+        for entry in ele.iter("{urn:example:simulator}interface")
+    ]
+
+
+def benchmarks():
+    benches = {}
+
+    for size in MESSAGE_SIZES:
+        msg = reply(size)
+        for recv_size in RECV_SIZES:
+            stream = msg + DELIMITER_10
+            benches[
+                "parse_10/msg={}/recv={}".format(size, recv_size)
+            ] = lambda stream=stream, recv_size=recv_size: feed_10(stream, recv_size)
+            for chunk_size in CHUNK_SIZES:
+                stream11 = frame(msg, "1.1", chunk_size)
+                benches[
+                    "parse_11/msg={}/chunk={}/recv={}".format(
+                        size, chunk_size, recv_size
+                    )
+                ] = lambda stream=stream11, recv_size=recv_size: feed_11(
+                    stream, recv_size
+                )
+        benches["frame_message_11/msg={}".format(size)] = lambda msg=msg: (
+            frame_message_11(msg)
+        )
+
+    config = "<config><top xmlns='urn:example'><mtu>1500</mtu></top></config>"
+    subtree = "<filter><top xmlns='urn:example'/></filter>"
+    builders = {
+        "make_rpc": lambda: rpc.make_rpc("<get/>", msg_id="1"),
+        "edit_config": lambda: rpc.edit_config(
+            config, default_operation="merge", test_option="set", msg_id="1"
+        ),
+        "get": lambda: rpc.get(filter=subtree, with_defaults="explicit", msg_id="1"),
+        "get_config": lambda: rpc.get_config(filter=subtree, msg_id="1"),
+        "get_data": lambda: rpc.get_data(
+            filter=subtree, origin_filters=["or:intended"], max_depth=3, msg_id="1"
+        ),
+        "copy_config": lambda: rpc.copy_config("startup", "running", msg_id="1"),
+        "discard_changes": lambda: rpc.discard_changes(msg_id="1"),
+        "commit": lambda: rpc.commit(confirmed=True, confirm_timeout=60, msg_id="1"),
+        "cancel_commit": lambda: rpc.cancel_commit("p1", msg_id="1"),
+        "lock": lambda: rpc.lock("running", msg_id="1"),
+        "unlock": lambda: rpc.unlock("running", msg_id="1"),
+        "kill_session": lambda: rpc.kill_session(4, msg_id="1"),
+        "close_session": lambda: rpc.close_session(msg_id="1"),
+        "create_subscription": lambda: rpc.create_subscription(
+            stream="NETCONF", start_time="2020-01-01T00:00:00Z", msg_id="1"
+        ),
+        "establish_subscription/periodic": lambda: rpc.establish_subscription(
+            datastore="ds:operational",
+            datastore_filter=("xpath", "/ex:top", {"ex": "urn:example"}),
+            period=500,
+            msg_id="1",
+        ),
+        "establish_subscription/on_change": lambda: rpc.establish_subscription(
+            datastore="ds:running",
+            datastore_filter=("subtree", "<top xmlns='urn:example'/>"),
+            on_change=True,
+            dampening_period=10,
+            msg_id="1",
+        ),
+        "modify_subscription": lambda: rpc.modify_subscription(
+            7, period=1000, msg_id="1"
+        ),
+        "delete_subscription": lambda: rpc.delete_subscription(7, msg_id="1"),
+        "kill_subscription": lambda: rpc.kill_subscription(7, msg_id="1"),
+        "validate": lambda: rpc.validate("candidate", msg_id="1"),
+        "delete_config": lambda: rpc.delete_config("startup", msg_id="1"),
+        "make_rpc/uuid": lambda: rpc.make_rpc("<get/>"),
+    }
+    for name, builder in builders.items():
+        benches["rpc/" + name] = builder
+
+    for size in MESSAGE_SIZES:
+        raw = reply(size)
+        ele = etree.fromstring(raw)
+        benches["DataReply/msg={}".format(size)] = lambda raw=raw, ele=ele: DataReply(
+            raw, ele
+        )
+    ns = "{urn:example:simulator}"
+    extractor = ColumnExtractor(
+        ns + "interface",
+        {
+            "name": (ns + "name", None),
+            "in": ns + "in-octets",
+            "out": ns + "out-octets",
+        },
+    )
+    for size in (100000, 1000000):
+        raw = reply(size)
+        ele = etree.fromstring(raw)
+        benches["columns/dicts/msg={}".format(size)] = lambda ele=ele: to_dicts(ele)
+        benches["columns/tree/msg={}".format(size)] = lambda ele=ele: extractor(ele)
+        benches["columns/stream/msg={}".format(size)] = lambda raw=raw: (
+            extractor.parse(raw)
+        )
+    error_ele = etree.fromstring(RPC_ERROR)
+    benches["RpcError"] = lambda: RpcError(RPC_ERROR, error_ele)
+    for size in (1000, 100000):
+        raw = reply(size)
+        benches["_pretty_xml/msg={}".format(size)] = lambda raw=raw: _pretty_xml(raw)
+
+    return benches
+
+
+def measure(func, repeat):
+    timer = timeit.Timer(func)
+    (number, _) = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            continue
+        ratio = result["seconds"] / base["seconds"]
+        marker = ""
+        if ratio > 1 + threshold:
+            marker = "  REGRESSION"
+            regressions.append(name)
+        print("{:<48} {:>8.2f}x{}".format(name, ratio, marker))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter", default="", help="Only run matching benchmarks")
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="Relative slowdown reported as a regression (default 0.10)",
+    )
+    args = parser.parse_args()
+
+    results = {}
+    for name, func in benchmarks().items():
+        if args.filter not in name:
+            continue
+        seconds = measure(func, args.repeat)
+        results[name] = {"seconds": seconds}
+        print("{:<48} {:>12.2f} us".format(name, seconds * 1e6))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "implementation": platform.python_implementation(),
+                    "machine": platform.machine(),
+                    "lxml": ".".join(str(v) for v in etree.LXML_VERSION),
+                    "results": results,
+                },
+                f,
+                indent=2,
+                sort_keys=True,
+            )
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        print()
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(
+                "\n{} regression(s) above {:.0%}".format(
+                    len(regressions), args.threshold
+                )
+            )
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Parse throughput of many sessions as the number of threads grows
+
+Each thread plays the receive thread of one session: it frames replies
+with ``parse_messages`` from an in-memory socket and parses them with
+lxml, as ``Session`` does. The same total amount of work is split over
+1, 2, 4, ... threads::
+
+    python benchmarks/parse_scaling.py --threads 1 2 4 8 16
+
+On a regular CPython build the GIL keeps the speedup near 1. On a
+free-threaded build (``python3.13t`` and later) it should approach the
+number of cores, provided the installed lxml supports running without
+the GIL; otherwise importing it re-enables the GIL, which is reported
+in the output.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from threading import Barrier, Thread
+
+sys.path.insert(0, __file__.rsplit("/", 2)[0])
+
+from lxml import etree  # noqa: E402
+
+from netconf_client.parser import parse_messages  # noqa: E402
+from netconf_client.simulator import frame, make_data  # noqa: E402
+
+
+class BytesSock:
+    def __init__(self, data, recv_size):
+        self.data = memoryview(data)
+        self.pos = 0
+        self.recv_size = recv_size
+
+    def recv(self, _):
+        r = self.data[self.pos : self.pos + self.recv_size]
+        self.pos += len(r)
+        return bytes(r)
+
+
+def gil_enabled():
+    is_enabled = getattr(sys, "_is_gil_enabled", None)
+    return True if is_enabled is None else is_enabled()
+
+
+def stream(reply_size, count):
+    msg = (
+        b'<rpc-reply message-id="1" xmlns="urn:ietf:params:xml:ns:netconf:base:1.0">'
+        + make_data(reply_size)
+        + b"</rpc-reply>"
+    )
+    return frame(msg, "1.1", 65536) * count, len(msg)
+
+
+def receive(data, count, recv_size):
+    parser = parse_messages(BytesSock(data, recv_size), "1.1")
+    for _ in range(count):
+        etree.fromstring(next(parser))
+
+
+def run(threads, messages, reply_size, recv_size):
+    per_thread = messages // threads
+    (data, msg_size) = stream(reply_size, per_thread)
+    barrier = Barrier(threads + 1)
+
+    def worker():
+        barrier.wait()
+        receive(data, per_thread, recv_size)
+
+    workers = [Thread(target=worker) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    total = per_thread * threads
+    return {
+        "messages_per_s": total / elapsed,
+        "mb_per_s": total * msg_size / elapsed / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--messages", type=int, default=512)
+    parser.add_argument("--reply-size", type=int, default=100000)
+    parser.add_argument("--recv-size", type=int, default=65536)
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    print(
+        "{} {}, {} cores, GIL {}".format(
+            platform.python_implementation(),
+            platform.python_version(),
+            os.cpu_count(),
+            "enabled" if gil_enabled() else "disabled",
+        )
+    )
+    results = {}
+    base = None
+    for threads in args.threads:
+        r = run(threads, args.messages, args.reply_size, args.recv_size)
+        base = base or r["messages_per_s"]
+        r["speedup"] = r["messages_per_s"] / base
+        results[str(threads)] = r
+        print(
+            "threads={:<4} messages/s={:<10.1f} MB/s={:<8.1f} speedup={:.2f}".format(
+                threads, r["messages_per_s"], r["mb_per_s"], r["speedup"]
+            )
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {"gil_enabled": gil_enabled(), "results": results},
+                f,
+                indent=2,
+                sort_keys=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Loopback benchmark of TLS connection setup with :func:`connect_tls`
+
+Compares building a new context for every connection with reusing a
+:class:`TlsContext`, with and without session resumption, for TLS 1.2
+and TLS 1.3::
+
+    python benchmarks/tls_handshake.py --seconds 3
+"""
+import argparse
+import socket
+import ssl
+import sys
+import threading
+import time
+
+sys.path.insert(0, __file__.rsplit("/", 2)[0])
+
+from certs import make_certs  # noqa: E402
+
+from netconf_client.connect import TlsContext, connect_tls  # noqa: E402
+from netconf_client.constants import DELIMITER_10  # noqa: E402
+
+SERVER_HELLO = b"""<hello xmlns="urn:ietf:params:xml:ns:netconf:base:1.0">
+<capabilities><capability>urn:ietf:params:netconf:base:1.0</capability></capabilities>
+<session-id>1</session-id></hello>"""
+
+
+def serve(listener, server_context, stop):
+    while not stop.is_set():
+        try:
+            sock, _ = listener.accept()
+        except OSError:
+            return
+        threading.Thread(
+            target=_handle, args=(sock, server_context), daemon=True
+        ).start()
+
+
+def _handle(sock, server_context):
+    try:
+        with server_context.wrap_socket(sock, server_side=True) as tls:
+            tls.sendall(SERVER_HELLO + DELIMITER_10)
+            buf = b""
+            while DELIMITER_10 not in buf:
+                r = tls.recv(4096)
+                if not r:
+                    break
+                buf += r
+            # Wait for the client to hang up
+            while tls.recv(4096):
+                pass
+    except (OSError, ssl.SSLError):
+        pass
+
+
+def run(label, seconds, port, make_kwds):
+    count = 0
+    resumed = 0
+    deadline = time.monotonic() + seconds
+    start = time.monotonic()
+    while time.monotonic() < deadline:
+        session = connect_tls(host="127.0.0.1", port=port, **make_kwds())
+        resumed += session.sock.session_reused
+        session.close()
+        count += 1
+    elapsed = time.monotonic() - start
+    print(
+        "{:<40} {:>9.1f} handshakes/s  ({} of {} resumed)".format(
+            label, count / elapsed, resumed, count
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    paths = make_certs()
+    server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    server_context.load_cert_chain(paths["server_cert"], paths["server_key"])
+    server_context.load_verify_locations(cafile=paths["ca"])
+    server_context.verify_mode = ssl.CERT_REQUIRED
+
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(128)
+    port = listener.getsockname()[1]
+    stop = threading.Event()
+    threading.Thread(
+        target=serve, args=(listener, server_context, stop), daemon=True
+    ).start()
+
+    files = dict(
+        keyfile=paths["client_key"],
+        certfile=paths["client_cert"],
+        ca_certs=paths["ca"],
+    )
+    for version in (ssl.TLSVersion.TLSv1_2, ssl.TLSVersion.TLSv1_3):
+        name = version.name.replace("v", " ").replace("_", ".")
+
+        def fresh():
+            return dict(
+                context=TlsContext(
+                    minimum_version=version,
+                    maximum_version=version,
+                    resume_sessions=False,
+                    **files
+                )
+            )
+
+        cached = TlsContext(
+            minimum_version=version,
+            maximum_version=version,
+            resume_sessions=False,
+            **files
+        )
+        resuming = TlsContext(minimum_version=version, maximum_version=version, **files)
+        run(name + " new context per connection", args.seconds, port, fresh)
+        run(name + " cached context", args.seconds, port, lambda: dict(context=cached))
+        run(
+            name + " cached context + resumption",
+            args.seconds,
+            port,
+            lambda: dict(context=resuming),
+        )
+
+    stop.set()
+    listener.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+import socket
+import ssl
+from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from threading import Lock, Thread
+
+from netconf_client.connect import SshSessionSock, connect_ssh, connect_tls
+from netconf_client.log import logger
+
+DEFAULT_PORTS = {"ssh": 4334, "tls": 4335}
+
+
+class CallhomeDevice:
+    """A device that called home and completed the NETCONF ``<hello>``
+
+    :ivar session: The :class:`netconf_client.session.Session` with the device
+    :ivar str protocol: Either ``"ssh"`` or ``"tls"``
+    :ivar tuple address: The (host, port) the device connected from
+    :ivar str identity: Fingerprint of the SSH host key or TLS
+                        certificate presented by the device, or
+                        ``None`` if it could not be determined
+    """
+
+    def __init__(self, session, protocol, address, identity):
+        self.session = session
+        self.protocol = protocol
+        self.address = address
+        self.identity = identity
+
+    @property
+    def host(self):
+        return self.address[0]
+
+    def __repr__(self):
+        return "<CallhomeDevice {} {} {}>".format(
+            self.protocol, self.address, self.identity
+        )
+
+
+class DeviceRegistry:
+    """Thread-safe index of the devices that called home
+
+    Devices are indexed by the (host, port) they connected from and by
+    the identity they presented; several devices may call home from
+    the same host, e.g. from behind NAT. A device connecting from the
+    address, or presenting the identity, of a registered device
+    replaces it, and :meth:`add` returns the replaced devices.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._by_address = {}
+        self._by_identity = {}
+
+    def add(self, device):
+        """Register `device`
+
+        :returns: The list of devices it replaced; their sessions are
+                  left open
+        """
+        with self._lock:
+            replaced = []
+            for old in (
+                self._by_address.get(device.address),
+                self._by_identity.get(device.identity) if device.identity else None,
+            ):
+                if old is not None and old is not device and old not in replaced:
+                    replaced.append(old)
+                    self._remove(old)
+            self._by_address[device.address] = device
+            if device.identity:
+                self._by_identity[device.identity] = device
+            return replaced
+
+    def remove(self, device):
+        """Unregister `device`, unless it was replaced already"""
+        with self._lock:
+            self._remove(device)
+
+    def _remove(self, device):
+        if self._by_address.get(device.address) is device:
+            del self._by_address[device.address]
+        if device.identity and self._by_identity.get(device.identity) is device:
+            del self._by_identity[device.identity]
+
+    def by_address(self, address):
+        """Return the device that connected from the (host, port)
+        `address`, or ``None``"""
+        with self._lock:
+            return self._by_address.get(tuple(address))
+
+    def by_host(self, host):
+        """Return the list of devices that connected from `host`"""
+        with self._lock:
+            return [d for d in self._by_address.values() if d.host == host]
+
+    def by_identity(self, identity):
+        """Return the device that presented `identity`, or ``None``"""
+        with self._lock:
+            return self._by_identity.get(identity)
+
+    def devices(self):
+        """Return a list of all registered devices"""
+        with self._lock:
+            return list(self._by_address.values())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._by_address)
+
+
+class CallhomeServer:
+    """Background listener for call-home connections (:rfc:`8071`)
+
+    Unlike :class:`netconf_client.connect.CallhomeManager`, the accept
+    loop runs in its own thread and the SSH/TLS handshakes and
+    ``<hello>`` exchanges run on a pool of worker threads, so many
+    devices can call home at once. Every device that completes the
+    ``<hello>`` is published into :attr:`registry` and passed to the
+    `on_connect` callback. A device is removed from the registry when
+    its session is closed, and the session of a device replaced by a
+    new connection (see :class:`DeviceRegistry`) is closed.
+
+    This object is a context manager; leaving the ``with`` block
+    stops accepting new connections. Sessions already established are
+    not closed.
+
+    Example of accepting call-home connections with SSH:
+
+    .. code-block:: python
+
+       def on_connect(device):
+           print("Device", device.address, device.identity, "is ready")
+
+       with CallhomeServer("ssh", on_connect=on_connect,
+                           username="admin", password="password") as server:
+           ...
+           device = server.registry.by_identity("SHA256:...")
+
+    :param str protocol: Either ``"ssh"`` or ``"tls"``
+
+    :param str bind_to: Address to listen on
+
+    :param int port: TCP port to listen on; defaults to 4334 for SSH
+                     and 4335 for TLS
+
+    :param int backlog: Size of the listen queue
+
+    :param int max_workers: Number of handshakes performed in parallel
+
+    :param on_connect: Called with a :class:`CallhomeDevice` from a
+                       worker thread for each device that is ready
+
+    :param on_error: Called with the remote address and the exception
+                     when a handshake fails
+
+    :param registry: The :class:`DeviceRegistry` to publish devices
+                     into; a new one is created if not given
+
+    Any further keyword arguments are passed to
+    :func:`netconf_client.connect.connect_ssh` or
+    :func:`netconf_client.connect.connect_tls`.
+
+    :ivar registry: The :class:`DeviceRegistry` of connected devices
+    """
+
+    def __init__(
+        self,
+        protocol="ssh",
+        bind_to="",
+        port=None,
+        backlog=128,
+        max_workers=32,
+        on_connect=None,
+        on_error=None,
+        registry=None,
+        **connect_kwds
+    ):
+        if protocol not in DEFAULT_PORTS:
+            raise ValueError("Unsupported call-home protocol {}".format(protocol))
+        self.protocol = protocol
+        self.bind_to = bind_to
+        self.port = DEFAULT_PORTS[protocol] if port is None else port
+        self.backlog = backlog
+        self.max_workers = max_workers
+        self.on_connect = on_connect
+        self.on_error = on_error
+        self.registry = registry if registry is not None else DeviceRegistry()
+        self.connect_kwds = connect_kwds
+        self.server_socket = None
+        self._executor = None
+        self._thread = None
+        self._running = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, _, __, ___):
+        self.stop()
+
+    def start(self):
+        """Bind the listening socket and start accepting connections"""
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind((self.bind_to, self.port))
+        self.server_socket.listen(self.backlog)
+        self.port = self.server_socket.getsockname()[1]
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="netconf-callhome"
+        )
+        self._running = True
+        self._thread = Thread(target=self._accept_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self, wait=True):
+        """Stop accepting connections
+
+        :param bool wait: If ``True``, wait for handshakes that are
+                          already in progress to finish
+        """
+        self._running = False
+        if self.server_socket is not None:
+            try:
+                self.server_socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.server_socket.close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                (sock, address) = self.server_socket.accept()
+            except OSError as e:
+                if self._running:
+                    logger.warning("Call-home accept failed: %s", e)
+                    continue
+                return
+            logger.info("Callhome connection initiated from remote host %s", address)
+            self._executor.submit(self._establish, sock, address)
+
+    def _establish(self, sock, address):
+        connect = connect_ssh if self.protocol == "ssh" else connect_tls
+        try:
+            session = connect(sock=sock, **self.connect_kwds)
+        except Exception as e:
+            logger.warning("Call-home handshake with %s failed: %s", address, e)
+            try:
+                sock.close()
+            except Exception:
+                pass
+            if self.on_error:
+                self.on_error(address, e)
+            return
+
+        device = CallhomeDevice(session, self.protocol, address, peer_identity(session))
+        for old in self.registry.add(device):
+            logger.info("Call-home device %s replaced by %s", old, device)
+            old.session.close()
+        # Called at once if the session was closed meanwhile
+        session.add_close_hook(lambda _: self.registry.remove(device))
+        if self.on_connect:
+            try:
+                self.on_connect(device)
+            except Exception:
+                logger.exception("Call-home on_connect callback failed")
+
+
+def peer_identity(session):
+    """Return a fingerprint of the key or certificate presented by the server
+
+    For SSH sessions this is the OpenSSH style ``SHA256:`` fingerprint
+    of the host key, for TLS sessions the SHA-256 digest of the
+    certificate in hex. ``None`` is returned for other transports.
+    """
+    sock = session.sock
+    if isinstance(sock, SshSessionSock):
+        key = sock.transport.get_remote_server_key()
+        digest = b64encode(sha256(key.asbytes()).digest()).decode("ascii")
+        return "SHA256:" + digest.rstrip("=")
+    if isinstance(sock, ssl.SSLSocket):
+        cert = sock.getpeercert(binary_form=True)
+        if cert:
+            return sha256(cert).hexdigest()
+    return None
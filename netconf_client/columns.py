@@ -0,0 +1,221 @@
+"""Extraction of list entries into columns
+
+Telemetry code typically turns every entry of a counter table into a
+dict before computing deltas and rates. A :class:`ColumnExtractor`
+instead appends each leaf straight to a per-leaf column, using
+:class:`array.array` for integers, so that no object is created per
+entry and the columns can be handed to NumPy without copying.
+
+Example:
+
+.. code-block:: python
+
+   IF = "{urn:ietf:params:xml:ns:yang:ietf-interfaces}"
+   extractor = ColumnExtractor(
+       IF + "interface",
+       {
+           "name": (IF + "name", None),
+           "in_octets": IF + "statistics/" + IF + "in-octets",
+           "out_octets": IF + "statistics/" + IF + "out-octets",
+       },
+   )
+   before = extractor(mgr.get(filter=f).data_ele)
+   after = extractor(mgr.get(filter=f).data_ele)
+   rates = (after.to_numpy()["in_octets"] - before.to_numpy()["in_octets"]) / dt
+
+An extractor can be passed as the `extract` argument of
+:meth:`netconf_client.ncclient.Manager.get`, including when replies
+are parsed in worker processes by
+:class:`netconf_client.offload.ParseOffload`.
+"""
+from array import array
+from io import BytesIO
+
+from lxml import etree
+
+#: Type code of columns holding counters: unsigned 64 bit integers
+COUNTER = "Q"
+
+
+class Columns(dict):
+    """The columns extracted by a :class:`ColumnExtractor`, by name
+
+    Integer columns are :class:`array.array` instances, other columns
+    are lists of strings.
+
+    :ivar int rows: Number of entries extracted
+    """
+
+    def __init__(self, columns, rows):
+        super().__init__(columns)
+        self.rows = rows
+
+    def __reduce__(self):
+        return (Columns, (dict(self), self.rows))
+
+    def to_numpy(self):
+        """The columns as NumPy arrays
+
+        Integer columns are converted without copying. Requires NumPy.
+
+        :rtype: dict
+        """
+        try:
+            import numpy
+        except ImportError as e:
+            raise ImportError("Columns.to_numpy() requires numpy") from e
+        return {
+            name: (
+                numpy.frombuffer(column, dtype=column.typecode)
+                if isinstance(column, array)
+                else numpy.array(column, dtype=object)
+            )
+            for (name, column) in self.items()
+        }
+
+
+class ColumnExtractor:
+    """Extracts leaves of the entries of a list into columns
+
+    :param str entry: The tag of the list entries in Clark notation,
+                      e.g. ``"{urn:example}interface"``; entries are
+                      found at any depth
+
+    :param dict columns: Maps each column name to the path of a leaf
+                         relative to an entry (as accepted by
+                         :meth:`lxml.etree._Element.findtext`), or to
+                         a tuple(path, typecode). The type code is one
+                         of :mod:`array`'s, by default
+                         :data:`COUNTER`; ``None`` keeps the text in a
+                         list
+
+    :param default: Value stored for leaves an entry does not have;
+                    ``None`` in text columns
+
+    Each path must select at most one leaf of an entry; leaf-lists
+    are not supported.
+    """
+
+    def __init__(self, entry, columns, default=0):
+        self.entry = entry
+        self.default = default
+        self.columns = {}
+        for (name, spec) in columns.items():
+            (path, typecode) = spec if isinstance(spec, tuple) else (spec, COUNTER)
+            self.columns[name] = (path, typecode)
+        self._paths = [path for (path, _) in self.columns.values()]
+        self._converters = [
+            None if typecode is None else float if typecode in "fd" else int
+            for (_, typecode) in self.columns.values()
+        ]
+        # Leaves that are children of the entry are found in a single
+        # pass over its children instead of one search per column
+        self._children = None
+        if all("/" not in path for path in self._paths):
+            self._children = {path: i for (i, path) in enumerate(self._paths)}
+        self._xpaths = None
+
+    def __getstate__(self):
+        # Compiled XPath expressions cannot be pickled
+        state = dict(self.__dict__)
+        state["_xpaths"] = None
+        return state
+
+    def __call__(self, ele):
+        """Extract the columns from the entries below `ele`, e.g. a
+        ``<data>`` or ``<rpc-reply>`` element
+
+        Each column is first selected with one XPath evaluation over
+        all entries. Only if an entry lacks a leaf, so that the
+        columns would not line up, are the entries visited one by one.
+
+        :rtype: :class:`Columns`
+        """
+        if self._xpaths is None:
+            self._xpaths = [
+                etree.ETXPath("count(descendant::{})".format(self.entry))
+            ] + [
+                etree.ETXPath(
+                    "descendant::{}/{}/text()".format(self.entry, path),
+                    smart_strings=False,
+                )
+                for path in self._paths
+            ]
+        rows = int(self._xpaths[0](ele))
+        columns = []
+        for (xpath, convert, (_, typecode)) in zip(
+            self._xpaths[1:], self._converters, self.columns.values()
+        ):
+            texts = xpath(ele)
+            if len(texts) != rows:
+                return self._per_entry(ele)
+            columns.append(
+                texts if convert is None else array(typecode, map(convert, texts))
+            )
+        return self._finish(columns, rows)
+
+    def _per_entry(self, ele):
+        columns = self._new()
+        rows = 0
+        for entry in ele.iter(self.entry):
+            rows += 1
+            self._add(columns, rows, entry)
+        return self._finish(columns, rows)
+
+    def parse(self, xml):
+        """Extract the columns from serialized XML, e.g.
+        :attr:`netconf_client.ncclient.DataReply.raw_reply`
+
+        The document is parsed incrementally and each entry is
+        discarded once extracted, so memory use does not grow with
+        the number of entries.
+
+        :rtype: :class:`Columns`
+        """
+        columns = self._new()
+        rows = 0
+        for (_, entry) in etree.iterparse(BytesIO(xml), tag=self.entry):
+            rows += 1
+            self._add(columns, rows, entry)
+            entry.clear()
+            parent = entry.getparent()
+            if parent is not None:
+                while entry.getprevious() is not None:
+                    del parent[0]
+        return self._finish(columns, rows)
+
+    def _new(self):
+        return [
+            [] if typecode is None else array(typecode)
+            for (_, typecode) in self.columns.values()
+        ]
+
+    def _add(self, columns, rows, entry):
+        converters = self._converters
+        if self._children is not None:
+            for child in entry:
+                i = self._children.get(child.tag)
+                # Only the first of repeated leaves is kept
+                if i is not None and len(columns[i]) < rows:
+                    convert = converters[i]
+                    text = child.text
+                    if convert is None:
+                        columns[i].append(text)
+                    else:
+                        columns[i].append(
+                            self.default if text is None else convert(text)
+                        )
+            for (i, column) in enumerate(columns):
+                if len(column) < rows:
+                    column.append(None if converters[i] is None else self.default)
+        else:
+            for (i, column) in enumerate(columns):
+                text = entry.findtext(self._paths[i])
+                convert = converters[i]
+                if convert is None:
+                    column.append(text)
+                else:
+                    column.append(self.default if text is None else convert(text))
+
+    def _finish(self, columns, rows):
+        return Columns(dict(zip(self.columns, columns)), rows)
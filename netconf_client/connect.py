@@ -1,12 +1,26 @@
+import os
 import socket
 import ssl
+import time
 from base64 import b64decode
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from hashlib import sha256
+from threading import Lock, current_thread
 
 import paramiko
 
-from netconf_client.error import InvalidSSHHostkey
+from netconf_client.error import InvalidSSHHostkey, SessionClosedException
+from netconf_client.keepalive import set_tcp_keepalive
 from netconf_client.session import Session
 from netconf_client.log import logger
+from netconf_client.tracing import (
+    ATTR_SESSION_ID,
+    ATTR_TARGET,
+    ATTR_TRANSPORT,
+    get_tracer,
+    peer_address,
+)
 
 
 def connect_ssh(
@@ -19,6 +33,9 @@ def connect_ssh(
     hostkey_b64=None,
     initial_timeout=None,
     general_timeout=None,
+    pkey=None,
+    passphrase=None,
+    keepalive=None,
 ):
     """Connect to a NETCONF server over SSH.
 
@@ -45,35 +62,88 @@ def connect_ssh(
 
     :param str hostkey_b64: base64 encoded hostkey.
 
+    :param pkey: An already-loaded :class:`paramiko.pkey.PKey` to
+                 authenticate with; takes precedence over `key_filename`
+
+    :param str passphrase: Passphrase to decrypt the private key in
+                           `key_filename`
+
+    :param int keepalive: Seconds without traffic after which SSH and
+                          TCP keepalives are sent, so that a dead
+                          server closes the session (see
+                          :mod:`netconf_client.keepalive`); disabled
+                          by default
+
+    Private keys loaded from `key_filename` are cached (see
+    :func:`clear_key_cache`), so connecting to many devices with the
+    same key only parses the key file once.
+
     :return: :class:`Session` object
 
     :rtype: :class:`netconf_client.session.Session`
 
     """
-    if not sock:
-        sock = socket.socket()
-        sock.settimeout(initial_timeout)
-        sock.connect((host, port))
-        sock.settimeout(general_timeout)
-    transport = paramiko.transport.Transport(sock)
-    pkey = _try_load_pkey(key_filename) if key_filename else None
-    hostkey = _try_load_hostkey_b64(hostkey_b64) if hostkey_b64 else None
-    transport.connect(username=username, password=password, pkey=pkey)
-    try:
-        #  Paramiko always opens the channel in blocking mode, even when a timeout is specified.  See https://github.com/paramiko/paramiko/blob/23f92003898b060df0e2b8b1d889455264e63a3e/paramiko/channel.py#L612-L633
-        #  This means that even if the Transport is holding a non-blocking socket, and the channel is created with a timeout, a channel.read() call can still hang if the remote misbehaves.
-        channel = transport.open_session(timeout=initial_timeout)
-        channel.settimeout(general_timeout)
-    except Exception:
-        transport.close()
-        raise
+    with _connect_span("ssh", host, port, sock) as span:
+        if not sock:
+            sock = socket.socket()
+            sock.settimeout(initial_timeout)
+            sock.connect((host, port))
+            sock.settimeout(general_timeout)
+        if keepalive:
+            _set_keepalive(sock, keepalive)
+        transport = paramiko.transport.Transport(sock)
+        if pkey is None and key_filename:
+            pkey = _try_load_pkey(key_filename, passphrase)
+        hostkey = _try_load_hostkey_b64(hostkey_b64) if hostkey_b64 else None
+        transport.connect(username=username, password=password, pkey=pkey)
+        if keepalive:
+            transport.set_keepalive(keepalive)
+        try:
+            channel = _open_netconf_channel(transport, initial_timeout, general_timeout)
+        except Exception:
+            transport.close()
+            raise
+        bundle = SshSessionSock(sock, transport, channel)
+        try:
+            session = Session(bundle)
+        except Exception:
+            bundle.close()
+            raise
+        span.set_attribute(ATTR_SESSION_ID, session.session_id)
+    return session
+
+
+def connect_ssh_channel(session, initial_timeout=None, general_timeout=None):
+    """Open another NETCONF session over the SSH connection of an existing one.
+
+    The new session runs on its own ``netconf`` subsystem channel of
+    the same SSH transport, so no TCP connection, key exchange or
+    authentication is needed. Each returned session must be closed
+    independently; the shared transport and socket are only closed
+    once the last session using them has been closed.
+
+    :param session: A session previously returned by
+                    :func:`connect_ssh` or :func:`connect_ssh_channel`
+
+    :param int initial_timeout: Seconds to wait for the channel to open.
+
+    :param int general_timeout: Seconds to wait for a response from the server after connecting.
+
+    :rtype: :class:`netconf_client.session.Session`
+
+    """
+    parent = session.sock
+    if not isinstance(parent, SshSessionSock):
+        raise TypeError("Session is not running over SSH")
+    parent.refs.acquire()
     try:
-        channel.invoke_subsystem("netconf")
+        channel = _open_netconf_channel(
+            parent.transport, initial_timeout, general_timeout
+        )
     except Exception:
-        channel.close()
-        transport.close()
+        parent.refs.release()
         raise
-    bundle = SshSessionSock(sock, transport, channel)
+    bundle = SshSessionSock(parent.sock, parent.transport, channel, refs=parent.refs)
     try:
         session = Session(bundle)
     except Exception:
@@ -82,6 +152,184 @@ def connect_ssh(
     return session
 
 
+def _open_netconf_channel(transport, initial_timeout, general_timeout):
+    #  Paramiko always opens the channel in blocking mode, even when a timeout is specified.  See https://github.com/paramiko/paramiko/blob/23f92003898b060df0e2b8b1d889455264e63a3e/paramiko/channel.py#L612-L633
+    #  This means that even if the Transport is holding a non-blocking socket, and the channel is created with a timeout, a channel.read() call can still hang if the remote misbehaves.
+    channel = transport.open_session(timeout=initial_timeout)
+    channel.settimeout(general_timeout)
+    try:
+        channel.invoke_subsystem("netconf")
+    except Exception:
+        channel.close()
+        raise
+    return channel
+
+
+CONNECT_PHASES = ("tcp", "ssh", "channel", "hello")
+
+
+class ConnectResult:
+    """The outcome of connecting to one endpoint with :func:`connect_many`
+
+    :ivar dict endpoint: The endpoint as it was passed to :func:`connect_many`
+
+    :ivar session: The connected
+                   :class:`netconf_client.session.Session`, or
+                   ``None`` if the connection failed
+
+    :ivar error: The exception that made the connection fail, or ``None``
+
+    :ivar str failed_phase: The phase (one of ``CONNECT_PHASES``) in
+                            which `error` was raised, or ``None``
+
+    :ivar dict timings: Seconds spent in each phase that completed,
+                        keyed by phase name
+    """
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.session = None
+        self.error = None
+        self.failed_phase = None
+        self.timings = {}
+
+    def __repr__(self):
+        return "<ConnectResult {} {}>".format(
+            self.endpoint.get("host"),
+            "failed in {}: {}".format(self.failed_phase, self.error)
+            if self.error
+            else "ok",
+        )
+
+
+def connect_many(endpoints, max_parallel=16, timeouts=None):
+    """Connect to many NETCONF servers over SSH in parallel.
+
+    Up to `max_parallel` endpoints are brought up at the same time,
+    each going through the TCP connect, SSH handshake and
+    authentication, ``netconf`` channel setup and ``<hello>``
+    exchange phases. Results are yielded as soon as each endpoint is
+    ready or has failed, in completion order; failures are reported
+    in the result rather than raised.
+
+    Example:
+
+    .. code-block:: python
+
+       endpoints = [dict(host=h, username="admin", password="pw") for h in hosts]
+       for result in connect_many(endpoints, max_parallel=32,
+                                  timeouts={"tcp": 3, "hello": 10}):
+           if result.error:
+               print(result.endpoint["host"], "failed in", result.failed_phase)
+           else:
+               print(result.endpoint["host"], result.timings)
+
+    If the generator is closed before it is exhausted, endpoints that
+    have not been started are skipped and sessions that were already
+    established but not yet yielded are closed.
+
+    :param endpoints: Iterable of dicts with the keyword arguments
+                      ``host``, ``port``, ``username``, ``password``,
+                      ``key_filename``, ``pkey``, ``passphrase``,
+                      ``general_timeout`` and ``keepalive`` as
+                      accepted by :func:`connect_ssh`
+
+    :param int max_parallel: Maximum number of endpoints being
+                             connected at the same time
+
+    :param dict timeouts: Seconds allowed for each phase, keyed by
+                          phase name (``"tcp"``, ``"ssh"``,
+                          ``"channel"`` and ``"hello"``); phases
+                          without an entry are not limited
+
+    :rtype: Iterator of :class:`ConnectResult`
+    """
+    timeouts = dict(timeouts or {})
+    executor = ThreadPoolExecutor(
+        max_workers=max_parallel, thread_name_prefix="netconf-connect"
+    )
+    futures = [
+        executor.submit(_connect_ssh_phased, endpoint, timeouts)
+        for endpoint in endpoints
+    ]
+    pending = set(futures)
+    try:
+        for f in as_completed(futures):
+            pending.discard(f)
+            yield f.result()
+    finally:
+        for f in pending:
+            f.cancel()
+        executor.shutdown(wait=True)
+        for f in pending:
+            if not f.cancelled() and f.result().session:
+                f.result().session.close()
+
+
+def _connect_ssh_phased(endpoint, timeouts):
+    result = ConnectResult(endpoint)
+    pkey = endpoint.get("pkey")
+    resources = []
+    phase = "tcp"
+    mark = time.monotonic()
+
+    def lap(next_phase):
+        nonlocal phase, mark
+        now = time.monotonic()
+        result.timings[phase] = now - mark
+        (phase, mark) = (next_phase, now)
+
+    try:
+        sock = socket.create_connection(
+            (endpoint["host"], endpoint.get("port", 830)), timeout=timeouts.get("tcp")
+        )
+        resources.append(sock)
+        keepalive = endpoint.get("keepalive")
+        if keepalive:
+            _set_keepalive(sock, keepalive)
+        lap("ssh")
+
+        transport = paramiko.transport.Transport(sock)
+        resources.append(transport)
+        ssh_timeout = timeouts.get("ssh")
+        if ssh_timeout is not None:
+            transport.banner_timeout = ssh_timeout
+            transport.handshake_timeout = ssh_timeout
+            transport.auth_timeout = ssh_timeout
+        if pkey is None and endpoint.get("key_filename"):
+            pkey = _try_load_pkey(endpoint["key_filename"], endpoint.get("passphrase"))
+        transport.connect(
+            username=endpoint.get("username", "netconf"),
+            password=endpoint.get("password"),
+            pkey=pkey,
+        )
+        if keepalive:
+            transport.set_keepalive(keepalive)
+        lap("channel")
+
+        channel = _open_netconf_channel(
+            transport, timeouts.get("channel"), timeouts.get("hello")
+        )
+        resources.append(channel)
+        lap("hello")
+
+        result.session = Session(SshSessionSock(sock, transport, channel))
+        channel.settimeout(endpoint.get("general_timeout"))
+        lap(None)
+    except Exception as e:
+        logger.info(
+            "Connecting to %s failed during %s: %s", endpoint.get("host"), phase, e
+        )
+        result.error = e
+        result.failed_phase = phase
+        for resource in reversed(resources):
+            try:
+                resource.close()
+            except Exception:
+                pass
+    return result
+
+
 def connect_tls(
     host=None,
     port=6513,
@@ -91,6 +339,8 @@ def connect_tls(
     sock=None,
     initial_timeout=None,
     general_timeout=None,
+    context=None,
+    keepalive=None,
 ):
     """Connect to a NETCONF server over TLS.
 
@@ -114,24 +364,163 @@ def connect_tls(
 
     :param int general_timeout: Seconds to wait for a response from the server after connecting.
 
+    :param context: A :class:`TlsContext` to reuse across
+                    connections; when given, `keyfile`, `certfile`
+                    and `ca_certs` are ignored
+
+    :param int keepalive: Seconds without traffic after which TCP
+                          keepalives are sent, so that a dead server
+                          closes the session (see
+                          :mod:`netconf_client.keepalive`); disabled
+                          by default
+
     :rtype: :class:`netconf_client.session.Session`
 
     """
-    if not sock:
-        sock = socket.socket()
-        sock.settimeout(initial_timeout)
-        sock.connect((host, port))
-        sock.settimeout(general_timeout)
-
-    context = ssl.SSLContext(ssl.PROTOCOL_TLSv1_2)
-    context.load_cert_chain(certfile, keyfile)
-    if ca_certs:
-        context.load_verify_locations(cafile=ca_certs)
-        context.verify_mode = ssl.CERT_REQUIRED
-    else:
-        context.verify_mode = ssl.CERT_NONE
-    ssl_sock = context.wrap_socket(sock)
-    return Session(ssl_sock)
+    with _connect_span("tls", host, port, sock) as span:
+        if not sock:
+            sock = socket.socket()
+            sock.settimeout(initial_timeout)
+            sock.connect((host, port))
+            sock.settimeout(general_timeout)
+        if keepalive:
+            _set_keepalive(sock, keepalive)
+
+        if context is None:
+            context = TlsContext(keyfile=keyfile, certfile=certfile, ca_certs=ca_certs)
+        endpoint = _tls_endpoint(host, port, sock)
+        ssl_sock = context.wrap_socket(sock, endpoint)
+        session = Session(ssl_sock)
+        # TLS 1.3 session tickets arrive after the handshake, so the
+        # session is only worth storing once the hello has been read
+        context.store_session(endpoint, ssl_sock)
+        span.set_attribute(ATTR_SESSION_ID, session.session_id)
+    return session
+
+
+def _set_keepalive(sock, interval):
+    # Proxies (e.g. paramiko.ProxyCommand) have no socket options
+    if hasattr(sock, "setsockopt"):
+        set_tcp_keepalive(sock, interval)
+
+
+def _connect_span(transport, host, port, sock):
+    tracer = get_tracer()
+    if not tracer.enabled:
+        return tracer.start_span("netconf.connect")
+    target = "{}:{}".format(host, port) if not sock else peer_address(sock)
+    return tracer.start_span(
+        "netconf.connect", {ATTR_TRANSPORT: transport, ATTR_TARGET: target}
+    )
+
+
+class TlsContext:
+    """Reusable client-side TLS configuration for :func:`connect_tls`
+
+    Loading certificates and keys is done once when the object is
+    created, and TLS sessions negotiated with each endpoint are kept
+    so later connections to the same endpoint can resume them instead
+    of performing a full handshake. The object is safe to share
+    between threads and can also be passed to
+    :meth:`CallhomeManager.accept_one_tls`.
+
+    Example of reusing a context for many connections:
+
+    .. code-block:: python
+
+       context = TlsContext(keyfile=client_key, certfile=client_cert, ca_certs=ca_cert)
+       for host in hosts:
+           with connect_tls(host=host, context=context) as session:
+               ...
+
+    :param keyfile: Path to the key file used to identify the client
+
+    :param certfile: Path to the certificate used to identify the client
+
+    :param ca_certs: Path to a file containing the certificate
+                     autority chains for verifying the server identity
+
+    :param minimum_version: The lowest accepted
+                            :class:`ssl.TLSVersion`; TLS 1.2 by default
+
+    :param maximum_version: The highest accepted
+                            :class:`ssl.TLSVersion`; unrestricted
+                            (i.e. TLS 1.3 if available) by default
+
+    :param bool resume_sessions: Set to ``False`` to always perform a
+                                 full handshake
+
+    :ivar ssl_context: The underlying :class:`ssl.SSLContext`; it may
+                       be adjusted further before the first connection
+    """
+
+    def __init__(
+        self,
+        keyfile=None,
+        certfile=None,
+        ca_certs=None,
+        minimum_version=ssl.TLSVersion.TLSv1_2,
+        maximum_version=None,
+        resume_sessions=True,
+    ):
+        self.ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        self.ssl_context.check_hostname = False
+        self.ssl_context.minimum_version = minimum_version
+        if maximum_version is not None:
+            self.ssl_context.maximum_version = maximum_version
+        if certfile:
+            self.ssl_context.load_cert_chain(certfile, keyfile)
+        if ca_certs:
+            self.ssl_context.load_verify_locations(cafile=ca_certs)
+            self.ssl_context.verify_mode = ssl.CERT_REQUIRED
+        else:
+            self.ssl_context.verify_mode = ssl.CERT_NONE
+        self.resume_sessions = resume_sessions
+        self._sessions = {}
+        self._lock = Lock()
+
+    def wrap_socket(self, sock, endpoint=None):
+        """Perform the TLS handshake on `sock`, resuming the last
+        session stored for `endpoint` if there is one
+
+        :rtype: :class:`ssl.SSLSocket`
+        """
+        # A session the server no longer knows simply results in a
+        # full handshake, so stale entries need no special handling
+        return self.ssl_context.wrap_socket(sock, session=self.get_session(endpoint))
+
+    def get_session(self, endpoint):
+        """Return the stored :class:`ssl.SSLSession` for `endpoint`, if any"""
+        if not self.resume_sessions or endpoint is None:
+            return None
+        with self._lock:
+            return self._sessions.get(endpoint)
+
+    def store_session(self, endpoint, ssl_sock):
+        """Remember the TLS session of `ssl_sock` for later resumption"""
+        if not self.resume_sessions or endpoint is None:
+            return
+        tls_session = ssl_sock.session
+        if tls_session is None:
+            return
+        with self._lock:
+            self._sessions[endpoint] = tls_session
+
+    def clear_sessions(self):
+        """Drop all stored TLS sessions"""
+        with self._lock:
+            self._sessions.clear()
+
+
+def _tls_endpoint(host, port, sock):
+    if host:
+        return (host, port)
+    # Call-home and pre-connected sockets: the remote port is usually
+    # ephemeral, so only the remote address identifies the server
+    try:
+        return (sock.getpeername()[0], None)
+    except (AttributeError, OSError):
+        return None
 
 
 class CallhomeManager:
@@ -146,6 +535,9 @@ class CallhomeManager:
     `accept` functions may outlive the scope of this object and will
     not be closed automatically.
 
+    To handle many devices calling home concurrently, use
+    :class:`netconf_client.callhome.CallhomeServer` instead.
+
     Example of accepting a call-home connection with TLS:
 
     .. code-block:: python
@@ -196,7 +588,10 @@ class CallhomeManager:
     def accept_one_tls(self, *args, **kwds):
         """Accept a single TCP client and start a TLS session on it
 
-        This function takes the same arguments as :func:`connect_tls`
+        This function takes the same arguments as :func:`connect_tls`;
+        pass a shared :class:`TlsContext` as `context` to avoid
+        reloading certificates and to resume TLS sessions with devices
+        that call home repeatedly
 
         """
         sock = self.accept_one(timeout=kwds.get("timeout", 120))
@@ -208,12 +603,30 @@ class CallhomeManager:
         self.server_socket.close()
 
 
+_KEY_CLASSES = (
+    paramiko.RSAKey,
+    paramiko.ECDSAKey,
+    paramiko.Ed25519Key,
+)
+
+# path -> (mtime, passphrase digest, key)
+_pkey_cache = {}
+# path -> key class that last parsed the file
+_pkey_classes = {}
+_pkey_cache_lock = Lock()
+
+
+def clear_key_cache():
+    """Forget all private keys and host keys cached by :func:`connect_ssh`"""
+    with _pkey_cache_lock:
+        _pkey_cache.clear()
+        _pkey_classes.clear()
+    _try_load_hostkey_b64.cache_clear()
+
+
+@lru_cache(maxsize=1024)
 def _try_load_hostkey_b64(data):
-    for cls in (
-        paramiko.RSAKey,
-        paramiko.ECDSAKey,
-        paramiko.Ed25519Key,
-    ):
+    for cls in _KEY_CLASSES:
         try:
             return cls(data=b64decode(data))
         except paramiko.SSHException:
@@ -221,24 +634,44 @@ def _try_load_hostkey_b64(data):
     raise InvalidSSHHostkey()
 
 
-def _try_load_pkey(path):
-    for cls in (
-        paramiko.RSAKey,
-        paramiko.ECDSAKey,
-        paramiko.Ed25519Key,
-    ):
+def _try_load_pkey(path, passphrase=None):
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    digest = sha256(passphrase.encode("utf-8")).digest() if passphrase else None
+
+    with _pkey_cache_lock:
+        cached = _pkey_cache.get(path)
+        known_cls = _pkey_classes.get(path)
+    if cached and cached[0] == mtime and cached[1] == digest:
+        return cached[2]
+
+    # Try the class that parsed this file before first; a rewritten
+    # key file almost always keeps its key type
+    classes = _KEY_CLASSES
+    if known_cls:
+        classes = (known_cls,) + tuple(c for c in classes if c is not known_cls)
+    for cls in classes:
         try:
-            return cls.from_private_key_file(path)
+            pkey = cls.from_private_key_file(path, password=passphrase)
         except Exception:
-            pass
+            continue
+        with _pkey_cache_lock:
+            _pkey_cache[path] = (mtime, digest, pkey)
+            _pkey_classes[path] = cls
+        return pkey
     return None
 
 
 class SshSessionSock:
-    def __init__(self, sock, transport, channel):
+    def __init__(self, sock, transport, channel, refs=None):
         self.sock = sock
         self.transport = transport
         self.channel = channel
+        self.refs = refs if refs is not None else SshTransportRefs(sock, transport)
+        self._closed = False
+        self._lock = Lock()
 
     def recv(self, n):
         return self.channel.recv(n)
@@ -247,6 +680,54 @@ class SshSessionSock:
         self.channel.sendall(b)
 
     def close(self):
-        self.channel.close()
-        self.transport.close()
-        self.sock.close()
+        # Called from user threads and the receive thread at once, and
+        # the transport reference must be released only once
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        try:
+            self.channel.close()
+        except (EOFError, OSError):
+            # The transport is already gone
+            pass
+        finally:
+            self.refs.release()
+
+
+class SshTransportRefs:
+    """Reference count of the channels sharing one SSH transport
+
+    The transport and its socket are closed when the last reference
+    is released, and the transport thread is joined.
+
+    :ivar int count: The number of channels currently holding a reference
+    """
+
+    def __init__(self, sock, transport):
+        self.sock = sock
+        self.transport = transport
+        self.count = 1
+        self._lock = Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.count == 0:
+                raise SessionClosedException("SSH transport is already closed")
+            self.count += 1
+
+    def release(self):
+        with self._lock:
+            self.count -= 1
+            last = self.count == 0
+        if last:
+            # Wakes up the transport thread, which otherwise only
+            # notices the closed socket at its next read timeout
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except (AttributeError, OSError):
+                pass
+            self.transport.close()
+            self.sock.close()
+            if self.transport is not current_thread() and self.transport.is_alive():
+                self.transport.join(Session.JOIN_TIMEOUT)
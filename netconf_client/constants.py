@@ -7,10 +7,13 @@ DEFAULT_HELLO = b"""
 """
 
 CAP_NETCONF_11 = "urn:ietf:params:netconf:base:1.1"
+CAP_XPATH = "urn:ietf:params:netconf:capability:xpath:1.0"
 
 NAMESPACES = {
     "nc": "urn:ietf:params:xml:ns:netconf:base:1.0",
     "notif": "urn:ietf:params:xml:ns:netconf:notification:1.0",
+    "sn": "urn:ietf:params:xml:ns:yang:ietf-subscribed-notifications",
+    "yp": "urn:ietf:params:xml:ns:yang:ietf-yang-push",
 }
 
 DELIMITER_10 = b"]]>]]>"
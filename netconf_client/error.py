@@ -14,6 +14,13 @@ class SessionClosedException(NetconfClientException):
     pass
 
 
+class PeerUnreachableException(SessionClosedException):
+    """This exception is raised on any futures when the session is closed
+    because the server stopped answering keepalive probes"""
+
+    pass
+
+
 class RpcError(NetconfClientException):
     """This exception is raised on a future from an ``<rpc>`` call that
     returns a corresponding ``<rpc-error>``
@@ -67,3 +74,36 @@ class InvalidSSHHostkey(NetconfClientException):
     """This exception is raised if the SSH hostkey isn't valid"""
 
     pass
+
+
+class ReplyTooLargeException(NetconfClientException):
+    """This exception is raised on the future of an RPC when the message
+    being received exceeds its maximum reply size, after which the
+    session is closed
+
+    :ivar int limit: The maximum reply size in bytes
+    :ivar int received: Bytes received of the message when it was aborted
+    """
+
+    def __init__(self, limit, received):
+        self.limit = limit
+        self.received = received
+        super(ReplyTooLargeException, self).__init__(
+            "Reply exceeds the maximum size of {} bytes ({} received)".format(
+                limit, received
+            )
+        )
+
+
+class UnsupportedCapabilityException(NetconfClientException):
+    """This exception is raised when a request needs a capability
+    the server did not advertise in its ``<hello>``
+
+    :ivar str capability: The missing capability
+    """
+
+    def __init__(self, capability):
+        self.capability = capability
+        super(UnsupportedCapabilityException, self).__init__(
+            "The server does not support {}".format(capability)
+        )
@@ -0,0 +1,186 @@
+"""Keepalives and dead peer detection
+
+Without keepalives, a session only notices a dead server when reading
+from the socket fails, which behind some NATs and firewalls takes as
+long as the TCP retransmission timeout. Two complementary mechanisms
+are available:
+
+* Transport keepalives, enabled with the `keepalive` argument of
+  :func:`netconf_client.connect.connect_ssh` and
+  :func:`netconf_client.connect.connect_tls`. TCP keepalives (plus SSH
+  keepalives over SSH) make the operating system fail the socket when
+  the server stops acknowledging, which closes the session and fails
+  its pending RPCs.
+
+* NETCONF probes sent by a :class:`Keepalive`, which also detect a
+  server that still acknowledges TCP but no longer answers RPCs.
+
+Example:
+
+.. code-block:: python
+
+   session = connect_ssh(host="192.0.2.1", username="admin", password="pw",
+                         keepalive=15)
+   with Keepalive(session, interval=30, timeout=10):
+       with Manager(session) as mgr:
+           ...
+"""
+import socket
+import time
+from concurrent.futures import TimeoutError
+from threading import Event, Thread
+
+from netconf_client.error import PeerUnreachableException, RpcError
+from netconf_client.log import logger
+from netconf_client.rpc import get
+from netconf_client.scheduler import HIGH
+
+
+def set_tcp_keepalive(sock, interval, count=3):
+    """Enable TCP keepalives on `sock`
+
+    The first probe is sent after `interval` seconds without traffic,
+    and the connection fails after `count` unanswered probes. Where
+    supported, unacknowledged data fails the connection after the
+    same time (``TCP_USER_TIMEOUT``). Options not supported by the
+    platform are skipped.
+
+    :param sock: A connected TCP :class:`socket.socket`
+
+    :param int interval: Seconds between keepalive probes
+
+    :param int count: Unanswered probes before the connection fails
+    """
+    interval = max(int(interval), 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    options = (
+        # macOS names TCP_KEEPIDLE differently
+        (
+            getattr(socket, "TCP_KEEPIDLE", getattr(socket, "TCP_KEEPALIVE", None)),
+            interval,
+        ),
+        (getattr(socket, "TCP_KEEPINTVL", None), interval),
+        (getattr(socket, "TCP_KEEPCNT", None), count),
+        (getattr(socket, "TCP_USER_TIMEOUT", None), interval * (count + 1) * 1000),
+    )
+    for (option, value) in options:
+        if option is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, option, value)
+
+
+class Keepalive:
+    """Sends a NETCONF probe on an idle session and closes the session
+    when the server does not answer
+
+    A probe is sent once nothing has been received from the server
+    for `interval` seconds and no RPC is waiting for a reply. Any
+    reply, including an ``<rpc-error>``, proves the server alive.
+    Servers answer RPCs in order, so a probe sent behind a pending RPC
+    would wait for it; instead, while RPCs are pending, the server
+    must not stay silent for more than `interval` plus `timeout`
+    seconds.
+
+    When a probe is not answered within `timeout` seconds, or the
+    server stays silent for that long while RPCs are pending, the
+    session is closed and the futures of all pending RPCs fail with
+    :class:`netconf_client.error.PeerUnreachableException`.
+
+    This object is a context manager that starts the probing thread
+    on entry and stops it on exit. The thread also ends when the
+    session is closed.
+
+    :param session: The :class:`netconf_client.session.Session` to watch
+
+    :param float interval: Seconds without traffic before probing
+
+    :param float timeout: Seconds to wait for the reply to a probe
+
+    :param rpc: The probe to send, as bytes or as a callable
+                returning a new probe each time; by default
+                :meth:`probe`
+
+    :ivar int probes: Number of probes sent
+    """
+
+    def __init__(self, session, interval=30, timeout=10, rpc=None):
+        self.session = session
+        self.interval = interval
+        self.timeout = timeout
+        self.rpc = rpc if rpc is not None else Keepalive.probe
+        self.probes = 0
+        self._stop = Event()
+        self._thread = None
+
+    @staticmethod
+    def probe():
+        """Build the default probe: a ``<get>`` with an empty subtree
+        filter, which selects nothing
+
+        A new RPC, with its own message-id, is built for every probe.
+        """
+        return get(filter='<filter type="subtree"/>')
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, _, __, ___):
+        self.stop()
+
+    def start(self):
+        """Start probing in a daemon thread"""
+        self._stop.clear()
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop probing and wait for the thread to end"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _idle_for(self):
+        return time.monotonic() - self.session.last_received
+
+    def _run(self):
+        wait = self.interval
+        while not self._stop.wait(wait):
+            if self.session.closed:
+                return
+            idle = self._idle_for()
+            if not self.session.rpc_reply_futures.empty():
+                limit = self.interval + self.timeout
+                if idle < limit:
+                    wait = limit - idle
+                    continue
+                logger.warning(
+                    "Closing session %s: nothing received for %.1f seconds "
+                    "while RPCs are pending",
+                    self.session.session_id,
+                    idle,
+                )
+                self.session.close(PeerUnreachableException)
+                return
+            if idle < self.interval:
+                wait = self.interval - idle
+                continue
+            wait = self.interval
+            self.probes += 1
+            rpc = self.rpc() if callable(self.rpc) else self.rpc
+            try:
+                self.session.send_rpc(rpc, priority=HIGH).result(timeout=self.timeout)
+            except RpcError:
+                # An <rpc-error> is an answer nonetheless
+                pass
+            except TimeoutError:
+                logger.warning(
+                    "Closing session %s: no reply to keepalive probe within %s seconds",
+                    self.session.session_id,
+                    self.timeout,
+                )
+                self.session.close(PeerUnreachableException)
+                return
+            except Exception:
+                # The session was closed meanwhile
+                return
@@ -0,0 +1,489 @@
+"""Lightweight metrics for sessions and managers
+
+No external dependencies are required. Metrics are kept in a
+:class:`MetricsRegistry`, which can render them in the Prometheus
+text exposition format or return them as a plain dict.
+
+Example:
+
+.. code-block:: python
+
+   metrics = NetconfMetrics()
+   session = connect_ssh(host="192.0.2.1", username="admin", password="password")
+   metrics.attach(session, "router-1")
+   with Manager(session) as mgr:
+       mgr.get_config()
+   print(metrics.registry.render())
+"""
+import weakref
+from bisect import bisect_left
+from threading import Lock
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+)
+
+RECONNECT_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(n, _escape(v)) for n, v in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = Lock()
+
+    def labels(self, *values):
+        """Return the child metric for the given label values
+
+        Keep the returned object around to update it without the
+        label lookup.
+        """
+        if len(values) != len(self.labelnames):
+            raise ValueError(
+                "{} expects labels {}".format(self.name, ", ".join(self.labelnames))
+            )
+        values = tuple(str(v) for v in values)
+        with self._lock:
+            child = self._children.get(values)
+            if child is None:
+                child = self._children[values] = self._new_child()
+        return child
+
+    def remove(self, *values):
+        """Drop the child metric for the given label values"""
+        with self._lock:
+            self._children.pop(tuple(str(v) for v in values), None)
+
+    def _items(self):
+        with self._lock:
+            return list(self._children.items())
+
+    def render(self):
+        lines = [
+            "# HELP {} {}".format(self.name, self.documentation.replace("\n", " ")),
+            "# TYPE {} {}".format(self.name, self.type_name),
+        ]
+        for values, child in self._items():
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def snapshot(self):
+        return [
+            dict(labels=dict(zip(self.labelnames, values)), **child.snapshot())
+            for values, child in self._items()
+        ]
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return {"value": self.value}
+
+
+class Counter(_Metric):
+    """A monotonically increasing value"""
+
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def _render_child(self, values, child):
+        yield "{}{} {}".format(
+            self.name,
+            _format_labels(self.labelnames, values),
+            _format_value(child.value),
+        )
+
+
+class _GaugeChild:
+    __slots__ = ("_value", "_function", "_lock")
+
+    def __init__(self):
+        self._value = 0
+        self._function = None
+        self._lock = Lock()
+
+    def set(self, value):
+        self._value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set_function(self, function):
+        """Compute the value by calling `function` whenever it is read"""
+        self._function = function
+
+    @property
+    def value(self):
+        if self._function is not None:
+            return self._function()
+        return self._value
+
+    def snapshot(self):
+        return {"value": self.value}
+
+
+class Gauge(_Metric):
+    """A value that can go up and down"""
+
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def _items(self):
+        items = []
+        for values, child in super()._items():
+            try:
+                child.value
+            except ReferenceError:
+                # The value is computed from an object that no longer exists
+                self.remove(*values)
+                continue
+            items.append((values, child))
+        return items
+
+    def _render_child(self, values, child):
+        yield "{}{} {}".format(
+            self.name,
+            _format_labels(self.labelnames, values),
+            _format_value(child.value),
+        )
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def cumulative(self):
+        """Return a list of (upper bound, cumulative count) pairs"""
+        with self._lock:
+            counts = list(self.counts)
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": dict(self.cumulative()),
+        }
+
+
+class Histogram(_Metric):
+    """Counts observations in configurable buckets"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _render_child(self, values, child):
+        labels = _format_labels(self.labelnames, values)
+        for bound, count in child.cumulative():
+            yield "{}_bucket{} {}".format(
+                self.name,
+                _format_labels(self.labelnames, values, [("le", _format_value(bound))]),
+                count,
+            )
+        yield "{}_sum{} {}".format(self.name, labels, _format_value(child.sum))
+        yield "{}_count{} {}".format(self.name, labels, child.count)
+
+
+class MetricsRegistry:
+    """A collection of metrics that can be rendered together"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = Lock()
+
+    def _register(self, cls, name, *args, **kwds):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwds)
+            elif not isinstance(metric, cls):
+                raise ValueError("Metric {} is already registered".format(name))
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        """Return the :class:`Counter` called `name`, creating it if needed"""
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        """Return the :class:`Gauge` called `name`, creating it if needed"""
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(
+        self, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS
+    ):
+        """Return the :class:`Histogram` called `name`, creating it if needed"""
+        return self._register(Histogram, name, documentation, labelnames, buckets)
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format
+
+        :rtype: str
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """Return the current values of all metrics as a dict
+
+        :rtype: dict
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {m.name: {"type": m.type_name, "samples": m.snapshot()} for m in metrics}
+
+
+class NetconfMetrics:
+    """The standard set of ``netconf_client`` metrics
+
+    Attach sessions with :meth:`attach`. A
+    :class:`netconf_client.ncclient.Manager` using an attached session
+    records its RPCs automatically.
+
+    :param registry: The :class:`MetricsRegistry` to create the
+                     metrics in; a new one is created if not given
+
+    :ivar registry: The :class:`MetricsRegistry` holding the metrics
+    """
+
+    def __init__(self, registry=None):
+        self.registry = registry if registry is not None else MetricsRegistry()
+        r = self.registry
+        self.rpcs = r.counter(
+            "netconf_rpcs_total",
+            "RPCs sent, by operation and outcome",
+            ("session", "operation", "outcome"),
+        )
+        self.rpc_duration = r.histogram(
+            "netconf_rpc_duration_seconds",
+            "Time from sending an RPC until its reply was received",
+            ("session", "operation"),
+        )
+        self.bytes_sent = r.counter(
+            "netconf_bytes_sent_total", "Bytes written, including framing", ("session",)
+        )
+        self.bytes_received = r.counter(
+            "netconf_bytes_received_total",
+            "Bytes read, including framing",
+            ("session",),
+        )
+        self.messages = r.counter(
+            "netconf_messages_received_total",
+            "Messages received, by type",
+            ("session", "type"),
+        )
+        self.dropped = r.counter(
+            "netconf_messages_dropped_total",
+            "Received messages that could not be delivered, by reason",
+            ("session", "reason"),
+        )
+        self.notification_queue = r.gauge(
+            "netconf_notification_queue_depth",
+            "Notifications received but not yet taken",
+            ("session",),
+        )
+        self.reconnects = r.counter(
+            "netconf_reconnects_total", "Sessions re-established", ("session",)
+        )
+        self.reconnect_duration = r.histogram(
+            "netconf_reconnect_duration_seconds",
+            "Time from losing a session until it was re-established and replayed",
+            ("session",),
+            RECONNECT_BUCKETS,
+        )
+        self.reconnect_failures = r.counter(
+            "netconf_reconnect_failures_total",
+            "Failed attempts to re-establish a session",
+            ("session",),
+        )
+        self.rpc_timeout = r.gauge(
+            "netconf_rpc_timeout_seconds",
+            "Timeout chosen for the latest RPC of each operation",
+            ("session", "operation"),
+        )
+        self.timeout_decisions = r.counter(
+            "netconf_rpc_timeout_decisions_total",
+            "Adaptive timeouts chosen, by what determined them",
+            ("session", "operation", "source"),
+        )
+        self.queue_wait = r.histogram(
+            "netconf_send_queue_wait_seconds",
+            "Time RPCs waited for the session's send scheduler, by priority",
+            ("session", "priority"),
+        )
+        self.send_queue = r.gauge(
+            "netconf_send_queue_depth",
+            "RPCs waiting for the session's send scheduler",
+            ("session",),
+        )
+        self.in_flight = r.gauge(
+            "netconf_rpcs_in_flight",
+            "RPCs sent through the session's send scheduler and not yet answered",
+            ("session",),
+        )
+
+    def attach(self, session, name):
+        """Start recording metrics for `session` under the label `name`
+
+        :rtype: :class:`SessionMetrics`
+        """
+        metrics = SessionMetrics(self, name)
+        ref = weakref.ref(session)
+
+        def target():
+            s = ref()
+            if s is None:
+                raise ReferenceError()
+            return s
+
+        def scheduler_value(attr):
+            scheduler = getattr(target(), "scheduler", None)
+            return getattr(scheduler, attr) if scheduler is not None else 0
+
+        self.notification_queue.labels(name).set_function(
+            lambda: target().notifications.qsize()
+        )
+        self.send_queue.labels(name).set_function(lambda: scheduler_value("queued"))
+        self.in_flight.labels(name).set_function(lambda: scheduler_value("in_flight"))
+        session.metrics = metrics
+        return metrics
+
+
+class SessionMetrics:
+    """The metrics of one session, with all label lookups done up front
+
+    Instances are created by :meth:`NetconfMetrics.attach` and stored
+    as the ``metrics`` attribute of the session.
+    """
+
+    def __init__(self, metrics, name):
+        self.parent = metrics
+        self.name = name
+        self.bytes_sent = metrics.bytes_sent.labels(name)
+        self.bytes_received = metrics.bytes_received.labels(name)
+        self.rpc_replies = metrics.messages.labels(name, "rpc-reply")
+        self.notifications = metrics.messages.labels(name, "notification")
+        self.unknown = metrics.messages.labels(name, "unknown")
+        self.dropped_replies = metrics.dropped.labels(name, "unexpected-reply")
+        self.reconnects = metrics.reconnects.labels(name)
+        self.reconnect_failures = metrics.reconnect_failures.labels(name)
+        self._rpcs = {}
+        self._queue_waits = {}
+
+    def rpc_done(self, operation, outcome, duration=None):
+        """Record the outcome of an RPC and, if known, its duration"""
+        key = (operation, outcome)
+        counter = self._rpcs.get(key)
+        if counter is None:
+            counter = self._rpcs[key] = self.parent.rpcs.labels(
+                self.name, operation, outcome
+            )
+        counter.inc()
+        if duration is not None:
+            self.parent.rpc_duration.labels(self.name, operation).observe(duration)
+
+    def queue_wait(self, priority, duration):
+        """Record the time an RPC of `priority` waited to be sent"""
+        histogram = self._queue_waits.get(priority)
+        if histogram is None:
+            histogram = self._queue_waits[priority] = self.parent.queue_wait.labels(
+                self.name, priority
+            )
+        histogram.observe(duration)
+
+    def reconnected(self, duration):
+        """Record a session re-established `duration` seconds after it was lost"""
+        self.reconnects.inc()
+        self.parent.reconnect_duration.labels(self.name).observe(duration)
+
+    def timeout_chosen(self, operation, timeout, source):
+        """Record the timeout chosen for an RPC of `operation`
+
+        :param str source: e.g.
+                           :data:`netconf_client.timeouts.SOURCE_FLOOR`
+        """
+        self.parent.rpc_timeout.labels(self.name, operation).set(timeout)
+        self.parent.timeout_decisions.labels(self.name, operation, source).inc()
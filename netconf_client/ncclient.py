@@ -1,15 +1,41 @@
+from contextlib import contextmanager
 from datetime import datetime
+from functools import lru_cache
 from socket import error as socket_error
 import logging
 import inspect
+import threading
 from concurrent.futures import CancelledError, TimeoutError
 from queue import Empty
 from typing import Optional
 import time
+from urllib.parse import parse_qs
+from xml.sax.saxutils import quoteattr
 
 from lxml import etree
 
-from netconf_client.error import RpcError
+from netconf_client.constants import CAP_XPATH, NAMESPACES
+from netconf_client.error import (
+    RpcError,
+    SessionClosedException,
+    UnsupportedCapabilityException,
+)
+from netconf_client.offload import ExtractedReply
+from netconf_client.session import RpcFuture, RpcTiming
+from netconf_client.singleflight import SingleFlight
+from netconf_client.timeouts import AdaptiveTimeout
+from netconf_client.tracing import (
+    ATTR_BYTES_RECEIVED,
+    ATTR_BYTES_SENT,
+    ATTR_ERROR_TAG,
+    ATTR_MESSAGE_ID,
+    ATTR_OPERATION,
+    ATTR_SESSION_ID,
+    ATTR_TARGET,
+    NOOP_TRACER,
+    message_id,
+    peer_address,
+)
 from netconf_client.rpc import (
     edit_config,
     get,
@@ -24,6 +50,10 @@ from netconf_client.rpc import (
     kill_session,
     close_session,
     create_subscription,
+    establish_subscription,
+    modify_subscription,
+    delete_subscription,
+    kill_subscription,
     validate,
     make_rpc,
     delete_config,
@@ -77,6 +107,13 @@ class Manager:
                    :class:`netconf_client.session.Session` connected
                    to the server
     :ivar str log_id: application-specific log ID (None as default)
+    :ivar single_flight: The
+                         :class:`netconf_client.singleflight.SingleFlight`
+                         deduplicating reads, or ``None``
+    :ivar adaptive_timeout: The
+                            :class:`netconf_client.timeouts.AdaptiveTimeout`
+                            choosing the timeout of each RPC, or
+                            ``None`` to always use :attr:`timeout`
 
     """
 
@@ -97,7 +134,14 @@ class Manager:
             else default
         )
 
-    def __init__(self, session, timeout=DEFAULT_RPC_TIMEOUT, log_id=None):
+    def __init__(
+        self,
+        session,
+        timeout=DEFAULT_RPC_TIMEOUT,
+        log_id=None,
+        single_flight=None,
+        adaptive_timeout=None,
+    ):
         """Construct a new Manager object
 
         :param session: The low-level NETCONF session to use for requests
@@ -106,14 +150,28 @@ class Manager:
         :param float timeout: Duration in seconds to wait for replies
         :param string log_id: log ID string additionally printed with
                each log entry
+        :param single_flight: ``True`` or a
+               :class:`netconf_client.singleflight.SingleFlight` to
+               share identical ``get``, ``get_config`` and ``get_data``
+               requests that are in flight at the same time between
+               callers instead of sending them again
+        :param adaptive_timeout: ``True`` or a
+               :class:`netconf_client.timeouts.AdaptiveTimeout` to
+               derive the timeout of RPCs without an explicit timeout
+               from the durations observed so far; `timeout` then
+               applies only until enough durations are known
         """
         self.timeout = Manager._timeout_from_arg(timeout, Manager.DEFAULT_RPC_TIMEOUT)
         self.session = session
         self.log_id = log_id
-        self._start_time = self._get_timestamp()
-        self._local_ip = None
-        self._peer_ip = None
-        self._funcname = None
+        if single_flight is True:
+            single_flight = SingleFlight()
+        self.single_flight = single_flight or None
+        if adaptive_timeout is True:
+            adaptive_timeout = AdaptiveTimeout()
+        self.adaptive_timeout = adaptive_timeout
+        self._local = threading.local()
+        self._trace_target = None
 
     def __enter__(self):
         return self
@@ -134,13 +192,52 @@ class Manager:
         """
         self.timeout = Manager._timeout_from_arg(timeout, Manager.DEFAULT_RPC_TIMEOUT)
 
+    def add_rpc_hook(self, hook):
+        """Register a hook receiving the stage timestamps of each RPC
+
+        See :meth:`netconf_client.session.Session.add_rpc_hook`. RPCs
+        sent through the Manager additionally carry the operation
+        name and the time spent building the request.
+        """
+        self.session.add_rpc_hook(hook)
+
+    def remove_rpc_hook(self, hook):
+        """Unregister a hook added with :meth:`add_rpc_hook`"""
+        self.session.remove_rpc_hook(hook)
+
+    @contextmanager
+    def priority(self, priority):
+        """Send the RPCs made by this thread within the ``with`` block
+        at `priority`
+
+        The priority only matters when the session has a
+        :class:`netconf_client.scheduler.SendScheduler`; otherwise
+        each RPC is sent immediately. Without this, the scheduler
+        picks the priority from the operation.
+
+        :param int priority: e.g. :data:`netconf_client.scheduler.HIGH`
+        """
+        previous = getattr(self._local, "priority", None)
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
     @staticmethod
     def logger():
         """Returns the internally used logger instance (same for all sessions)"""
         return _logger
 
     def set_logger_level(self, level):
-        _logger.setLevel(level)
+        """Sets the level of the logger shared by all Manager instances
+
+        Changing the level invalidates the level caches of every
+        logger in the process under the global :mod:`logging` lock, so
+        this is skipped when the level is already set.
+        """
+        if level != _logger.level:
+            _logger.setLevel(level)
 
     def _get_timestamp(self):
         return datetime.now()
@@ -149,57 +246,64 @@ class Manager:
         return Manager.logger().isEnabledFor(logging.DEBUG)
 
     def _fetch_connection_ip(self):
-        """Retrieves and stores the connection's local and remote IP"""
+        """Retrieves the connection's local and remote IP"""
 
-        self._local_ip = None
-        self._peer_ip = None
+        (local_ip, peer_ip) = (None, None)
         try:
-            (self._local_ip, _) = self.session.sock.sock.getsockname()
-            (self._peer_ip, _) = self.session.sock.sock.getpeername()
+            (local_ip, _) = self.session.sock.sock.getsockname()
+            (peer_ip, _) = self.session.sock.sock.getpeername()
         except (AttributeError, socket_error):
             pass
+        return (local_ip, peer_ip)
 
-    def _get_connection_info(self, direction):
+    def _get_connection_info(self, call, direction):
         """Returns detailed connection info for logging"""
 
         result = ""
         if self.log_id:
-            if self._local_ip and self._peer_ip:
+            if call.local_ip and call.peer_ip:
                 result = " ({}) {} {} ({})".format(
-                    self._local_ip, direction, self.log_id, self._peer_ip
+                    call.local_ip, direction, self.log_id, call.peer_ip
                 )
             else:
                 result = " {} {}".format(direction, self.log_id)
         else:
-            if self._local_ip and self._peer_ip:
-                result = " {} {} {}".format(self._local_ip, direction, self._peer_ip)
+            if call.local_ip and call.peer_ip:
+                result = " {} {} {}".format(call.local_ip, direction, call.peer_ip)
         return result
 
     def _fetch_funcname(self):
-        """Retrieves and stores the name of the API function being called"""
-        self._funcname = inspect.stack()[3][3]
+        """Retrieves the name of the API function being called"""
+        return inspect.stack()[3][3]
 
     def _log_rpc_request(self, rpc_xml):
-        if self._is_logger_enabled():
-            self._fetch_funcname()
-            self._fetch_connection_ip()
-            conn_id = self._get_connection_info("=>")
-            self._start_time = self._get_timestamp()
-            pretty = _pretty_xml(rpc_xml)
+        """Logs the request and returns the logging context of this
+        call, or ``None`` if logging is disabled
 
-            Manager.logger().debug(
-                "NC Request%s:\n%s",
-                conn_id,
-                pretty,
-                extra={"ncclient.Manager.funcname": self._funcname},
-            )
+        The context is kept per call rather than on the instance, so
+        that concurrent calls on the same Manager are logged correctly.
+        """
+        if not self._is_logger_enabled():
+            return None
+        call = _CallLog(self._fetch_funcname(), *self._fetch_connection_ip())
+        conn_id = self._get_connection_info(call, "=>")
+        call.start_time = self._get_timestamp()
+        pretty = _pretty_xml(rpc_xml)
+
+        Manager.logger().debug(
+            "NC Request%s:\n%s",
+            conn_id,
+            pretty,
+            extra={"ncclient.Manager.funcname": call.funcname},
+        )
+        return call
 
-    def _log_rpc_response(self, rpc_xml):
-        if self._is_logger_enabled():
+    def _log_rpc_response(self, call, rpc_xml):
+        if call is not None and self._is_logger_enabled():
             end_time = self._get_timestamp()
-            conn_id = self._get_connection_info("<=")
+            conn_id = self._get_connection_info(call, "<=")
 
-            taken = end_time - self._start_time
+            taken = end_time - call.start_time
             taken_formatted = "%d.%03d" % (taken.seconds, taken.microseconds / 1000)
             pretty = _pretty_xml(rpc_xml) if rpc_xml else "(None)"
 
@@ -208,15 +312,15 @@ class Manager:
                 conn_id,
                 taken_formatted,
                 pretty,
-                extra={"ncclient.Manager.funcname": self._funcname},
+                extra={"ncclient.Manager.funcname": call.funcname},
             )
 
-    def _log_rpc_failure(self, message):
-        if self._is_logger_enabled():
+    def _log_rpc_failure(self, call, message):
+        if call is not None and self._is_logger_enabled():
             end_time = self._get_timestamp()
-            conn_id = self._get_connection_info("<=")
+            conn_id = self._get_connection_info(call, "<=")
 
-            taken = end_time - self._start_time
+            taken = end_time - call.start_time
             taken_formatted = "%d.%03d" % (taken.seconds, taken.microseconds / 1000)
             message = "Cause: {}\n".format(message)
 
@@ -225,10 +329,52 @@ class Manager:
                 conn_id,
                 taken_formatted,
                 message,
-                extra={"ncclient.Manager.funcname": self._funcname},
+                extra={"ncclient.Manager.funcname": call.funcname},
             )
 
-    def _send_rpc(self, rpc_xml, timeout=None):
+    def _build(self, builder, *args, **kwds):
+        """Build an RPC with one of the :mod:`netconf_client.rpc`
+        functions, remembering how long it took for the RPC hooks"""
+        operation = "dispatch" if builder is make_rpc else builder.__name__
+        tracer = getattr(self.session, "tracer", NOOP_TRACER)
+        span = None
+        if tracer.enabled:
+            span = tracer.start_span("netconf.rpc", self._trace_attributes(operation))
+            if kwds.get("msg_id") is None:
+                kwds["msg_id"] = message_id(span if tracer.propagate else None)
+            span.set_attribute(ATTR_MESSAGE_ID, str(kwds["msg_id"]))
+        start = time.monotonic()
+        try:
+            rpc_xml = builder(*args, **kwds)
+        except Exception as e:
+            if span is not None:
+                span.record_exception(e)
+                span.end()
+            raise
+        self._local.build = (operation, start, time.monotonic())
+        self._local.span = span
+        return rpc_xml
+
+    def _trace_attributes(self, operation):
+        if self._trace_target is None:
+            self._trace_target = peer_address(getattr(self.session, "sock", None)) or ""
+        return {
+            ATTR_OPERATION: operation,
+            ATTR_TARGET: self._trace_target,
+            ATTR_SESSION_ID: getattr(self.session, "session_id", None),
+        }
+
+    def _make_timing(self, build):
+        if not getattr(self.session, "rpc_hooks", None):
+            return None
+        timing = RpcTiming()
+        if build:
+            (timing.operation, timing.build_start, timing.build_end) = build
+        return timing
+
+    def _send_rpc(
+        self, rpc_xml, timeout=None, extract=None, max_reply_size=None, progress=None
+    ):
         """Send given NC request message and expect a NC response
 
         Both, the NC request and response messages are logged with timestamp.
@@ -243,42 +389,123 @@ class Manager:
                (see __init__() and set_rpc_timeout()).
                The set timeout value is not changed.
 
+        :param extract, max_reply_size, progress (optional): Passed on
+               to :meth:`netconf_client.session.Session.send_rpc`
+
         :rtype :tupel: (`str` raw XML response, `ElementTree`: Element Tree or None)
         :exception: whatever exceptions raised by /netconf-client/netconf_client/ncclient.py
         """
 
         (raw, ele) = (None, None)
-        self._log_rpc_request(rpc_xml)
-
-        rpc_timeout = Manager._timeout_from_arg(timeout, self.timeout)
-        current_timestamp = time.monotonic()
+        call = self._log_rpc_request(rpc_xml)
+
+        build = getattr(self._local, "build", None)
+        span = getattr(self._local, "span", None)
+        self._local.build = None
+        self._local.span = None
+        operation = build[0] if build else "unknown"
+        metrics = getattr(self.session, "metrics", None)
+        adaptive = self.adaptive_timeout
+        if adaptive is not None and Manager._timeout_from_arg(timeout, None) is None:
+            (rpc_timeout, source) = adaptive.timeout_for(operation, self.timeout)
+            if metrics is not None:
+                metrics.timeout_chosen(operation, rpc_timeout, source)
+        else:
+            adaptive = None
+            rpc_timeout = Manager._timeout_from_arg(timeout, self.timeout)
+        current_timestamp = start_timestamp = time.monotonic()
         end_timestamp = current_timestamp + rpc_timeout
+        timing = self._make_timing(build)
+        outcome = "error"
+        error = None
         try:
-            f = self.session.send_rpc(rpc_xml)
+            kwds = {}
+            if timing is not None:
+                kwds["timing"] = timing
+            if extract is not None:
+                kwds["extract"] = extract
+            if max_reply_size is not None:
+                kwds["max_reply_size"] = max_reply_size
+            if progress is not None:
+                kwds["progress"] = progress
+            scheduler = getattr(self.session, "scheduler", None)
+            if scheduler is not None:
+                priority = getattr(self._local, "priority", None)
+                if priority is None:
+                    priority = scheduler.priority_for(build[0] if build else None)
+                kwds["priority"] = priority
+            if (
+                self.single_flight is not None
+                and build
+                and build[0] in SingleFlight.OPERATIONS
+            ):
+                f = self.single_flight.submit(
+                    SingleFlight.key(rpc_xml, extract, max_reply_size, progress),
+                    lambda: self.session.send_rpc(rpc_xml, **kwds),
+                )
+            else:
+                f = self.session.send_rpc(rpc_xml, **kwds)
             while current_timestamp < end_timestamp:
                 timeout = end_timestamp - current_timestamp
                 try:
                     r = f.result(timeout=timeout)
+                    outcome = "ok"
                     if not r:
-                        self._log_rpc_failure("RPC returned without result")
+                        self._log_rpc_failure(call, "RPC returned without result")
                     else:
                         (raw, ele) = r
-                        self._log_rpc_response(raw)
+                        self._log_rpc_response(call, raw)
                     return (raw, ele)
                 except TimeoutError:
                     current_timestamp = time.monotonic()
                     if current_timestamp > end_timestamp:
+                        # Not sent at all if still waiting for the
+                        # scheduler; futures shared with other callers
+                        # are left alone
+                        if isinstance(f, RpcFuture):
+                            f.cancel()
                         raise
-        except CancelledError:
-            self._log_rpc_failure("RPC cancelled")
+        except CancelledError as e:
+            (outcome, error) = ("cancelled", e)
+            self._log_rpc_failure(call, "RPC cancelled")
             raise
-        except TimeoutError:
-            self._log_rpc_failure("RPC timeout (max. {} seconds)".format(rpc_timeout))
+        except TimeoutError as e:
+            (outcome, error) = ("timeout", e)
+            self._log_rpc_failure(
+                call, "RPC timeout (max. {} seconds)".format(rpc_timeout)
+            )
             raise
         except Exception as e:
+            error = e
+            if isinstance(e, RpcError):
+                outcome = "rpc_error"
+            elif isinstance(e, SessionClosedException):
+                outcome = "closed"
             message = str(e)
-            self._log_rpc_failure("RPC exception: {}".format(message))
+            self._log_rpc_failure(call, "RPC exception: {}".format(message))
             raise
+        finally:
+            if span is not None:
+                span.set_attribute(ATTR_BYTES_SENT, len(rpc_xml))
+                reply = raw if raw is not None else getattr(error, "reply_raw", None)
+                if reply is not None:
+                    span.set_attribute(ATTR_BYTES_RECEIVED, len(reply))
+                if error is not None:
+                    if isinstance(error, RpcError) and error.tag:
+                        span.set_attribute(ATTR_ERROR_TAG, error.tag)
+                    span.record_exception(error)
+                span.end()
+            # Only RPCs that got a reply contribute to the latency
+            duration = None
+            if outcome in ("ok", "rpc_error"):
+                duration = time.monotonic() - start_timestamp
+            if metrics is not None:
+                metrics.rpc_done(operation, outcome, duration)
+            if adaptive is not None:
+                if duration is not None:
+                    adaptive.observe(operation, duration)
+                elif outcome == "timeout":
+                    adaptive.timed_out(operation)
 
     def edit_config(
         self,
@@ -313,15 +540,24 @@ class Manager:
                If given, this timeout is used instead of the set timeout.
         """
 
-        rpc_xml = edit_config(
-            config, target, default_operation, test_option, error_option
+        rpc_xml = self._build(
+            edit_config, config, target, default_operation, test_option, error_option
         )
         self._send_rpc(rpc_xml, timeout)
 
-    def get(self, filter=None, with_defaults=None, timeout=None):
+    def get(
+        self,
+        filter=None,
+        with_defaults=None,
+        timeout=None,
+        extract=None,
+        max_reply_size=None,
+        progress=None,
+    ):
         """Send a ``<get>`` request
 
-        :param str filter: The ``<filter>`` node to use in the request
+        :param filter: The ``<filter>`` node to use in the request, or
+                       a tuple accepted by :func:`convert_filter`
 
         :param str with_defaults: Specify the mode of default
                                   reporting.  See :rfc:`6243`. Can be
@@ -330,23 +566,48 @@ class Manager:
                                   'report-all', 'report-all-tagged',
                                   'trim', or 'explicit'.
 
+        :param extract (optional): A function applied to the
+               ``<rpc-reply>`` element, whose result is returned as
+               :attr:`DataReply.extracted`. It must be picklable, as
+               it runs in a worker process if the reply is parsed
+               there (see :class:`netconf_client.offload.ParseOffload`).
+
+        :param int max_reply_size (optional): Size in bytes the reply
+               may not exceed; see
+               :meth:`netconf_client.session.Session.send_rpc`
+
+        :param progress (optional): A callable receiving the number of
+               bytes of the reply received so far
+
         :param float timeout (optional): Applies a specific timeout value for this RPC call.
                If given, this timeout is used instead of the set timeout.
 
         :rtype: :class:`DataReply`
         """
-        rpc_xml = get(filter=convert_filter(filter), with_defaults=with_defaults)
-        (raw, ele) = self._send_rpc(rpc_xml, timeout)
-        return DataReply(raw, ele)
+        rpc_xml = self._build(
+            get, filter=self._convert_filter(filter), with_defaults=with_defaults
+        )
+        (raw, ele) = self._send_rpc(
+            rpc_xml, timeout, extract, max_reply_size=max_reply_size, progress=progress
+        )
+        return DataReply(raw, ele, extract)
 
     def get_config(
-        self, source="running", filter=None, with_defaults=None, timeout=None
+        self,
+        source="running",
+        filter=None,
+        with_defaults=None,
+        timeout=None,
+        extract=None,
+        max_reply_size=None,
+        progress=None,
     ):
         """Send a ``<get-config>`` request
 
         :param str source: The datastore to retrieve the configuration from
 
-        :param str filter: The ``<filter>`` node to use in the request
+        :param filter: The ``<filter>`` node to use in the request, or
+                       a tuple accepted by :func:`convert_filter`
 
         :param str with_defaults: Specify the mode of default
                                   reporting.  See :rfc:`6243`. Can be
@@ -355,19 +616,35 @@ class Manager:
                                   'report-all', 'report-all-tagged',
                                   'trim', or 'explicit'.
 
+        :param extract (optional): A function applied to the
+               ``<rpc-reply>`` element, whose result is returned as
+               :attr:`DataReply.extracted`. It must be picklable, as
+               it runs in a worker process if the reply is parsed
+               there (see :class:`netconf_client.offload.ParseOffload`).
+
+        :param int max_reply_size (optional): Size in bytes the reply
+               may not exceed; see
+               :meth:`netconf_client.session.Session.send_rpc`
+
+        :param progress (optional): A callable receiving the number of
+               bytes of the reply received so far
+
         :param float timeout (optional): Applies a specific timeout value for this RPC call.
                If given, this timeout is used instead of the set timeout.
 
         :rtype: :class:`DataReply`
 
         """
-        rpc_xml = get_config(
+        rpc_xml = self._build(
+            get_config,
             source=source,
-            filter=convert_filter(filter),
+            filter=self._convert_filter(filter),
             with_defaults=with_defaults,
         )
-        (raw, ele) = self._send_rpc(rpc_xml, timeout)
-        return DataReply(raw, ele)
+        (raw, ele) = self._send_rpc(
+            rpc_xml, timeout, extract, max_reply_size=max_reply_size, progress=progress
+        )
+        return DataReply(raw, ele, extract)
 
     def get_data(
         self,
@@ -380,6 +657,12 @@ class Manager:
         with_origin=False,
         with_defaults=None,
         timeout=None,
+        extract=None,
+        max_reply_size=None,
+        progress=None,
+        limit=None,
+        offset=None,
+        cursor=None,
     ):
         """Send a ``<get-data>`` request
 
@@ -410,12 +693,34 @@ class Manager:
                                   'report-all', 'report-all-tagged',
                                   'trim', or 'explicit'.
 
+        :param extract (optional): A function applied to the
+               ``<rpc-reply>`` element, whose result is returned as
+               :attr:`DataReply.extracted`. It must be picklable, as
+               it runs in a worker process if the reply is parsed
+               there (see :class:`netconf_client.offload.ParseOffload`).
+
+        :param int max_reply_size (optional): Size in bytes the reply
+               may not exceed; see
+               :meth:`netconf_client.session.Session.send_rpc`
+
+        :param progress (optional): A callable receiving the number of
+               bytes of the reply received so far
+
         :param float timeout (optional): Applies a specific timeout value for this RPC call.
                If given, this timeout is used instead of the set timeout.
 
+        :param int limit, offset (optional): Retrieve at most `limit`
+               entries of the list selected by `filter`, skipping the
+               first `offset`; requires the list pagination extensions
+               (see :mod:`netconf_client.pagination`)
+
+        :param str cursor (optional): Retrieve the entries following
+               the one identified by `cursor`
+
         :rtype: :class:`DataReply`
         """
-        rpc_xml = get_data(
+        rpc_xml = self._build(
+            get_data,
             datastore=datastore,
             filter=filter,
             config_filter=config_filter,
@@ -424,9 +729,14 @@ class Manager:
             max_depth=max_depth,
             with_origin=with_origin,
             with_defaults=with_defaults,
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+        )
+        (raw, ele) = self._send_rpc(
+            rpc_xml, timeout, extract, max_reply_size=max_reply_size, progress=progress
         )
-        (raw, ele) = self._send_rpc(rpc_xml, timeout)
-        return DataReply(raw, ele)
+        return DataReply(raw, ele, extract)
 
     def copy_config(self, target, source, with_defaults=None, timeout=None):
         """Send a ``<copy-config>`` request
@@ -446,7 +756,9 @@ class Manager:
         :param float timeout (optional): Applies a specific timeout value for this RPC call.
                If given, this timeout is used instead of the set timeout.
         """
-        rpc_xml = copy_config(target=target, source=source, with_defaults=with_defaults)
+        rpc_xml = self._build(
+            copy_config, target=target, source=source, with_defaults=with_defaults
+        )
         self._send_rpc(rpc_xml, timeout)
 
     def discard_changes(self, timeout=None):
@@ -455,7 +767,7 @@ class Manager:
         :param float timeout (optional): Applies a specific timeout value for this RPC call.
                If given, this timeout is used instead of the set timeout.
         """
-        self._send_rpc(discard_changes(), timeout)
+        self._send_rpc(self._build(discard_changes), timeout)
 
     def commit(
         self,
@@ -489,7 +801,8 @@ class Manager:
                If given, this timeout is used instead of the set timeout.
 
         """
-        rpc_xml = commit(
+        rpc_xml = self._build(
+            commit,
             confirmed=confirmed,
             confirm_timeout=confirm_timeout,
             persist=persist,
@@ -507,7 +820,7 @@ class Manager:
         :param float timeout (optional): Applies a specific timeout value for this RPC call.
                If given, this timeout is used instead of the set timeout.
         """
-        self._send_rpc(cancel_commit(persist_id), timeout)
+        self._send_rpc(self._build(cancel_commit, persist_id), timeout)
 
     def lock(self, target, timeout=None):
         """Send a ``<lock>`` request
@@ -517,7 +830,7 @@ class Manager:
         :param float timeout (optional): Applies a specific timeout value for this RPC call.
                If given, this timeout is used instead of the set timeout.
         """
-        self._send_rpc(lock(target), timeout)
+        self._send_rpc(self._build(lock, target), timeout)
 
     def unlock(self, target, timeout=None):
         """Send an ``<unlock>`` request
@@ -527,7 +840,7 @@ class Manager:
         :param float timeout (optional): Applies a specific timeout value for this RPC call.
                If given, this timeout is used instead of the set timeout.
         """
-        self._send_rpc(unlock(target), timeout)
+        self._send_rpc(self._build(unlock, target), timeout)
 
     def kill_session(self, session_id, timeout=None):
         """Send a ``<kill-session>`` request
@@ -537,7 +850,7 @@ class Manager:
         :param float timeout (optional): Applies a specific timeout value for this RPC call.
                If given, this timeout is used instead of the set timeout.
         """
-        self._send_rpc(kill_session(session_id), timeout)
+        self._send_rpc(self._build(kill_session, session_id), timeout)
 
     def close_session(self, timeout=None):
         """Send a ``<close-session>`` request
@@ -545,7 +858,7 @@ class Manager:
         :param float timeout (optional): Applies a specific timeout value for this RPC call.
                If given, this timeout is used instead of the set timeout.
         """
-        self._send_rpc(close_session(), timeout)
+        self._send_rpc(self._build(close_session), timeout)
 
     def create_subscription(
         self, stream=None, filter=None, start_time=None, stop_time=None, timeout=None
@@ -556,17 +869,193 @@ class Manager:
         :meth:`take_notification`
 
         :param str stream: The event stream to subscribe to
-        :param str filter: The filter for notifications to select
+        :param filter: The filter for notifications to select, or a
+                       tuple accepted by :func:`convert_filter`
         :param str start_time: When replaying notifications, the earliest notifications to replay
         :param str stop_time: When replaying notifications, the latest notifications to replay
         :param float timeout (optional): Applies a specific timeout value for this RPC call.
                If given, this timeout is used instead of the set timeout.
         """
-        rpc_xml = create_subscription(
-            stream=stream, filter=filter, start_time=start_time, stop_time=stop_time
+        rpc_xml = self._build(
+            create_subscription,
+            stream=stream,
+            filter=self._convert_filter(filter),
+            start_time=start_time,
+            stop_time=stop_time,
         )
         self._send_rpc(rpc_xml, timeout)
 
+    def establish_subscription(
+        self,
+        stream=None,
+        stream_filter=None,
+        datastore=None,
+        datastore_filter=None,
+        period=None,
+        anchor_time=None,
+        on_change=False,
+        dampening_period=None,
+        sync_on_start=None,
+        excluded_changes=(),
+        replay_start_time=None,
+        stop_time=None,
+        encoding=None,
+        timeout=None,
+    ):
+        """Send an ``<establish-subscription>`` request (:rfc:`8639`)
+
+        Either subscribes to the event `stream`, or, per :rfc:`8641`,
+        to updates of `datastore` (e.g. ``"ds:operational"``) sent
+        every `period` or `on_change`. Notifications can be taken by
+        subscription with a
+        :class:`netconf_client.subscriptions.SubscriptionRouter`, or
+        else with :meth:`take_notification`.
+
+        :param str stream: The event stream to subscribe to
+
+        :param stream_filter: The filter for events to select, as a
+                              ``("subtree", xml)`` or ``("xpath",
+                              expr, nsmap)`` tuple or as a
+                              ``<stream-subtree-filter>`` or
+                              ``<stream-xpath-filter>`` node. XPath
+                              filters are the ``xpath`` feature of
+                              ietf-subscribed-notifications; if the
+                              server lists that module in its
+                              ``<hello>`` without the feature,
+                              :class:`netconf_client.error.UnsupportedCapabilityException`
+                              is raised
+
+        :param str datastore: The datastore to subscribe to
+
+        :param datastore_filter: The data to select, as a tuple like
+                                 `stream_filter` or as a
+                                 ``<yp:datastore-subtree-filter>`` or
+                                 ``<yp:datastore-xpath-filter>`` node
+
+        :param int period: Centiseconds between periodic updates
+
+        :param str anchor_time: The time periodic updates are aligned to
+
+        :param bool on_change: Send updates when the data changes;
+                               ignored if `period` is given
+
+        :param int dampening_period: Minimum centiseconds between
+                                     on-change updates
+
+        :param bool sync_on_start: Whether on-change subscriptions
+                                   start with a full update
+
+        :param excluded_changes: On-change operations not to report,
+                                 e.g. ``["delete"]``
+
+        :param str replay_start_time: The time of the earliest event to replay
+
+        :param str stop_time: When the subscription ends
+
+        :param str encoding: The encoding of the notifications
+
+        :param float timeout (optional): Applies a specific timeout value for this RPC call.
+               If given, this timeout is used instead of the set timeout.
+
+        :returns: The subscription ID assigned by the server
+        :rtype: int
+        """
+        self._check_subscription_filter(stream_filter)
+        self._check_subscription_filter(datastore_filter)
+        rpc_xml = self._build(
+            establish_subscription,
+            stream=stream,
+            stream_filter=stream_filter,
+            datastore=datastore,
+            datastore_filter=datastore_filter,
+            period=period,
+            anchor_time=anchor_time,
+            on_change=on_change,
+            dampening_period=dampening_period,
+            sync_on_start=sync_on_start,
+            excluded_changes=excluded_changes,
+            replay_start_time=replay_start_time,
+            stop_time=stop_time,
+            encoding=encoding,
+        )
+        (_, ele) = self._send_rpc(rpc_xml, timeout)
+        return int(ele.xpath("/nc:rpc-reply/sn:id", namespaces=NAMESPACES)[0].text)
+
+    def modify_subscription(
+        self,
+        id,
+        stream_filter=None,
+        datastore=None,
+        datastore_filter=None,
+        period=None,
+        anchor_time=None,
+        dampening_period=None,
+        stop_time=None,
+        timeout=None,
+    ):
+        """Send a ``<modify-subscription>`` request (:rfc:`8639`)
+
+        :param int id: The subscription to modify
+
+        The other parameters are those of
+        :meth:`establish_subscription`; only those given are changed.
+        """
+        self._check_subscription_filter(stream_filter)
+        self._check_subscription_filter(datastore_filter)
+        rpc_xml = self._build(
+            modify_subscription,
+            id,
+            stream_filter=stream_filter,
+            datastore=datastore,
+            datastore_filter=datastore_filter,
+            period=period,
+            anchor_time=anchor_time,
+            dampening_period=dampening_period,
+            stop_time=stop_time,
+        )
+        self._send_rpc(rpc_xml, timeout)
+
+    def delete_subscription(self, id, timeout=None):
+        """Send a ``<delete-subscription>`` request (:rfc:`8639`)
+
+        :param int id: The subscription of this session to delete
+
+        :param float timeout (optional): Applies a specific timeout value for this RPC call.
+               If given, this timeout is used instead of the set timeout.
+        """
+        self._send_rpc(self._build(delete_subscription, id), timeout)
+
+    def kill_subscription(self, id, timeout=None):
+        """Send a ``<kill-subscription>`` request (:rfc:`8639`)
+
+        :param int id: The subscription, of any session, to delete
+
+        :param float timeout (optional): Applies a specific timeout value for this RPC call.
+               If given, this timeout is used instead of the set timeout.
+        """
+        self._send_rpc(self._build(kill_subscription, id), timeout)
+
+    def _convert_filter(self, filter):
+        self._check_filter(filter)
+        return convert_filter(filter)
+
+    def _check_filter(self, filter):
+        if isinstance(filter, tuple) and filter[0] == "xpath":
+            if CAP_XPATH not in getattr(self.session, "server_capabilities", ()):
+                raise UnsupportedCapabilityException(CAP_XPATH)
+
+    def _check_subscription_filter(self, filter):
+        # Servers implementing the module as YANG 1.1 only list it in
+        # the YANG library, so the feature cannot be checked then
+        if isinstance(filter, tuple) and filter[0] == "xpath":
+            features = module_features(
+                getattr(self.session, "server_capabilities", ()), NAMESPACES["sn"]
+            )
+            if features is not None and "xpath" not in features:
+                raise UnsupportedCapabilityException(
+                    "ietf-subscribed-notifications:xpath"
+                )
+
     def validate(self, source, timeout=None):
         """Send a ``<validate>`` request
 
@@ -575,7 +1064,7 @@ class Manager:
         :param float timeout (optional): Applies a specific timeout value for this RPC call.
                If given, this timeout is used instead of the set timeout.
         """
-        self._send_rpc(validate(source), timeout)
+        self._send_rpc(self._build(validate, source), timeout)
 
     @property
     def session_id(self):
@@ -612,7 +1101,7 @@ class Manager:
 
         :rtype: :class:`RPCReply`
         """
-        (msg, _) = self._send_rpc(make_rpc(from_ele(rpc)), timeout)
+        (msg, _) = self._send_rpc(self._build(make_rpc, from_ele(rpc)), timeout)
         return RPCReply(msg)
 
     def delete_config(self, target, timeout=None):
@@ -623,7 +1112,17 @@ class Manager:
         :param float timeout (optional): Applies a specific timeout value for this RPC call.
                If given, this timeout is used instead of the set timeout.
         """
-        self._send_rpc(delete_config(target), timeout)
+        self._send_rpc(self._build(delete_config, target), timeout)
+
+
+class _CallLog:
+    """Logging context of a single Manager API call"""
+
+    def __init__(self, funcname, local_ip, peer_ip):
+        self.funcname = funcname
+        self.local_ip = local_ip
+        self.peer_ip = peer_ip
+        self.start_time = None
 
 
 class DataReply:
@@ -636,16 +1135,43 @@ class DataReply:
 
     :ivar bytes raw_reply: The raw reply from the server
 
+    :ivar extracted: The result of the `extract` function passed with
+                     the request, or ``None``
+
+    If the reply was parsed in a worker process, :attr:`data_ele` is
+    only parsed from :attr:`data_xml` when first accessed, and both
+    are ``None`` when an `extract` function was given.
     """
 
-    def __init__(self, raw, ele):
-        self.data_ele = ele.find("{urn:ietf:params:xml:ns:netconf:base:1.0}data")
-        if self.data_ele is None:
-            self.data_ele = ele.find(
+    def __init__(self, raw, ele, extract=None):
+        self.raw_reply = raw
+        self.extracted = None
+        if isinstance(ele, ExtractedReply):
+            self._data_ele = None
+            if extract is not None:
+                self.extracted = ele.value
+                self.data_xml = None
+            else:
+                self.data_xml = ele.value
+            return
+        self._data_ele = ele.find("{urn:ietf:params:xml:ns:netconf:base:1.0}data")
+        if self._data_ele is None:
+            self._data_ele = ele.find(
                 "{urn:ietf:params:xml:ns:yang:ietf-netconf-nmda}data"
             )
-        self.data_xml = etree.tostring(self.data_ele)
-        self.raw_reply = raw
+        self.data_xml = etree.tostring(self._data_ele)
+        if extract is not None:
+            self.extracted = extract(ele)
+
+    @property
+    def data_ele(self):
+        if self._data_ele is None and self.data_xml is not None:
+            self._data_ele = etree.fromstring(self.data_xml)
+        return self._data_ele
+
+    @data_ele.setter
+    def data_ele(self, value):
+        self._data_ele = value
 
 
 class RPCReply:
@@ -671,10 +1197,24 @@ class Notification:
 
 
 def convert_filter(filter):
+    """Convert a filter given as a tuple to a ``<filter>`` node
+
+    ``("subtree", xml)`` becomes a subtree filter containing `xml`.
+    ``("xpath", expr)`` and ``("xpath", expr, nsmap)`` become an
+    XPath filter selecting `expr`, with the prefixes used in `expr`
+    declared by the dict `nsmap`; the server must support the
+    ``:xpath`` capability. XPath filters are cached, so polling with
+    the same filter does not build it again.
+
+    Strings and ``None`` are returned unchanged.
+    """
     if filter is None:
         return None
 
     if isinstance(filter, tuple):
+        if filter[0] == "xpath":
+            nsmap = filter[2] if len(filter) > 2 else None
+            return _xpath_filter(filter[1], tuple(sorted((nsmap or {}).items())))
         (kind, value) = filter
         if kind == "subtree":
             return "<filter>{}</filter>".format(value)
@@ -684,6 +1224,32 @@ def convert_filter(filter):
     return filter
 
 
+def module_features(capabilities, namespace):
+    """Return the set of features of the YANG module with `namespace`
+    listed in `capabilities`, or ``None`` if the module is not listed
+
+    :param capabilities: The capabilities from a ``<hello>``, e.g.
+                         :attr:`netconf_client.session.Session.server_capabilities`
+    """
+    for capability in capabilities:
+        (uri, _, query) = capability.partition("?")
+        if uri == namespace:
+            features = parse_qs(query).get("features", [""])[0]
+            return set(f for f in features.split(",") if f)
+    return None
+
+
+@lru_cache(maxsize=1024)
+def _xpath_filter(expr, namespaces):
+    return '<filter type="xpath"{} select={}/>'.format(
+        "".join(
+            " xmlns:{}={}".format(prefix, quoteattr(uri))
+            for (prefix, uri) in namespaces
+        ),
+        quoteattr(expr),
+    )
+
+
 def from_ele(maybe_ele):
     if etree.iselement(maybe_ele):
         return etree.tostring(maybe_ele).decode("utf-8")
@@ -0,0 +1,147 @@
+"""Parsing of large replies in worker processes
+
+XML parsing holds the GIL, so a single huge reply parsed in the
+receive thread of one session stalls every other session in the
+process. With a :class:`ParseOffload` set on a session, replies above
+a size threshold are instead parsed in a
+:class:`concurrent.futures.ProcessPoolExecutor`.
+
+Only picklable values can leave a worker process. The future of an
+offloaded RPC therefore resolves with an :class:`ExtractedReply` in
+place of the lxml element: either the serialized ``<data>`` subtree,
+or whatever the `extract` function given with the request returned.
+
+Example:
+
+.. code-block:: python
+
+   def interface_names(reply):
+       # Runs in a worker process, so it must be importable by name
+       return [e.text for e in reply.iter("{urn:example:if}name")]
+
+   offload = ParseOffload(threshold=10000000)
+   session.parse_offload = offload
+   with Manager(session) as mgr:
+       names = mgr.get(filter=..., extract=interface_names).extracted
+"""
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+
+from lxml import etree
+
+from netconf_client.constants import NAMESPACES
+
+_ROOT_R = re.compile(rb"<(?![?!])(?:[\w.-]+:)?([\w.-]+)")
+
+_DATA_TAGS = (
+    "{urn:ietf:params:xml:ns:netconf:base:1.0}data",
+    "{urn:ietf:params:xml:ns:yang:ietf-netconf-nmda}data",
+)
+
+
+class ExtractedReply:
+    """The result of parsing a reply in a worker process
+
+    Takes the place of the lxml element in the ``(raw, ele)`` result
+    of the future returned by
+    :meth:`netconf_client.session.Session.send_rpc`.
+
+    :ivar value: The serialized ``<data>`` element (``bytes``) if no
+                 `extract` function was given with the request,
+                 otherwise the value returned by that function
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+
+def serialize_data(reply):
+    """Return the ``<data>`` element of `reply` serialized as bytes
+
+    This is the default extraction, and the result is the same as
+    :attr:`netconf_client.ncclient.DataReply.data_xml`.
+    """
+    for tag in _DATA_TAGS:
+        data = reply.find(tag)
+        if data is not None:
+            return etree.tostring(data)
+    return None
+
+
+def parse_reply(msg, extract=None):
+    """Parse the ``<rpc-reply>`` `msg` and extract a picklable result
+
+    This is the function run in the worker processes.
+
+    :return: tuple(``True``, ``None``) if the reply is an
+             ``<rpc-error>``, otherwise tuple(``False``, result of
+             `extract`)
+    """
+    ele = etree.fromstring(msg)
+    if ele.xpath("/nc:rpc-reply/nc:rpc-error", namespaces=NAMESPACES):
+        return (True, None)
+    return (False, (extract or serialize_data)(ele))
+
+
+def root_name(msg):
+    """Return the local name of the root element of `msg` without parsing it"""
+    m = _ROOT_R.search(msg, 0, 4096)
+    return m.group(1).decode("ascii") if m else None
+
+
+class ParseOffload:
+    """A process pool parsing the replies that are too large to parse
+    in the receive thread
+
+    One instance may be shared by many sessions. Set it as the
+    ``parse_offload`` attribute of each
+    :class:`netconf_client.session.Session`.
+
+    :param int threshold: Replies of at least this many bytes are
+                          offloaded
+
+    :param int max_workers: Number of worker processes; defaults to
+                            the number of CPUs
+
+    :param executor: An existing executor to use instead of creating
+                     a :class:`concurrent.futures.ProcessPoolExecutor`
+    """
+
+    def __init__(self, threshold=10000000, max_workers=None, executor=None):
+        self.threshold = threshold
+        self.max_workers = max_workers
+        self._executor = executor
+        self._lock = Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, _, __, ___):
+        self.shutdown()
+
+    def accepts(self, msg):
+        """Whether `msg` is an ``<rpc-reply>`` large enough to offload"""
+        return len(msg) >= self.threshold and root_name(msg) == "rpc-reply"
+
+    def submit(self, msg, extract=None):
+        """Schedule :func:`parse_reply` and return its future"""
+        return self._get_executor().submit(parse_reply, msg, extract)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # Forking a process with running receive threads is
+                # unsafe, so workers are started from scratch
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
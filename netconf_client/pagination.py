@@ -0,0 +1,137 @@
+"""Walking large lists page by page
+
+Servers implementing the NETCONF list pagination extensions
+(draft-ietf-netconf-list-pagination-nc) return a slice of a list in
+reply to a ``<get-data>`` carrying ``<limit>`` and ``<offset>`` or
+``<cursor>`` parameters. :func:`iter_list` uses them to walk a list of
+any size while holding at most two pages in memory.
+
+Example:
+
+.. code-block:: python
+
+   routes = iter_list(
+       mgr,
+       "{urn:example:rib}routes/{urn:example:rib}route",
+       filter='<subtree-filter><routes xmlns="urn:example:rib"/></subtree-filter>',
+       page_size=5000,
+   )
+   for route in routes:
+       ...
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+NS_LIST_PAGINATION = "urn:ietf:params:xml:ns:yang:ietf-list-pagination"
+NS_LIST_PAGINATION_NC = "urn:ietf:params:xml:ns:yang:ietf-list-pagination-nc"
+
+
+def supports_pagination(session):
+    """Whether the server advertised the list pagination extensions"""
+    return any(
+        NS_LIST_PAGINATION_NC in c for c in getattr(session, "server_capabilities", ())
+    )
+
+
+def _annotation(data_ele, name):
+    values = data_ele.xpath(
+        "//@lp:{}".format(name), namespaces={"lp": NS_LIST_PAGINATION}
+    )
+    return str(values[-1]) if values else None
+
+
+def _drain(entries):
+    for entry in entries:
+        yield entry
+        # Entries already handled are freed while the rest are processed
+        parent = entry.getparent()
+        if parent is not None:
+            parent.remove(entry)
+
+
+def iter_list(
+    manager,
+    path,
+    filter=None,
+    page_size=1000,
+    cursor=False,
+    prefetch=True,
+    paginate=None,
+    **kwds
+):
+    """Yield the entries of a list, retrieving it page by page
+
+    Each page is requested with
+    :meth:`netconf_client.ncclient.Manager.get_data`. The walk ends
+    with a page shorter than `page_size`, or when the server annotates
+    the page with zero ``remaining`` entries or, in cursor mode, with
+    no ``next`` cursor. With `prefetch`, the next page is requested as
+    soon as a page arrives, while its entries are being processed.
+
+    Without pagination support the whole list is retrieved with a
+    single ``<get-data>``.
+
+    Each entry is removed from its reply once the caller moves on to
+    the next one, so entries that are kept must not rely on
+    ``getparent()``.
+
+    :param manager: The :class:`netconf_client.ncclient.Manager` to send with
+
+    :param str path: Path from the ``<data>`` element to the list
+                     entries, as accepted by
+                     :meth:`lxml.etree._Element.findall`
+
+    :param filter: The filter selecting the list, passed on to
+                   :meth:`netconf_client.ncclient.Manager.get_data`
+
+    :param int page_size: Entries to request per page
+
+    :param bool cursor: Page with the ``next`` cursor returned by the
+                        server instead of with offsets, which stays
+                        consistent while the list changes
+
+    :param bool prefetch: Request the next page while the entries of
+                          the current one are processed
+
+    :param bool paginate: Whether to use pagination; by default it is
+                          used when :func:`supports_pagination`
+
+    :param kwds: Passed on to
+                 :meth:`netconf_client.ncclient.Manager.get_data`
+    """
+    if paginate is None:
+        paginate = supports_pagination(manager.session)
+    if not paginate:
+        reply = manager.get_data(filter=filter, **kwds)
+        yield from _drain(reply.data_ele.findall(path))
+        return
+
+    def fetch(offset, next_cursor):
+        if cursor:
+            position = {"cursor": next_cursor}
+        else:
+            position = {"offset": offset}
+        return manager.get_data(filter=filter, limit=page_size, **position, **kwds)
+
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+
+    def request(offset, next_cursor):
+        if executor is not None:
+            return executor.submit(fetch, offset, next_cursor).result
+        return lambda: fetch(offset, next_cursor)
+
+    try:
+        offset = 0
+        pending = request(0, None)
+        while pending is not None:
+            data = pending().data_ele
+            entries = data.findall(path)
+            offset += len(entries)
+            pending = None
+            if len(entries) >= page_size and _annotation(data, "remaining") != "0":
+                next_cursor = _annotation(data, "next") if cursor else None
+                if not cursor or next_cursor is not None:
+                    pending = request(offset, next_cursor)
+            yield from _drain(entries)
+    finally:
+        if executor is not None:
+            executor.shutdown()
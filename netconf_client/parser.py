@@ -10,7 +10,7 @@ from netconf_client.constants import (
 )
 
 
-def parse_messages(sock, mode):
+def parse_messages(sock, mode, on_recv=None):
     buf = b""
     partial_msg = []
     pos = 0
@@ -20,29 +20,41 @@ def parse_messages(sock, mode):
         r = sock.recv(1024)
         if not r:
             return
+        if on_recv is not None:
+            on_recv(r)
 
         buf += r
+        received = len(r)
+
+        while True:
+            if mode == "1.0":
+                (msgs, buf, pos) = parse_messages_10_from_buf(buf, pos, received)
+            elif mode == "1.1":
+                (msgs, buf, partial_msg, chunk_length) = parse_messages_11_from_buf(
+                    buf, partial_msg, chunk_length
+                )
+            else:
+                raise NotImplementedError(
+                    "Unsupported message framing mode {}".format(mode)
+                )
+
+            mode_changed = False
+            for msg in msgs:
+                logger.debug("Received message: %s", msg)
+                new_mode = yield msg
+                if new_mode is not None and new_mode != mode:
+                    logger.debug("Updating parsing mode to %s", new_mode)
+                    mode = new_mode
+                    pos = 0
+                    del partial_msg[:]
+                    chunk_length = 0
+                    mode_changed = True
 
-        if mode == "1.0":
-            (msgs, buf, pos) = parse_messages_10_from_buf(buf, pos, len(r))
-        elif mode == "1.1":
-            (msgs, buf, partial_msg, chunk_length) = parse_messages_11_from_buf(
-                buf, partial_msg, chunk_length
-            )
-        else:
-            raise NotImplementedError(
-                "Unsupported message framing mode {}".format(mode)
-            )
-
-        for msg in msgs:
-            logger.debug("Received message: %s", msg)
-            new_mode = yield msg
-            if new_mode is not None and new_mode != mode:
-                logger.debug("Updating parsing mode to %s", new_mode)
-                mode = new_mode
-                pos = 0
-                del partial_msg[:]
-                chunk_length = 0
+            # Bytes following the <hello> may already be buffered in the
+            # new framing; parse them before waiting for more data
+            if not (mode_changed and buf):
+                break
+            received = len(buf)
 
 
 def parse_messages_10_from_buf(buf, pos, received):
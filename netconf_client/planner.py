@@ -0,0 +1,228 @@
+"""Retrieving the data of many subtree filters in one round trip
+
+A poller often asks a device for many unrelated subtrees. A
+:class:`QueryPlanner` merges their filters into one, sends a single
+``<get>`` or ``<get-data>``, and splits the reply back into one
+:class:`netconf_client.ncclient.DataReply` per filter by applying each
+filter to the combined data (see :func:`apply_subtree_filter`).
+
+Example:
+
+.. code-block:: python
+
+   planner = QueryPlanner(mgr)
+   (interfaces, system) = planner.get([
+       ("subtree", '<interfaces xmlns="urn:ietf:params:xml:ns:yang:ietf-interfaces"/>'),
+       '<filter><system xmlns="urn:ietf:params:xml:ns:yang:ietf-system"/></filter>',
+   ])
+"""
+from copy import deepcopy
+
+from lxml import etree
+
+from netconf_client.ncclient import DataReply, to_ele
+
+RPC_REPLY = "{urn:ietf:params:xml:ns:netconf:base:1.0}rpc-reply"
+
+
+def _children(node):
+    return [c for c in node if isinstance(c.tag, str)]
+
+
+def _is_content_match(node):
+    return not _children(node) and bool((node.text or "").strip())
+
+
+def filter_nodes(filter):
+    """The top-level nodes of a subtree filter
+
+    :param filter: A ``("subtree", xml)`` tuple, or a ``<filter>`` or
+                   ``<subtree-filter>`` node as string or element
+
+    :raises ValueError: if `filter` is not a subtree filter
+    """
+    if isinstance(filter, tuple):
+        (kind, value) = filter[:2]
+        if kind != "subtree":
+            raise ValueError("Cannot merge {} filters".format(kind))
+        filter = "<filter>{}</filter>".format(value)
+    root = to_ele(filter)
+    if root.get("type", "subtree") != "subtree":
+        raise ValueError("Cannot merge {} filters".format(root.get("type")))
+    return _children(root)
+
+
+def merge_nodes(nodes):
+    """Merge sibling subtree filter nodes without changing what they select
+
+    Nodes with the same name and attributes are combined into one
+    whose children are merged in turn, unless they contain content
+    match nodes, which would then have to match together. A selection
+    node replaces all siblings of the same name and attributes, and
+    duplicates are dropped.
+
+    :raises ValueError: if one of `nodes` is a content match node, as
+                        those only select together with all their
+                        siblings
+
+    :rtype: list of elements
+    """
+    groups = {}
+    for node in nodes:
+        if _is_content_match(node):
+            raise ValueError("Cannot merge content match node {}".format(node.tag))
+        key = (node.tag, tuple(sorted(node.attrib.items())))
+        groups.setdefault(key, []).append(node)
+    merged = []
+    for group in groups.values():
+        selection = [n for n in group if not _children(n)]
+        if selection:
+            merged.append(deepcopy(selection[0]))
+        elif any(any(_is_content_match(c) for c in _children(n)) for n in group):
+            seen = set()
+            for n in group:
+                c14n = etree.tostring(n, method="c14n")
+                if c14n not in seen:
+                    seen.add(c14n)
+                    merged.append(deepcopy(n))
+        else:
+            first = group[0]
+            node = etree.Element(first.tag, dict(first.attrib), nsmap=first.nsmap)
+            node.extend(merge_nodes([c for n in group for c in _children(n)]))
+            merged.append(node)
+    return merged
+
+
+def _matches(f, d):
+    qname = etree.QName(f)
+    if qname.namespace is not None and qname.namespace != etree.QName(d).namespace:
+        return False
+    if qname.localname != etree.QName(d).localname:
+        return False
+    return all(d.get(k) == v for (k, v) in f.attrib.items())
+
+
+def _select(data_parent, filters, full, partial):
+    content = [f for f in filters if _is_content_match(f)]
+    others = [f for f in filters if not _is_content_match(f)]
+    data = _children(data_parent)
+    matched = []
+    for f in content:
+        hits = [
+            d
+            for d in data
+            if _matches(f, d) and (d.text or "").strip() == f.text.strip()
+        ]
+        if not hits:
+            return False
+        matched.extend(hits)
+    if content and not others:
+        full.update(data)
+        return True
+    full.update(matched)
+    selected = bool(matched)
+    for d in data:
+        for f in others:
+            if not _matches(f, d):
+                continue
+            if not _children(f):
+                full.add(d)
+                selected = True
+            elif _select(d, _children(f), full, partial):
+                partial.add(d)
+                selected = True
+    return selected
+
+
+def _prune(node, full, partial):
+    if node in full:
+        return deepcopy(node)
+    copy = etree.Element(node.tag, dict(node.attrib), nsmap=node.nsmap)
+    copy.extend(
+        _prune(c, full, partial) for c in _children(node) if c in full or c in partial
+    )
+    return copy
+
+
+def apply_subtree_filter(data_ele, filter):
+    """Apply a subtree filter to retrieved data as a server would
+
+    Implements the filtering rules of :rfc:`6241#section-6`: namespace
+    and attribute matching, and containment, selection and content
+    match nodes. Filter nodes without a namespace match any namespace.
+
+    :param data_ele: The ``<data>`` element of a reply
+
+    :param filter: Anything accepted by :func:`filter_nodes`
+
+    :returns: A new element like `data_ele`, holding copies of the
+              selected nodes
+    """
+    (full, partial) = (set(), set())
+    _select(data_ele, filter_nodes(filter), full, partial)
+    return _prune(data_ele, full, partial)
+
+
+class QueryPlanner:
+    """Retrieves the data selected by many subtree filters with one RPC
+
+    The filters are merged with :func:`merge_nodes` and the result of
+    each is cut out of the combined reply with
+    :func:`apply_subtree_filter`. All results share the
+    :attr:`netconf_client.ncclient.DataReply.raw_reply` of the
+    combined reply.
+
+    :param manager: The :class:`netconf_client.ncclient.Manager` to send with
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+
+    @staticmethod
+    def merge(filters, tag="filter"):
+        """The merged filter as a ``<filter>`` node, or as the node named `tag`
+
+        :rtype: str
+        """
+        nodes = merge_nodes([n for f in filters for n in filter_nodes(f)])
+        attrs = ' type="subtree"' if tag == "filter" else ""
+        return "<{0}{1}>{2}</{0}>".format(
+            tag, attrs, "".join(etree.tostring(n).decode("utf-8") for n in nodes)
+        )
+
+    def get(self, filters, **kwds):
+        """Send one ``<get>`` for all `filters`
+
+        Other keyword arguments, except `extract`, are passed on to
+        :meth:`netconf_client.ncclient.Manager.get`.
+
+        :rtype: list of :class:`netconf_client.ncclient.DataReply`,
+                in the order of `filters`
+        """
+        reply = self.manager.get(filter=self.merge(filters), **kwds)
+        return self.split(reply, filters)
+
+    def get_data(self, filters, **kwds):
+        """Send one ``<get-data>`` for all `filters`
+
+        Other keyword arguments, except `extract`, are passed on to
+        :meth:`netconf_client.ncclient.Manager.get_data`.
+
+        :rtype: list of :class:`netconf_client.ncclient.DataReply`,
+                in the order of `filters`
+        """
+        reply = self.manager.get_data(
+            filter=self.merge(filters, "subtree-filter"), **kwds
+        )
+        return self.split(reply, filters)
+
+    @staticmethod
+    def split(reply, filters):
+        """Split a combined :class:`netconf_client.ncclient.DataReply`
+        into one per filter"""
+        results = []
+        for f in filters:
+            rpc_reply = etree.Element(RPC_REPLY)
+            rpc_reply.append(apply_subtree_filter(reply.data_ele, f))
+            results.append(DataReply(reply.raw_reply, rpc_reply))
+        return results
@@ -0,0 +1,326 @@
+"""Sessions that survive connection loss
+
+A :class:`ReconnectingManager` stands in for a
+:class:`netconf_client.ncclient.Manager` and replaces its session when
+it is lost. Locks and subscriptions taken through it are acquired
+again on the new session, so long-running notification consumers keep
+consuming across outages.
+
+Example:
+
+.. code-block:: python
+
+   from functools import partial
+
+   connect = partial(connect_ssh, host="192.0.2.1", username="admin",
+                     password="pw", keepalive=15)
+   with ReconnectingManager(connect, metrics=metrics, name="r1") as mgr:
+       mgr.create_subscription(stream="NETCONF")
+       while True:
+           n = mgr.take_notification()
+           ...
+"""
+import random
+import time
+from collections import Counter
+from threading import Event, RLock
+
+from lxml import etree
+
+from netconf_client.constants import NAMESPACES
+from netconf_client.error import RpcError, SessionClosedException
+from netconf_client.log import logger
+from netconf_client.ncclient import Manager
+from netconf_client.singleflight import SingleFlight
+
+CAP_REPLAY = "urn:ietf:params:netconf:capability:replay:1.0"
+
+
+def event_time(notification_ele):
+    """The ``<eventTime>`` of a parsed ``<notification>``, or ``None``"""
+    times = notification_ele.xpath(
+        "/notif:notification/notif:eventTime/text()", namespaces=NAMESPACES
+    )
+    return times[0] if times else None
+
+
+class ReconnectingManager:
+    """A :class:`netconf_client.ncclient.Manager` that reconnects when
+    its session is lost
+
+    All methods of :class:`netconf_client.ncclient.Manager` are
+    available. A call that fails because the session was lost
+    reconnects before raising, so the next call uses the new session.
+    Retrieval operations (``get``, ``get_config`` and ``get_data``)
+    are retried once on the new session instead of raising.
+
+    The first reconnect attempt is made as soon as the session is
+    found lost. Further attempts are separated by exponential backoff
+    with full jitter: after failed attempt `n`, a random delay between
+    0 and ``min(max_delay, min_delay * 2 ** (n - 1))`` seconds. The
+    first connection is attempted once, in the constructor, so that
+    configuration errors surface immediately.
+
+    Once connected again, the state taken through this object is
+    replayed:
+
+    * Datastores locked with :meth:`lock` and not unlocked are locked
+      again. Changes made to the candidate datastore are lost with the
+      session, and the datastore may have been changed by others while
+      it was unlocked. A lock that cannot be acquired again is logged
+      and forgotten.
+
+    * Subscriptions created with :meth:`create_subscription` are
+      created again. If the server supports the ``:replay``
+      capability, ``start_time`` is the ``<eventTime>`` of the last
+      notification taken, and the notifications with that time that
+      were already taken are dropped when replayed, so that none are
+      lost or delivered twice. Outside of such a replay, identical
+      notifications are all delivered.
+
+    :param connect: Called without arguments to open a session, e.g.
+                    a :func:`functools.partial` of
+                    :func:`netconf_client.connect.connect_ssh`
+
+    :param float min_delay: Maximum delay after the first failed
+                            reconnect attempt
+
+    :param float max_delay: Maximum delay between reconnect attempts
+
+    :param int max_attempts: Reconnect attempts before giving up and
+                             raising the last error; ``None`` retries
+                             until :meth:`close` is called
+
+    :param metrics: A :class:`netconf_client.metrics.NetconfMetrics`
+                    each session is attached to
+
+    :param str name: The label of the sessions in `metrics`
+
+    :param manager_kwds: Passed on to each
+                         :class:`netconf_client.ncclient.Manager`
+
+    :ivar manager: The :class:`netconf_client.ncclient.Manager` of the current session
+    :ivar int reconnects: Number of sessions re-established
+    :ivar float last_reconnect_duration: Seconds from losing the
+                                         previous session until the
+                                         current one was replayed
+    :ivar str last_event_time: The ``<eventTime>`` of the last
+                               notification taken
+    """
+
+    POLL_INTERVAL = 1.0
+
+    def __init__(
+        self,
+        connect,
+        min_delay=0.5,
+        max_delay=30.0,
+        max_attempts=None,
+        metrics=None,
+        name=None,
+        **manager_kwds
+    ):
+        if metrics is not None and name is None:
+            raise ValueError("A name is required to record metrics")
+        self.connect = connect
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.metrics = metrics
+        self.name = name
+        self.manager_kwds = manager_kwds
+        self.reconnects = 0
+        self.last_reconnect_duration = None
+        self.last_event_time = None
+        self.closed = False
+        # Notifications taken with last_event_time, and those of them
+        # still expected to be replayed after a reconnect
+        self._taken = Counter()
+        self._replayed = Counter()
+        self._locks = []
+        self._subscriptions = []
+        self._lock = RLock()
+        self._closing = Event()
+        self._session_metrics = None
+        self.manager = self._open()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, _, __, ___):
+        self.close()
+
+    def __getattr__(self, name):
+        if name == "manager" or name.startswith("_"):
+            raise AttributeError(name)
+        if not callable(getattr(Manager, name, None)):
+            return getattr(self.manager, name)
+        return lambda *args, **kwds: self._call(name, args, kwds)
+
+    def close(self):
+        """Close the current session and stop reconnecting"""
+        self.closed = True
+        self._closing.set()
+        with self._lock:
+            self.manager.session.close()
+
+    def delay_for(self, attempt):
+        """The delay in seconds after failed reconnect attempt `attempt`"""
+        cap = min(self.max_delay, self.min_delay * 2 ** (attempt - 1))
+        return random.uniform(0, cap)
+
+    def lock(self, target, timeout=None):
+        """Send a ``<lock>`` request, and lock `target` again after reconnecting"""
+        self._call("lock", (target,), {"timeout": timeout})
+        with self._lock:
+            self._locks.append(target)
+
+    def unlock(self, target, timeout=None):
+        """Send an ``<unlock>`` request"""
+        with self._lock:
+            if target in self._locks:
+                self._locks.remove(target)
+        self._call("unlock", (target,), {"timeout": timeout})
+
+    def create_subscription(
+        self, stream=None, filter=None, start_time=None, stop_time=None, timeout=None
+    ):
+        """Send a ``<create-subscription>`` request, and create the
+        subscription again after reconnecting
+
+        The parameters are those of
+        :meth:`netconf_client.ncclient.Manager.create_subscription`
+        """
+        kwds = {
+            "stream": stream,
+            "filter": filter,
+            "start_time": start_time,
+            "stop_time": stop_time,
+            "timeout": timeout,
+        }
+        self._call("create_subscription", (), kwds)
+        with self._lock:
+            self._subscriptions.append(kwds)
+
+    def take_notification(self, block=True, timeout=None):
+        """Retrieve a notification, reconnecting if the session was lost
+
+        The parameters are those of
+        :meth:`netconf_client.ncclient.Manager.take_notification`.
+        Reconnecting blocks regardless of `block` and `timeout`.
+
+        :rtype: :class:`netconf_client.ncclient.Notification`
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            manager = self.manager
+            wait = self.POLL_INTERVAL
+            if deadline is not None:
+                wait = max(min(wait, deadline - time.monotonic()), 0)
+            n = manager.take_notification(block=block, timeout=wait)
+            if n is not None:
+                if self._is_replayed(n):
+                    continue
+                return n
+            if manager.session.closed:
+                self._reconnect(manager)
+            elif not block or (deadline is not None and time.monotonic() >= deadline):
+                return None
+
+    def _is_replayed(self, n):
+        when = event_time(n.notification_ele)
+        if when is None:
+            return False
+        content = etree.tostring(n.notification_ele, method="c14n")
+        if when != self.last_event_time:
+            # Replay starts at last_event_time, so this one is newer
+            self.last_event_time = when
+            self._taken = Counter()
+            self._replayed = Counter()
+        elif self._replayed[content] > 0:
+            self._replayed[content] -= 1
+            return True
+        self._taken[content] += 1
+        return False
+
+    def _call(self, name, args, kwds):
+        manager = self.manager
+        try:
+            return getattr(manager, name)(*args, **kwds)
+        except Exception as e:
+            lost = isinstance(e, SessionClosedException) or manager.session.closed
+            if self.closed or not lost:
+                raise
+            self._reconnect(manager)
+            if name not in SingleFlight.OPERATIONS:
+                raise
+        return getattr(self.manager, name)(*args, **kwds)
+
+    def _open(self):
+        session = self.connect()
+        if self.metrics is not None:
+            self._session_metrics = self.metrics.attach(session, self.name)
+        return Manager(session, **self.manager_kwds)
+
+    def _reconnect(self, failed):
+        with self._lock:
+            if self.closed:
+                raise SessionClosedException()
+            if self.manager is not failed:
+                # Another thread got there first
+                return
+            failed.session.close()
+            lost = time.monotonic()
+            attempt = 0
+            while True:
+                attempt += 1
+                manager = None
+                try:
+                    manager = self._open()
+                    self._replay(manager)
+                    break
+                except Exception as e:
+                    if manager is not None:
+                        manager.session.close()
+                    if self._session_metrics is not None:
+                        self._session_metrics.reconnect_failures.inc()
+                    if self.max_attempts is not None and attempt >= self.max_attempts:
+                        raise
+                    delay = self.delay_for(attempt)
+                    logger.warning(
+                        "Reconnect attempt %d failed (%s); retrying in %.1f seconds",
+                        attempt,
+                        e,
+                        delay,
+                    )
+                    if self._closing.wait(delay):
+                        raise SessionClosedException()
+            self.manager = manager
+            self.reconnects += 1
+            self.last_reconnect_duration = time.monotonic() - lost
+            if self._session_metrics is not None:
+                self._session_metrics.reconnected(self.last_reconnect_duration)
+            logger.info(
+                "Reconnected as session %s after %.1f seconds",
+                manager.session_id,
+                self.last_reconnect_duration,
+            )
+
+    def _replay(self, manager):
+        for target in list(self._locks):
+            try:
+                manager.lock(target)
+            except RpcError as e:
+                logger.error("Could not lock %s again: %s", target, e)
+                self._locks.remove(target)
+        replay = CAP_REPLAY in manager.session.server_capabilities
+        for kwds in list(self._subscriptions):
+            sent = dict(kwds)
+            if replay and self.last_event_time is not None:
+                sent["start_time"] = self.last_event_time
+                self._replayed = Counter(self._taken)
+            try:
+                manager.create_subscription(**sent)
+            except RpcError as e:
+                logger.error("Could not subscribe to %s again: %s", kwds["stream"], e)
+                self._subscriptions.remove(kwds)
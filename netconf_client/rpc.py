@@ -1,5 +1,6 @@
 import uuid
 from typing import Optional
+from xml.sax.saxutils import escape, quoteattr
 
 from lxml import etree
 
@@ -72,6 +73,9 @@ def get_data(
     max_depth=None,
     with_origin=False,
     with_defaults=None,
+    limit=None,
+    offset=None,
+    cursor=None,
     msg_id=None,
 ):
     pieces = []
@@ -97,6 +101,17 @@ def get_data(
         pieces.append("<with-origin/>")
     if with_defaults:
         pieces.append(make_with_defaults(with_defaults))
+    if limit is not None or offset is not None or cursor is not None:
+        pieces.append(
+            '<list-pagination xmlns="urn:ietf:params:xml:ns:yang:ietf-list-pagination-nc">'
+        )
+        if limit is not None:
+            pieces.append("<limit>{}</limit>".format(limit))
+        if offset is not None:
+            pieces.append("<offset>{}</offset>".format(offset))
+        if cursor is not None:
+            pieces.append("<cursor>{}</cursor>".format(cursor))
+        pieces.append("</list-pagination>")
     pieces.append("</get-data>")
     return make_rpc("".join(pieces), msg_id=msg_id)
 
@@ -194,6 +209,172 @@ def create_subscription(
     return make_rpc("".join(pieces), msg_id=msg_id)
 
 
+def _selection_filter(filter, kind):
+    if not isinstance(filter, tuple):
+        return filter
+    if filter[0] == "subtree":
+        return "<{0}-subtree-filter>{1}</{0}-subtree-filter>".format(kind, filter[1])
+    if filter[0] == "xpath":
+        nsmap = filter[2] if len(filter) > 2 else {}
+        return "<{0}-xpath-filter{1}>{2}</{0}-xpath-filter>".format(
+            kind,
+            "".join(
+                " xmlns:{}={}".format(prefix, quoteattr(uri))
+                for (prefix, uri) in nsmap.items()
+            ),
+            escape(filter[1]),
+        )
+    raise NotImplementedError("Unimplemented filter type {}".format(filter[0]))
+
+
+def _subscription_parameters(
+    stream_filter,
+    replay_start_time,
+    datastore,
+    datastore_filter,
+    period,
+    anchor_time,
+    on_change,
+    dampening_period,
+    sync_on_start,
+    excluded_changes,
+    stop_time,
+):
+    pieces = []
+    if stream_filter:
+        pieces.append(_selection_filter(stream_filter, "stream"))
+    if replay_start_time:
+        pieces.append(
+            "<replay-start-time>{}</replay-start-time>".format(replay_start_time)
+        )
+    if stop_time:
+        pieces.append("<stop-time>{}</stop-time>".format(stop_time))
+    if datastore:
+        pieces.append("<yp:datastore>{}</yp:datastore>".format(datastore))
+    if datastore_filter:
+        pieces.append(_selection_filter(datastore_filter, "yp:datastore"))
+    if period is not None:
+        pieces.append("<yp:periodic><yp:period>{}</yp:period>".format(period))
+        if anchor_time:
+            pieces.append("<yp:anchor-time>{}</yp:anchor-time>".format(anchor_time))
+        pieces.append("</yp:periodic>")
+    elif on_change:
+        pieces.append("<yp:on-change>")
+        if dampening_period is not None:
+            pieces.append(
+                "<yp:dampening-period>{}</yp:dampening-period>".format(dampening_period)
+            )
+        if sync_on_start is not None:
+            pieces.append(
+                "<yp:sync-on-start>{}</yp:sync-on-start>".format(
+                    "true" if sync_on_start else "false"
+                )
+            )
+        for change in excluded_changes:
+            pieces.append("<yp:excluded-change>{}</yp:excluded-change>".format(change))
+        pieces.append("</yp:on-change>")
+    return pieces
+
+
+_SUBSCRIPTION_NAMESPACES = (
+    'xmlns="urn:ietf:params:xml:ns:yang:ietf-subscribed-notifications" '
+    'xmlns:yp="urn:ietf:params:xml:ns:yang:ietf-yang-push" '
+    'xmlns:ds="urn:ietf:params:xml:ns:yang:ietf-datastores"'
+)
+
+
+def establish_subscription(
+    stream=None,
+    stream_filter=None,
+    datastore=None,
+    datastore_filter=None,
+    period=None,
+    anchor_time=None,
+    on_change=False,
+    dampening_period=None,
+    sync_on_start=None,
+    excluded_changes=(),
+    replay_start_time=None,
+    stop_time=None,
+    encoding=None,
+    msg_id=None,
+):
+    pieces = []
+    pieces.append("<establish-subscription {}>".format(_SUBSCRIPTION_NAMESPACES))
+    if stream:
+        pieces.append("<stream>{}</stream>".format(stream))
+    pieces.extend(
+        _subscription_parameters(
+            stream_filter,
+            replay_start_time,
+            datastore,
+            datastore_filter,
+            period,
+            anchor_time,
+            on_change,
+            dampening_period,
+            sync_on_start,
+            excluded_changes,
+            stop_time,
+        )
+    )
+    if encoding:
+        pieces.append("<encoding>{}</encoding>".format(encoding))
+    pieces.append("</establish-subscription>")
+    return make_rpc("".join(pieces), msg_id=msg_id)
+
+
+def modify_subscription(
+    id,
+    stream_filter=None,
+    datastore=None,
+    datastore_filter=None,
+    period=None,
+    anchor_time=None,
+    dampening_period=None,
+    stop_time=None,
+    msg_id=None,
+):
+    pieces = []
+    pieces.append("<modify-subscription {}>".format(_SUBSCRIPTION_NAMESPACES))
+    pieces.append("<id>{}</id>".format(id))
+    pieces.extend(
+        _subscription_parameters(
+            stream_filter,
+            None,
+            datastore,
+            datastore_filter,
+            period,
+            anchor_time,
+            dampening_period is not None,
+            dampening_period,
+            None,
+            (),
+            stop_time,
+        )
+    )
+    pieces.append("</modify-subscription>")
+    return make_rpc("".join(pieces), msg_id=msg_id)
+
+
+def delete_subscription(id, msg_id=None):
+    return make_rpc(
+        "<delete-subscription {}><id>{}</id></delete-subscription>".format(
+            _SUBSCRIPTION_NAMESPACES, id
+        ),
+        msg_id=msg_id,
+    )
+
+
+def kill_subscription(id, msg_id=None):
+    return make_rpc(
+        "<kill-subscription {}><id>{}</id></kill-subscription>".format(
+            _SUBSCRIPTION_NAMESPACES, id
+        ),
+        msg_id=msg_id,
+    )
+
+
 def validate(source, msg_id=None):
     pieces = []
     pieces.append("<validate>")
@@ -0,0 +1,163 @@
+"""Client-side queueing of outgoing RPCs
+
+A NETCONF server answers the RPCs of a session in the order they were
+sent, so a small ``<commit>`` sent after a ``<get>`` of the whole
+operational tree waits until that reply has been produced. With a
+:class:`SendScheduler` set on a session, at most `max_in_flight` RPCs
+are outstanding at any time; the others wait on the client and are
+sent by priority, and in the order they were made within a priority,
+as earlier replies arrive.
+
+Example:
+
+.. code-block:: python
+
+   session.scheduler = SendScheduler(max_in_flight=1)
+   with Manager(session) as mgr:
+       # lock and commit overtake queued reads by default
+       ...
+       with mgr.priority(LOW):
+           mgr.get()
+"""
+import heapq
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from netconf_client.error import SessionClosedException
+
+#: Priority of RPCs that should overtake everything else
+HIGH = 0
+#: Priority of RPCs that have no other priority
+NORMAL = 10
+#: Priority of RPCs that may wait behind everything else
+LOW = 20
+
+_LABELS = {HIGH: "high", NORMAL: "normal", LOW: "low"}
+
+#: Priorities by :class:`netconf_client.ncclient.Manager` operation
+DEFAULT_PRIORITIES = {
+    "lock": HIGH,
+    "unlock": HIGH,
+    "commit": HIGH,
+    "cancel_commit": HIGH,
+    "discard_changes": HIGH,
+    "close_session": HIGH,
+    "kill_session": HIGH,
+}
+
+
+def priority_label(priority):
+    """Return the name of `priority` used as a metrics label"""
+    return _LABELS.get(priority, str(priority))
+
+
+class SendScheduler:
+    """Limits the RPCs in flight on one session and orders the rest
+    by priority
+
+    Set an instance as the ``scheduler`` attribute of a single
+    :class:`netconf_client.session.Session`. Priorities are integers;
+    lower values are sent first.
+
+    RPCs that were queued are sent by a sender thread of the
+    scheduler. They become ready to send when an earlier reply
+    resolves its future on the receive thread of the session, which
+    must keep reading: a server writing a large reply may not read
+    until it is done, so writing to the socket from that thread could
+    deadlock both sides.
+
+    :param int max_in_flight: Maximum number of RPCs sent but not yet
+                              answered; ``None`` for no limit
+
+    :param dict priorities: Priority of each
+                            :class:`netconf_client.ncclient.Manager`
+                            operation; defaults to
+                            :data:`DEFAULT_PRIORITIES`, and operations
+                            not listed get :data:`NORMAL`
+
+    :ivar int in_flight: Number of RPCs sent but not yet answered
+    """
+
+    def __init__(self, max_in_flight=None, priorities=None):
+        self.max_in_flight = max_in_flight
+        self.priorities = dict(DEFAULT_PRIORITIES if priorities is None else priorities)
+        self.in_flight = 0
+        self._lock = Lock()
+        self._queue = []
+        self._seq = itertools.count()
+        self._sender = None
+        self._closed = False
+
+    @property
+    def queued(self):
+        """Number of RPCs waiting to be sent"""
+        return len(self._queue)
+
+    def priority_for(self, operation):
+        """Return the priority of `operation`"""
+        return self.priorities.get(operation, NORMAL)
+
+    def submit(self, f, send, priority=NORMAL):
+        """Call `send` once there is room for the RPC with the future `f`
+
+        `send` is called with the :func:`time.monotonic` timestamp at
+        which the RPC was submitted, and must resolve `f` eventually,
+        also if sending fails. The room is taken until `f` is done.
+        """
+        entry = (priority, next(self._seq), time.monotonic(), f, send)
+        with self._lock:
+            # Checked under the lock, so an RPC is either failed by
+            # close() or rejected here
+            if self._closed:
+                raise SessionClosedException()
+            if not self._has_room():
+                heapq.heappush(self._queue, entry)
+                return
+            self.in_flight += 1
+        self._start(entry)
+
+    def close(self):
+        """Reject further RPCs, stop the sender thread, and remove all
+        queued RPCs and return their futures
+
+        Called when the session is closed; later calls of
+        :meth:`submit` raise
+        :class:`netconf_client.error.SessionClosedException`.
+        """
+        with self._lock:
+            self._closed = True
+            (queue, self._queue) = (self._queue, [])
+            if self._sender is not None:
+                self._sender.shutdown(wait=False)
+        return [entry[3] for entry in sorted(queue)]
+
+    def _has_room(self):
+        return self.max_in_flight is None or self.in_flight < self.max_in_flight
+
+    def _start(self, entry):
+        (_, _, queued, f, send) = entry
+        # Added first, so the room is given back even if sending fails
+        # or the future was cancelled while waiting
+        f.add_done_callback(self._release)
+        send(queued)
+
+    def _release(self, _):
+        with self._lock:
+            self.in_flight -= 1
+            entry = None
+            while self._queue and self._has_room():
+                entry = heapq.heappop(self._queue)
+                if not entry[3].cancelled():
+                    self.in_flight += 1
+                    break
+                entry = None
+            if entry is not None:
+                # Submitted under the lock, so that the single sender
+                # thread sends in the order the entries were taken
+                if self._sender is None:
+                    self._sender = ThreadPoolExecutor(
+                        max_workers=1, thread_name_prefix="netconf-send"
+                    )
+                self._sender.submit(self._start, entry)
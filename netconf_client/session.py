@@ -1,5 +1,7 @@
-from threading import Thread
-from concurrent.futures import Future
+import socket
+import time
+from threading import Lock, Thread, current_thread
+from concurrent.futures import Future, InvalidStateError
 from queue import Queue, Empty
 
 from lxml import etree
@@ -7,7 +9,21 @@ from lxml import etree
 from netconf_client.parser import parse_messages
 from netconf_client.log import logger
 from netconf_client.constants import DEFAULT_HELLO, NAMESPACES, CAP_NETCONF_11
-from netconf_client.error import SessionClosedException, RpcError
+from netconf_client.error import (
+    ReplyTooLargeException,
+    SessionClosedException,
+    RpcError,
+)
+from netconf_client.offload import ExtractedReply
+from netconf_client.rpc import close_session
+from netconf_client.scheduler import NORMAL, priority_label
+from netconf_client.tracing import (
+    ATTR_BYTES_RECEIVED,
+    ATTR_SESSION_ID,
+    ATTR_TARGET,
+    get_tracer,
+    peer_address,
+)
 
 
 class Session:
@@ -23,23 +39,89 @@ class Session:
     :ivar client_capabilities: The list of capabilities parsed from
                                the client's ``<hello>``
 
+    :ivar rpc_hooks: The list of callables registered with
+                     :meth:`add_rpc_hook`
+
+    :ivar close_hooks: The list of callables registered with
+                       :meth:`add_close_hook`
+
+    :ivar bool closed: Whether the session has been closed, either by
+                       :meth:`close` or because the connection failed
+
+    :ivar float last_received: :func:`time.monotonic` timestamp of the
+                               last data received from the server
+
+    :ivar parse_offload: A :class:`netconf_client.offload.ParseOffload`
+                         parsing large replies outside of the receive
+                         thread, or ``None``
+
+    :ivar scheduler: A :class:`netconf_client.scheduler.SendScheduler`
+                     limiting the RPCs in flight and ordering queued
+                     RPCs by priority, or ``None`` to send every RPC
+                     immediately
+
+    :ivar notification_router: A
+                               :class:`netconf_client.subscriptions.SubscriptionRouter`
+                               receiving notifications before they are
+                               queued in ``notifications``, or ``None``
+
+    :ivar tracer: The :class:`netconf_client.tracing.Tracer` that was
+                  installed when the session was created
+
+    :ivar int max_reply_size: Size in bytes, including framing, that no
+                              message may exceed; when one does, the
+                              session is closed and the future of the
+                              next awaited reply fails with
+                              :class:`netconf_client.error.ReplyTooLargeException`.
+                              ``None`` (the default) for no limit
+
+    :ivar metrics: The :class:`netconf_client.metrics.SessionMetrics`
+                   updated by this session, or ``None``; set by
+                   :meth:`netconf_client.metrics.NetconfMetrics.attach`
+
     """
 
+    #: Seconds :meth:`close` waits for the receive thread to end
+    JOIN_TIMEOUT = 5
+
     def __init__(self, sock):
         self.sock = sock
         self.mode = "1.0"
+        self.closed = False
+        self._close_lock = Lock()
+        self._send_lock = Lock()
+        self.rpc_hooks = []
+        self.close_hooks = []
+        self.metrics = None
+        self.parse_offload = None
+        self.scheduler = None
+        self.notification_router = None
+        self.max_reply_size = None
+        self.tracer = get_tracer()
+        self._rx_start = None
+        self._rx_bytes = 0
+        self.last_received = time.monotonic()
+        self.rpc_reply_futures = Queue()
 
-        self.send_msg(DEFAULT_HELLO)
-        self.client_hello = DEFAULT_HELLO
-
-        self.parser = parse_messages(sock, self.mode)
-
-        # First message will be the server hello
-        self.server_hello = next(self.parser)
-        server_ele = etree.fromstring(self.server_hello)
-        self.session_id = int(
-            server_ele.xpath("/nc:hello/nc:session-id", namespaces=NAMESPACES)[0].text
-        )
+        with self.tracer.start_span("netconf.hello") as span:
+            self.send_msg(DEFAULT_HELLO)
+            self.client_hello = DEFAULT_HELLO
+
+            self.parser = parse_messages(sock, self.mode, on_recv=self._on_recv)
+
+            # First message will be the server hello
+            self.server_hello = next(self.parser)
+            self._rx_start = None
+            self._rx_bytes = 0
+            server_ele = etree.fromstring(self.server_hello)
+            session_id_ele = server_ele.xpath(
+                "/nc:hello/nc:session-id", namespaces=NAMESPACES
+            )[0]
+            self.session_id = int(session_id_ele.text)
+            if self.tracer.enabled:
+                span.set_attribute(ATTR_TARGET, peer_address(sock))
+                span.set_attribute(ATTR_SESSION_ID, self.session_id)
+                span.set_attribute(ATTR_BYTES_RECEIVED, len(self.server_hello))
         self.server_capabilities = capabilities_from_hello(server_ele)
 
         client_ele = etree.fromstring(self.client_hello)
@@ -53,7 +135,6 @@ class Session:
 
         self.unknown_recvq = Queue()
         self.notifications = Queue()
-        self.rpc_reply_futures = Queue()
         self.thread = Thread(target=self._recv_loop)
         self.thread.daemon = True
         self.thread.start()
@@ -64,79 +145,523 @@ class Session:
     def __exit__(self, _, __, ___):
         self.close()
 
-    def close(self):
-        """Closes any associated sockets and frees any other associated resources"""
+    def close(self, error=SessionClosedException, timeout=None):
+        """Closes any associated sockets and frees any other associated resources
+
+        Futures of RPCs still waiting for a reply fail with `error`,
+        and any later :meth:`send_rpc` raises
+        :class:`netconf_client.error.SessionClosedException`. The
+        session is also closed this way when the connection fails or
+        is closed by the server.
+
+        The socket is shut down before it is closed, and the receive
+        thread is joined (for at most :attr:`JOIN_TIMEOUT` seconds),
+        so no thread or transport outlives the call. This method may
+        be called several times and from several threads.
+
+        :param error: The exception type to fail pending futures with,
+                      e.g.
+                      :class:`netconf_client.error.PeerUnreachableException`
+
+        :param float timeout: If given, a ``<close-session>`` is sent
+                              first, and its reply awaited for at most
+                              this many seconds
+        """
+        if timeout is not None and not self.closed:
+            try:
+                self.send_rpc(close_session()).result(timeout=timeout)
+            except Exception as e:
+                logger.info("No reply to <close-session>: %r", e)
+        with self._close_lock:
+            first = not self.closed
+            self.closed = True
+        if first:
+            self._teardown(error)
+            for hook in self.close_hooks:
+                self._run_close_hook(hook)
+        thread = getattr(self, "thread", None)
+        if thread is not None and thread is not current_thread():
+            thread.join(self.JOIN_TIMEOUT)
+
+    def _teardown(self, error):
+        # Closing a socket does not wake up a thread blocked reading
+        # from it, shutting it down does
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except Exception:
+            pass
         try:
             self.sock.close()
         except Exception:
             pass
+        # Wait for a concurrent send_rpc() to queue its future; any
+        # later call sees the closed flag
+        with self._send_lock:
+            pass
 
+        # Queued RPCs are failed first, so that failing the RPCs in
+        # flight does not send them
+        if self.scheduler is not None:
+            for f in self.scheduler.close():
+                self._fail(f, error())
         try:
             while True:
                 f = self.rpc_reply_futures.get(block=False)
-                f.set_exception(SessionClosedException())
+                self._fail(f, error())
                 self.rpc_reply_futures.task_done()
         except Empty:
             pass
 
+    def _fail(self, f, e):
+        if f.done():
+            return
+        f.set_exception(e)
+        if f.timing is not None:
+            f.timing.resolved = time.monotonic()
+            f.timing.error = e
+            self._run_rpc_hooks(f.timing)
+
+    def add_rpc_hook(self, hook):
+        """Register a callable that receives the :class:`RpcTiming` of
+        every RPC sent on this session once its future is resolved
+
+        Hooks are called from the receive thread (or from
+        :meth:`close`), so they should return quickly. Exceptions
+        raised by a hook are logged and otherwise ignored. While no
+        hook is registered, no timing information is collected.
+
+        :param hook: A callable taking a single :class:`RpcTiming`
+        """
+        # Replaced rather than modified, so the receive thread can
+        # iterate over the list without holding a lock
+        self.rpc_hooks = self.rpc_hooks + [hook]
+
+    def remove_rpc_hook(self, hook):
+        """Unregister a hook added with :meth:`add_rpc_hook`"""
+        hooks = list(self.rpc_hooks)
+        hooks.remove(hook)
+        self.rpc_hooks = hooks
+
+    def add_close_hook(self, hook):
+        """Register a callable that is called with this session once
+        it is closed
+
+        Hooks are called from the thread closing the session, which
+        may be the receive thread. Exceptions raised by a hook are
+        logged and otherwise ignored. If the session is already
+        closed, `hook` is called immediately.
+
+        :param hook: A callable taking the :class:`Session`
+        """
+        with self._close_lock:
+            if not self.closed:
+                self.close_hooks = self.close_hooks + [hook]
+                return
+        self._run_close_hook(hook)
+
+    def _run_close_hook(self, hook):
+        try:
+            hook(self)
+        except Exception:
+            logger.exception("Close hook %r failed", hook)
+
     def send_msg(self, msg):
         """Sends a raw byte string to the server
 
+        Messages sent concurrently from several threads are never
+        interleaved on the wire.
+
         :param bytes msg: The byte string to send
+
+        :return: The number of bytes written including the framing
         """
+        with self._send_lock:
+            return self._write(msg)
+
+    def _write(self, msg):
         logger.debug("Sending message on session %s", msg)
         if self.mode == "1.0":
-            self.sock.sendall(msg + b"]]>]]>")
+            data = msg + b"]]>]]>"
         elif self.mode == "1.1":
-            self.sock.sendall(frame_message_11(msg))
-
-    def send_rpc(self, rpc):
+            data = frame_message_11(msg)
+        self.sock.sendall(data)
+        if self.metrics is not None:
+            self.metrics.bytes_sent.inc(len(data))
+        return len(data)
+
+    def send_rpc(
+        self,
+        rpc,
+        timing=None,
+        extract=None,
+        priority=None,
+        max_reply_size=None,
+        progress=None,
+    ):
         """Sends a raw RPC to the server
 
+        This method may be called from several threads at once; each
+        future is resolved with the reply to its own RPC.
+
         :param bytes rpc: The RPC to send
 
-        :rtype: :class:`concurrent.futures.Future` with a result type
-                of tuple(:class:`bytes`, :class:`lxml.Element`)
+        :param timing: An :class:`RpcTiming` to fill in, e.g. with the
+                       build stage already recorded; one is created
+                       automatically if any RPC hooks are registered
+
+        :param extract: A picklable function applied to the reply
+                        element if the reply is parsed in a worker
+                        process (see :attr:`parse_offload`)
+
+        :param int priority: The priority of the RPC if it has to wait
+                             for the :attr:`scheduler`; defaults to
+                             :data:`netconf_client.scheduler.NORMAL`
+
+        :param int max_reply_size: Size in bytes, including framing,
+                                   the reply may not exceed, in
+                                   addition to :attr:`max_reply_size`
+
+        :param progress: A callable receiving the number of bytes
+                         received so far of the message arriving
+                         while this RPC is the next awaiting a reply;
+                         it is called from the receive thread for
+                         every chunk read from the socket
+
+        :rtype: :class:`RpcFuture` with a result type of
+                tuple(:class:`bytes`, :class:`lxml.Element`), or
+                tuple(:class:`bytes`,
+                :class:`netconf_client.offload.ExtractedReply`) if
+                the reply was parsed in a worker process
 
         """
-        f = Future()
-        self.rpc_reply_futures.put(f)
-        self.send_msg(rpc)
+        if timing is None and self.rpc_hooks:
+            timing = RpcTiming()
+        f = RpcFuture(timing, extract, max_reply_size, progress)
+        scheduler = self.scheduler
+        if scheduler is None:
+            self._send_rpc_now(f, rpc)
+            return f
+        if self.closed:
+            raise SessionClosedException()
+        if priority is None:
+            priority = NORMAL
+
+        def send(queued):
+            if timing is not None:
+                timing.queued = queued
+            if self.metrics is not None:
+                self.metrics.queue_wait(
+                    priority_label(priority), time.monotonic() - queued
+                )
+            try:
+                self._send_rpc_now(f, rpc)
+            except Exception as e:
+                self._fail(f, e)
+
+        scheduler.submit(f, send, priority)
         return f
 
+    def _send_rpc_now(self, f, rpc):
+        timing = f.timing
+        # Replies arrive in the order the RPCs were sent, so the
+        # future must be queued in the same step as the RPC is written
+        with self._send_lock:
+            if self.closed:
+                raise SessionClosedException()
+            # From now on the RPC cannot be cancelled
+            if not f.set_running_or_notify_cancel():
+                return
+            self.rpc_reply_futures.put(f)
+            try:
+                if timing is None:
+                    self._write(rpc)
+                else:
+                    timing.send_start = time.monotonic()
+                    timing.bytes_sent = self._write(rpc)
+                    timing.send_end = time.monotonic()
+            except Exception as e:
+                error = e
+            else:
+                return
+        # The future is queued, and the RPC may be partially written,
+        # so later replies could no longer be matched to their RPCs
+        logger.warning("Closing session: sending an RPC failed: %s", error)
+        self._fail(f, error)
+        self.close()
+        raise error
+
+    def _on_recv(self, data):
+        now = time.monotonic()
+        self.last_received = now
+        if self._rx_start is None:
+            self._rx_start = now
+        if self.metrics is not None:
+            self.metrics.bytes_received.inc(len(data))
+        # A chunk completing one message may already start the next,
+        # so sizes are approximate at message boundaries
+        self._rx_bytes += len(data)
+        limit = self.max_reply_size
+        try:
+            f = self.rpc_reply_futures.queue[0]
+        except IndexError:
+            f = None
+        if f is not None:
+            if f.progress is not None:
+                try:
+                    f.progress(self._rx_bytes)
+                except Exception:
+                    logger.exception("Progress callback %r failed", f.progress)
+            if f.max_reply_size is not None:
+                limit = min(f.max_reply_size, limit or f.max_reply_size)
+        if limit is not None and self._rx_bytes > limit:
+            raise ReplyTooLargeException(limit, self._rx_bytes)
+
+    def _abort(self, e):
+        """Fail the next awaited reply with `e` and close the session"""
+        try:
+            f = self.rpc_reply_futures.get(block=False)
+        except Empty:
+            pass
+        else:
+            self.rpc_reply_futures.task_done()
+            self._fail(f, e)
+        self.close()
+
+    def _run_rpc_hooks(self, timing):
+        for hook in self.rpc_hooks:
+            try:
+                hook(timing)
+            except Exception:
+                logger.exception("RPC hook %r failed", hook)
+
+    def _trace_notification(self, msg):
+        attributes = {ATTR_SESSION_ID: self.session_id, ATTR_BYTES_RECEIVED: len(msg)}
+        self.tracer.start_span("netconf.notification", attributes).end()
+
+    def _offload_reply(self, offload, msg, first_byte, last_byte):
+        try:
+            f = self.rpc_reply_futures.get(block=False)
+        except Empty:
+            # Parsed in this thread and reported like any unexpected reply
+            return False
+        self.rpc_reply_futures.task_done()
+        if self.metrics is not None:
+            self.metrics.rpc_replies.inc()
+        timing = f.timing
+        if timing is not None:
+            timing.first_byte = first_byte
+            timing.last_byte = last_byte
+            timing.bytes_received = len(msg)
+        try:
+            parsed = offload.submit(msg, f.extract)
+        except Exception as e:
+            self._resolve_offloaded(f, msg, e)
+        else:
+            parsed.add_done_callback(lambda p: self._resolve_offloaded(f, msg, p))
+        return True
+
+    def _resolve_offloaded(self, f, msg, parsed):
+        if f.done():
+            # Already failed, e.g. when the session was closed
+            return
+        timing = f.timing
+        if timing is not None:
+            timing.parse_done = time.monotonic()
+        try:
+            if isinstance(parsed, Exception):
+                raise parsed
+            (is_error, value) = parsed.result()
+            if is_error:
+                raise RpcError(msg, etree.fromstring(msg))
+            f.set_result((msg, ExtractedReply(value)))
+        except Exception as e:
+            f.set_exception(e)
+            if timing is not None:
+                timing.error = e
+        if timing is not None:
+            timing.resolved = time.monotonic()
+            self._run_rpc_hooks(timing)
+
     def _recv_loop(self):
         while True:
             try:
                 msg = self.parser.send(self.mode)
-                ele = etree.fromstring(msg)
+                last_byte = time.monotonic()
+                first_byte = self._rx_start or last_byte
+                # If the next message started in the same chunk, its
+                # first byte is approximated by the next chunk's arrival
+                self._rx_start = None
+                self._rx_bytes = 0
+                offload = self.parse_offload
+                if offload is not None and offload.accepts(msg):
+                    ele = None
+                else:
+                    ele = etree.fromstring(msg)
+            except ReplyTooLargeException as e:
+                logger.warning("Closing session: %s", str(e))
+                self._abort(e)
+                return
             except Exception as e:
                 logger.info("Stopping recv thread due to exception %s", str(e))
+                # Nothing can be received anymore, so pending RPCs are
+                # failed now rather than left to time out
+                if not self.closed:
+                    self.close()
                 return
 
+            if ele is None:
+                if self._offload_reply(offload, msg, first_byte, last_byte):
+                    continue
+                ele = etree.fromstring(msg)
+
+            metrics = self.metrics
             if ele.xpath("/nc:rpc-reply", namespaces=NAMESPACES):
+                if metrics is not None:
+                    metrics.rpc_replies.inc()
                 try:
                     f = self.rpc_reply_futures.get(block=False)
-
-                    if ele.xpath("/nc:rpc-reply/nc:rpc-error", namespaces=NAMESPACES):
-                        f.set_exception(RpcError(msg, ele))
-                    else:
-                        f.set_result((msg, ele))
+                    timing = f.timing
+                    if timing is not None:
+                        timing.first_byte = first_byte
+                        timing.last_byte = last_byte
+                        timing.bytes_received = len(msg)
+                        timing.parse_done = time.monotonic()
+
+                    try:
+                        if ele.xpath(
+                            "/nc:rpc-reply/nc:rpc-error", namespaces=NAMESPACES
+                        ):
+                            e = RpcError(msg, ele)
+                            f.set_exception(e)
+                            if timing is not None:
+                                timing.error = e
+                        else:
+                            f.set_result((msg, ele))
+                    except InvalidStateError:
+                        # Already failed, e.g. when the session was closed
+                        logger.info("Dropping the reply to a failed RPC: %s", msg)
                     self.rpc_reply_futures.task_done()
+                    if timing is not None:
+                        timing.resolved = time.monotonic()
+                        self._run_rpc_hooks(timing)
                     msg = None
                 except Empty:
+                    if metrics is not None:
+                        metrics.dropped_replies.inc()
                     logger.warning(
                         "An <rpc-reply> was received "
                         "with no corresponding handler: %s",
                         msg,
                     )
             elif ele.xpath("/notif:notification", namespaces=NAMESPACES):
-                self.notifications.put((msg, ele))
+                if metrics is not None:
+                    metrics.notifications.inc()
+                if self.tracer.enabled:
+                    self._trace_notification(msg)
+                router = self.notification_router
+                if router is None or not router.route(msg, ele):
+                    self.notifications.put((msg, ele))
                 msg = None
+            elif metrics is not None:
+                metrics.unknown.inc()
 
             if msg is not None:
                 self.unknown_recvq.put((msg, ele))
 
 
+class RpcFuture(Future):
+    """The :class:`concurrent.futures.Future` returned by :meth:`Session.send_rpc`
+
+    :ivar timing: The :class:`RpcTiming` of the RPC, or ``None`` if
+                  no timing information is being collected
+
+    :ivar extract: The function passed to :meth:`Session.send_rpc`
+
+    :ivar max_reply_size: The maximum reply size passed to
+                          :meth:`Session.send_rpc`
+
+    :ivar progress: The progress callback passed to
+                    :meth:`Session.send_rpc`
+    """
+
+    def __init__(self, timing=None, extract=None, max_reply_size=None, progress=None):
+        super().__init__()
+        self.timing = timing
+        self.extract = extract
+        self.max_reply_size = max_reply_size
+        self.progress = progress
+
+
+class RpcTiming:
+    """Timestamps of the stages of a single RPC
+
+    All timestamps are taken with :func:`time.monotonic`; stages that
+    did not happen (e.g. the build stage for RPCs sent directly with
+    :meth:`Session.send_rpc`, or the receive stages when the session
+    was closed first) are ``None``.
+
+    :ivar str operation: The operation name (e.g. ``"get_config"``)
+                         when sent through the
+                         :class:`netconf_client.ncclient.Manager`
+    :ivar float build_start: Start of building the RPC XML
+    :ivar float build_end: End of building the RPC XML
+    :ivar float queued: The RPC was handed to the session's
+                        :class:`netconf_client.scheduler.SendScheduler`
+    :ivar float send_start: Start of writing the RPC to the socket
+    :ivar float send_end: End of writing the RPC to the socket
+    :ivar float first_byte: Arrival of the first received chunk
+                            containing the reply
+    :ivar float last_byte: The complete reply has been framed
+    :ivar float parse_done: XML parsing of the reply is done
+    :ivar float resolved: The future's result or exception was set
+    :ivar int bytes_sent: Bytes written, including framing
+    :ivar int bytes_received: Size of the reply, excluding framing
+    :ivar error: The exception set on the future, if any
+    """
+
+    STAGES = (
+        ("build", "build_start", "build_end"),
+        ("queue", "queued", "send_start"),
+        ("send", "send_start", "send_end"),
+        ("wait", "send_end", "first_byte"),
+        ("receive", "first_byte", "last_byte"),
+        ("parse", "last_byte", "parse_done"),
+        ("resolve", "parse_done", "resolved"),
+    )
+
+    def __init__(self, operation=None):
+        self.operation = operation
+        self.build_start = None
+        self.build_end = None
+        self.queued = None
+        self.send_start = None
+        self.send_end = None
+        self.first_byte = None
+        self.last_byte = None
+        self.parse_done = None
+        self.resolved = None
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.error = None
+
+    def durations(self):
+        """Return the seconds spent in each stage that completed
+
+        The stages are ``build``, ``queue`` (waiting for the
+        session's scheduler), ``send``, ``wait`` (server
+        processing and network latency until the first byte of the
+        reply), ``receive``, ``parse`` and ``resolve``.
+
+        :rtype: dict
+        """
+        result = {}
+        for (name, start, end) in RpcTiming.STAGES:
+            (t0, t1) = (getattr(self, start), getattr(self, end))
+            if t0 is not None and t1 is not None:
+                result[name] = t1 - t0
+        return result
+
+
 def capabilities_from_hello(hello):
     return [
         x.text
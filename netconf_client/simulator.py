@@ -0,0 +1,402 @@
+"""An in-process NETCONF server for benchmarks and end-to-end tests
+
+The simulator does not implement any datastore. It answers every
+``<rpc>`` with either a ``<data>`` reply of a configurable size (for
+``<get>``, ``<get-config>`` and ``<get-data>``) or ``<ok/>``, and
+after a ``<create-subscription>`` it emits notifications at a
+configurable rate. It speaks both :rfc:`6242` framing modes over
+plain TCP, TLS or SSH.
+"""
+import re
+import socket
+import time
+from datetime import datetime, timezone
+from threading import Event, Lock, Thread
+
+import paramiko
+
+from netconf_client.constants import DELIMITER_10, DELIMITER_11
+from netconf_client.log import logger
+from netconf_client.parser import parse_messages
+
+CAP_BASE_10 = "urn:ietf:params:netconf:base:1.0"
+CAP_BASE_11 = "urn:ietf:params:netconf:base:1.1"
+CAP_NOTIFICATION = "urn:ietf:params:netconf:capability:notification:1.0"
+
+_MESSAGE_ID_R = re.compile(rb'message-id="([^"]*)"')
+_DATA_OPERATION_R = re.compile(rb"<(?:\w+:)?(get|get-config|get-data)[\s/>]")
+
+_REPLY_HEADER = (
+    b'<rpc-reply message-id="%s" xmlns="urn:ietf:params:xml:ns:netconf:base:1.0">'
+)
+_REPLY_FOOTER = b"</rpc-reply>"
+
+_ENTRY = (
+    b"<interface><name>eth%d</name>"
+    b"<in-octets>%d</in-octets><out-octets>%d</out-octets></interface>"
+)
+
+
+def make_data(size):
+    """Return a ``<data>`` element of roughly `size` bytes
+
+    The content is a list of interface counters, which resembles the
+    operational data returned by real devices.
+    """
+    entries = []
+    length = 0
+    i = 0
+    while length < size:
+        entry = _ENTRY % (i, i * 1000003, i * 999983)
+        entries.append(entry)
+        length += len(entry)
+        i += 1
+    return (
+        b'<data xmlns="urn:ietf:params:xml:ns:netconf:base:1.0">'
+        b'<interfaces xmlns="urn:example:simulator">'
+        + b"".join(entries)
+        + b"</interfaces></data>"
+    )
+
+
+def frame(msg, mode, chunk_size=None):
+    """Frame `msg` for sending in NETCONF `mode` (``"1.0"`` or ``"1.1"``)"""
+    if mode == "1.0":
+        return msg + DELIMITER_10
+    chunk_size = chunk_size or len(msg)
+    pieces = []
+    for i in range(0, len(msg), chunk_size):
+        chunk = msg[i : i + chunk_size]
+        pieces.append(b"\n#%d\n" % len(chunk))
+        pieces.append(chunk)
+    pieces.append(DELIMITER_11)
+    return b"".join(pieces)
+
+
+class NetconfSimulator:
+    """A NETCONF server running in background threads
+
+    This class is a context manager; the server listens between
+    entering and leaving the ``with`` block.
+
+    Example of benchmarking a :class:`netconf_client.ncclient.Manager`
+    over plain TCP:
+
+    .. code-block:: python
+
+       with NetconfSimulator(reply_size=100000, latency=0.001) as server:
+           sock = socket.create_connection(("127.0.0.1", server.port))
+           with Manager(Session(sock)) as mgr:
+               mgr.get()
+
+    :param str transport: ``"tcp"``, ``"tls"`` or ``"ssh"``
+
+    :param str host: Address to listen on
+
+    :param int port: TCP port to listen on; 0 picks a free port
+
+    :param bool base11: Advertise :rfc:`6242` chunked framing; if the
+                        client advertises it too, the session switches
+                        to it after the ``<hello>``
+
+    :param int reply_size: Approximate size in bytes of the ``<data>``
+                           returned for retrieval operations
+
+    :param float latency: Seconds to wait before sending each reply
+
+    :param int chunk_size: Maximum chunk size when sending with
+                           chunked framing; by default each message is
+                           sent as a single chunk
+
+    :param float notification_rate: Notifications sent per second
+                                    after a ``<create-subscription>``;
+                                    0 disables notifications
+
+    :param ssl_context: Server-side :class:`ssl.SSLContext`; required
+                        for the ``"tls"`` transport
+
+    :param host_key: :class:`paramiko.pkey.PKey` used as host key for
+                     the ``"ssh"`` transport; generated if not given
+
+    :param capabilities: Additional capabilities to advertise
+
+    :ivar int port: The port the server is listening on
+    :ivar int rpc_count: Number of RPCs answered so far
+    """
+
+    def __init__(
+        self,
+        transport="tcp",
+        host="127.0.0.1",
+        port=0,
+        base11=True,
+        reply_size=0,
+        latency=0.0,
+        chunk_size=None,
+        notification_rate=0,
+        ssl_context=None,
+        host_key=None,
+        capabilities=(),
+    ):
+        if transport not in ("tcp", "tls", "ssh"):
+            raise ValueError("Unsupported transport {}".format(transport))
+        if transport == "tls" and ssl_context is None:
+            raise ValueError("The tls transport requires an ssl_context")
+        self.transport = transport
+        self.host = host
+        self.port = port
+        self.base11 = base11
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.notification_rate = notification_rate
+        self.ssl_context = ssl_context
+        self.host_key = host_key
+        self.capabilities = [CAP_BASE_10, CAP_NOTIFICATION] + list(capabilities)
+        if base11:
+            self.capabilities.append(CAP_BASE_11)
+        self.data = make_data(reply_size)
+        self.rpc_count = 0
+
+        self._listener = None
+        self._running = False
+        self._lock = Lock()
+        self._closeables = set()
+        self._next_session_id = 1
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, _, __, ___):
+        self.stop()
+
+    def start(self):
+        if self.transport == "ssh" and self.host_key is None:
+            self.host_key = paramiko.ECDSAKey.generate()
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind((self.host, self.port))
+        self._listener.listen(128)
+        self.port = self._listener.getsockname()[1]
+        self._running = True
+        Thread(target=self._accept_loop, daemon=True).start()
+
+    def stop(self):
+        """Stop listening and close all open connections"""
+        self._running = False
+        try:
+            self._listener.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._listener.close()
+        with self._lock:
+            closeables = list(self._closeables)
+            self._closeables.clear()
+        for c in closeables:
+            try:
+                if isinstance(c, socket.socket):
+                    # Wakes up the thread blocked in recv() on it
+                    c.shutdown(socket.SHUT_RDWR)
+                c.close()
+            except Exception:
+                pass
+
+    def _track(self, closeable):
+        with self._lock:
+            self._closeables.add(closeable)
+
+    def _untrack(self, closeable):
+        with self._lock:
+            self._closeables.discard(closeable)
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                (sock, _) = self._listener.accept()
+            except OSError:
+                return
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            except OSError:
+                # Already reset by the client
+                sock.close()
+                continue
+            Thread(target=self._handle_connection, args=(sock,), daemon=True).start()
+
+    def _handle_connection(self, sock):
+        self._track(sock)
+        if self.transport == "tcp":
+            self.serve(sock)
+            self._untrack(sock)
+            sock.close()
+        elif self.transport == "tls":
+            try:
+                conn = self.ssl_context.wrap_socket(sock, server_side=True)
+            except OSError as e:
+                logger.info("Simulator TLS handshake failed: %s", e)
+                self._untrack(sock)
+                sock.close()
+                return
+            self.serve(conn)
+            self._untrack(sock)
+            conn.close()
+        else:
+            transport = paramiko.Transport(sock)
+            transport.add_server_key(self.host_key)
+            self._track(transport)
+            try:
+                transport.start_server(server=_SshServer(self))
+                transport.join()
+            except (paramiko.SSHException, EOFError, OSError) as e:
+                logger.info("Simulator SSH handshake failed: %s", e)
+            self._untrack(transport)
+            transport.close()
+
+    def _allocate_session_id(self):
+        with self._lock:
+            session_id = self._next_session_id
+            self._next_session_id += 1
+        return session_id
+
+    def serve(self, conn):
+        """Run a NETCONF session on `conn` until the client disconnects
+
+        `conn` must provide ``recv``, ``sendall`` and ``close``.
+        """
+        session = _SimulatedSession(self, conn, self._allocate_session_id())
+        try:
+            session.run()
+        except Exception as e:
+            logger.debug("Simulator session %s ended: %s", session.session_id, e)
+        finally:
+            session.stop.set()
+
+    def hello(self, session_id):
+        caps = "".join(
+            "<capability>{}</capability>".format(c) for c in self.capabilities
+        )
+        return (
+            '<hello xmlns="urn:ietf:params:xml:ns:netconf:base:1.0">'
+            "<capabilities>{}</capabilities>"
+            "<session-id>{}</session-id>"
+            "</hello>".format(caps, session_id)
+        ).encode("utf-8")
+
+
+class _SimulatedSession:
+    def __init__(self, server, conn, session_id):
+        self.server = server
+        self.conn = conn
+        self.session_id = session_id
+        self.mode = "1.0"
+        self.send_lock = Lock()
+        self.stop = Event()
+        self.notifier = None
+
+    def send(self, msg):
+        data = frame(msg, self.mode, self.server.chunk_size)
+        with self.send_lock:
+            self.conn.sendall(data)
+
+    def run(self):
+        self.send(self.server.hello(self.session_id))
+        parser = parse_messages(self.conn, self.mode)
+        client_hello = next(parser)
+        if self.server.base11 and CAP_BASE_11.encode("ascii") in client_hello:
+            self.mode = "1.1"
+
+        while True:
+            try:
+                msg = parser.send(self.mode)
+            except StopIteration:
+                return
+            if not self.handle(msg):
+                return
+
+    def handle(self, msg):
+        m = _MESSAGE_ID_R.search(msg)
+        msg_id = m.group(1) if m else b""
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        header = _REPLY_HEADER % msg_id
+        if _DATA_OPERATION_R.search(msg):
+            body = self.server.data
+        else:
+            body = b"<ok/>"
+        with self.server._lock:
+            self.server.rpc_count += 1
+        self.send(header + body + _REPLY_FOOTER)
+
+        if b"close-session" in msg:
+            self.stop.set()
+            self.conn.close()
+            return False
+        if b"create-subscription" in msg and self.server.notification_rate:
+            if self.notifier is None:
+                self.notifier = Thread(target=self._notify, daemon=True)
+                self.notifier.start()
+        return True
+
+    def _notify(self):
+        interval = 1.0 / self.server.notification_rate
+        next_time = time.monotonic()
+        seq = 0
+        while not self.stop.is_set():
+            now = time.monotonic()
+            if now < next_time:
+                self.stop.wait(next_time - now)
+                continue
+            next_time += interval
+            seq += 1
+            event_time = datetime.now(timezone.utc).isoformat()
+            try:
+                self.send(
+                    (
+                        '<notification xmlns="urn:ietf:params:xml:ns:netconf:notification:1.0">'
+                        "<eventTime>{}</eventTime>"
+                        '<tick xmlns="urn:example:simulator"><seq>{}</seq></tick>'
+                        "</notification>"
+                    )
+                    .format(event_time, seq)
+                    .encode("utf-8")
+                )
+            except Exception:
+                return
+
+
+class _SshServer(paramiko.ServerInterface):
+    """Accepts any credentials and serves the ``netconf`` subsystem"""
+
+    def __init__(self, simulator):
+        self.simulator = simulator
+
+    def get_allowed_auths(self, username):
+        return "password,publickey"
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_auth_publickey(self, username, key):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_UNKNOWN_CHANNEL_TYPE
+
+    def check_channel_subsystem_request(self, channel, name):
+        if name != "netconf":
+            return False
+        Thread(target=self._serve_channel, args=(channel,), daemon=True).start()
+        return True
+
+    def _serve_channel(self, channel):
+        self.simulator._track(channel)
+        self.simulator.serve(channel)
+        self.simulator._untrack(channel)
+        try:
+            channel.close()
+        except (EOFError, OSError):
+            # The client already tore down the transport
+            pass
@@ -0,0 +1,78 @@
+import re
+from concurrent.futures import Future
+from threading import Lock
+
+_MESSAGE_ID_R = re.compile(rb'message-id="[^"]*"')
+
+
+class SingleFlight:
+    """Shares identical read-only RPCs that are in flight at the same time
+
+    While a ``<get>``, ``<get-config>`` or ``<get-data>`` is waiting
+    for its reply, a :class:`netconf_client.ncclient.Manager` using
+    this object hands later callers making the same request the same
+    future instead of sending the request again. The request is sent
+    again once the reply has arrived.
+
+    Callers sharing a request also share the parsed reply, so they
+    must not modify it.
+
+    One instance can be shared by several managers (e.g. a pool of
+    sessions), but only if they all talk to the same device.
+
+    :ivar int hits: Number of requests that were not sent because an
+                    identical one was already in flight
+    """
+
+    OPERATIONS = ("get", "get_config", "get_data")
+
+    def __init__(self):
+        self.hits = 0
+        self._lock = Lock()
+        self._in_flight = {}
+
+    @staticmethod
+    def key(rpc_xml, *extra):
+        """Return the key identifying `rpc_xml`, ignoring its message-id"""
+        return (_MESSAGE_ID_R.sub(b"", rpc_xml, 1),) + extra
+
+    def submit(self, key, send):
+        """Return the future of the request identified by `key`
+
+        If no such request is in flight, `send` is called to send it;
+        it must return the :class:`concurrent.futures.Future` of the
+        reply.
+        """
+        with self._lock:
+            shared = self._in_flight.get(key)
+            if shared is not None:
+                self.hits += 1
+                return shared
+            shared = self._in_flight[key] = Future()
+
+        try:
+            f = send()
+        except BaseException as e:
+            self._done(key)
+            shared.set_exception(e)
+            raise
+
+        def resolve(f):
+            # Forget the request first, so that anyone asking after
+            # the reply has arrived sends a fresh request
+            self._done(key)
+            try:
+                e = f.exception()
+            except BaseException as cancelled:
+                e = cancelled
+            if e is not None:
+                shared.set_exception(e)
+            else:
+                shared.set_result(f.result())
+
+        f.add_done_callback(resolve)
+        return shared
+
+    def _done(self, key):
+        with self._lock:
+            self._in_flight.pop(key, None)
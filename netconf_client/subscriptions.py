@@ -0,0 +1,235 @@
+"""Per-subscription notification streams (:rfc:`8639`, :rfc:`8641`)
+
+A session may carry several subscriptions established with
+:meth:`netconf_client.ncclient.Manager.establish_subscription`. Their
+notifications all carry the subscription ``<id>``, which a
+:class:`SubscriptionRouter` uses to deliver each one to the
+:class:`Subscription` it belongs to, decoded as a
+:class:`SubscriptionNotification`.
+
+Example:
+
+.. code-block:: python
+
+   router = SubscriptionRouter(mgr.session)
+   counters = router.establish(
+       mgr,
+       datastore="ds:operational",
+       datastore_filter=("xpath", "/if:interfaces-state", {"if": IF_NS}),
+       period=500,
+   )
+   for update in counters:
+       process(update.content)
+"""
+from collections import deque
+from queue import Empty, Queue
+from threading import Lock
+
+from netconf_client.constants import NAMESPACES
+from netconf_client.log import logger
+
+#: Notifications that end a subscription
+TERMINATING = ("subscription-terminated", "subscription-completed")
+
+
+class SubscriptionNotification:
+    """A notification of an :rfc:`8639` subscription
+
+    :ivar str kind: The name of the notification, e.g.
+                    ``"push-update"``, ``"push-change-update"``,
+                    ``"subscription-terminated"`` or
+                    ``"subscription-completed"``
+    :ivar int id: The subscription ID
+    :ivar str event_time: The ``<eventTime>`` of the notification
+    :ivar content: The ``<datastore-contents>`` of a ``push-update``,
+                   the ``<datastore-changes>`` of a
+                   ``push-change-update``, and otherwise the element
+                   named `kind`
+    :ivar bytes notification_xml: The raw notification as received from the server
+    :ivar notification_ele: The lxml parsed representation of the notification
+    """
+
+    def __init__(self, raw, ele, kind, id, event_time, content):
+        self.notification_xml = raw
+        self.notification_ele = ele
+        self.kind = kind
+        self.id = id
+        self.event_time = event_time
+        self.content = content
+
+
+def decode(raw, ele):
+    """Decode a ``<notification>`` of an :rfc:`8639` subscription
+
+    :returns: A :class:`SubscriptionNotification`, or ``None`` if the
+              notification does not belong to a subscription
+    """
+    body = ele.xpath(
+        "/notif:notification/*[(namespace-uri() = $sn or namespace-uri() = $yp)"
+        " and (sn:id or yp:id)]",
+        namespaces=NAMESPACES,
+        sn=NAMESPACES["sn"],
+        yp=NAMESPACES["yp"],
+    )
+    if not body:
+        return None
+    body = body[0]
+    kind = body.tag.rpartition("}")[2]
+    content = body
+    if kind == "push-update":
+        content = body.find("{{{}}}datastore-contents".format(NAMESPACES["yp"]))
+    elif kind == "push-change-update":
+        content = body.find("{{{}}}datastore-changes".format(NAMESPACES["yp"]))
+    event_time = ele.findtext("{{{}}}eventTime".format(NAMESPACES["notif"]))
+    id = int(body.findtext("{*}id").strip())
+    return SubscriptionNotification(raw, ele, kind, id, event_time, content)
+
+
+class Subscription:
+    """The notifications of one subscription
+
+    Iterating over this object yields its notifications until it is
+    terminated, completes at its stop time, or its session is closed.
+
+    :ivar int id: The subscription ID
+    :ivar bool terminated: Whether the subscription ended
+    :ivar int received: Notifications received
+    """
+
+    #: Seconds between checks for a closed session while iterating
+    POLL_INTERVAL = 1.0
+
+    def __init__(self, router, id):
+        self.router = router
+        self.id = id
+        self.terminated = False
+        self.received = 0
+        self._queue = Queue()
+
+    def __iter__(self):
+        while True:
+            n = self.take(timeout=self.POLL_INTERVAL)
+            if n is not None:
+                yield n
+                if n.kind in TERMINATING:
+                    return
+            elif self.terminated or self.router.session.closed:
+                return
+
+    def take(self, block=True, timeout=None):
+        """Retrieve the next notification of this subscription
+
+        :param bool block: If ``True``, the call will block the
+                           current thread until a notification is
+                           received or until `timeout` is exceeded
+
+        :param float timeout: The number of seconds to wait when
+                              `block` is ``True``; when ``None``, the
+                              call can block indefinitely
+
+        :rtype: :class:`SubscriptionNotification`
+        """
+        try:
+            return self._queue.get(block=block, timeout=timeout)
+        except Empty:
+            return None
+
+    def _put(self, n):
+        self.received += 1
+        self._queue.put(n)
+
+
+class SubscriptionRouter:
+    """Routes the notifications of a session to its subscriptions
+
+    Once created, all subscription notifications of `session` are
+    delivered to the :class:`Subscription` with their ID; other
+    notifications are still queued for
+    :meth:`netconf_client.ncclient.Manager.take_notification`.
+
+    A notification may arrive before its subscription is registered
+    with :meth:`subscribe`, e.g. the first update right after the
+    ``<establish-subscription>`` reply. Up to `max_pending` such
+    notifications are held for the subscription; beyond that, the
+    oldest are dropped.
+
+    :param session: The :class:`netconf_client.session.Session` to route for
+
+    :param int max_pending: Notifications of unknown subscriptions to hold
+    """
+
+    def __init__(self, session, max_pending=1000):
+        self.session = session
+        self.max_pending = max_pending
+        self._lock = Lock()
+        self._subscriptions = {}
+        self._pending = deque()
+        session.notification_router = self
+
+    def establish(self, manager, **kwds):
+        """Establish a subscription and register it
+
+        The keyword arguments are those of
+        :meth:`netconf_client.ncclient.Manager.establish_subscription`.
+
+        :rtype: :class:`Subscription`
+        """
+        return self.subscribe(manager.establish_subscription(**kwds))
+
+    def delete(self, manager, subscription):
+        """Delete a subscription of this session and unregister it"""
+        manager.delete_subscription(subscription.id)
+        self.unsubscribe(subscription)
+
+    def subscribe(self, id):
+        """Register the subscription with ID `id`
+
+        :rtype: :class:`Subscription`
+        """
+        subscription = Subscription(self, id)
+        with self._lock:
+            self._subscriptions[id] = subscription
+            pending = [n for n in self._pending if n.id == id]
+            if pending:
+                self._pending = deque(n for n in self._pending if n.id != id)
+            for n in pending:
+                self._deliver(subscription, n)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Stop routing notifications to `subscription`"""
+        with self._lock:
+            if self._subscriptions.get(subscription.id) is subscription:
+                del self._subscriptions[subscription.id]
+        subscription.terminated = True
+
+    def route(self, raw, ele):
+        """Deliver a notification to its subscription
+
+        Called by the receive thread of the session.
+
+        :returns: Whether the notification belongs to a subscription
+        """
+        n = decode(raw, ele)
+        if n is None:
+            return False
+        with self._lock:
+            subscription = self._subscriptions.get(n.id)
+            if subscription is None:
+                if len(self._pending) >= self.max_pending:
+                    dropped = self._pending.popleft()
+                    logger.warning(
+                        "Dropping %s of unknown subscription %s",
+                        dropped.kind,
+                        dropped.id,
+                    )
+                self._pending.append(n)
+            else:
+                self._deliver(subscription, n)
+        return True
+
+    def _deliver(self, subscription, n):
+        subscription._put(n)
+        if n.kind in TERMINATING:
+            subscription.terminated = True
+            del self._subscriptions[subscription.id]
@@ -0,0 +1,150 @@
+"""RPC timeouts derived from the latency observed so far
+
+A :class:`netconf_client.ncclient.Manager` has a single static
+timeout, which is either too long to notice a dead device quickly or
+too short for a large ``<get-config>``. With an
+:class:`AdaptiveTimeout`, the deadline of each RPC is instead a
+multiple of a high percentile of the recent durations of the same
+operation, limited by a floor and a ceiling.
+
+Example:
+
+.. code-block:: python
+
+   with Manager(session, adaptive_timeout=AdaptiveTimeout(ceiling=600)) as mgr:
+       mgr.get_config()
+"""
+import math
+from collections import deque
+from threading import Lock
+
+#: The deadline is the observed percentile times the multiplier
+SOURCE_ADAPTIVE = "adaptive"
+#: Too few samples; the manager's static timeout applies
+SOURCE_DEFAULT = "default"
+#: The adaptive deadline was raised to the floor
+SOURCE_FLOOR = "floor"
+#: The adaptive deadline was lowered to the ceiling
+SOURCE_CEILING = "ceiling"
+
+
+class _Samples:
+    def __init__(self, window):
+        self.durations = deque(maxlen=window)
+        self.percentile = None
+        self.timeouts = 0
+
+    def add(self, duration):
+        self.durations.append(duration)
+        self.percentile = None
+
+
+class AdaptiveTimeout:
+    """Tracks RPC durations per operation and picks deadlines from them
+
+    One instance may be shared by the managers of all sessions to the
+    same device, so that a new session starts with what is already
+    known about that device. Durations are kept per operation rather
+    than per reply size, as the size of a reply is not known before
+    it arrives; the percentile of an operation reflects its largest
+    replies anyway.
+
+    RPCs that timed out have no duration and are only counted, see
+    :meth:`timeouts`. Recording their deadline as a duration would let
+    a device that stopped answering raise its own deadline with every
+    timeout, up to the ceiling.
+
+    :param float multiplier: Factor applied to the percentile
+
+    :param float floor: Shortest deadline in seconds
+
+    :param float ceiling: Longest deadline in seconds
+
+    :param float percentile: The percentile of the durations to use,
+                             between 0 and 1
+
+    :param int window: Number of recent durations kept per operation
+
+    :param int min_samples: Durations needed before the deadline of an
+                            operation is adapted; until then the
+                            manager's static timeout is used
+    """
+
+    def __init__(
+        self,
+        multiplier=3.0,
+        floor=5.0,
+        ceiling=600.0,
+        percentile=0.99,
+        window=500,
+        min_samples=20,
+    ):
+        self.multiplier = multiplier
+        self.floor = floor
+        self.ceiling = ceiling
+        self.percentile = percentile
+        self.window = window
+        self.min_samples = min_samples
+        self._lock = Lock()
+        self._samples = {}
+
+    def observe(self, operation, duration):
+        """Record the `duration` in seconds of an `operation`"""
+        with self._lock:
+            samples = self._samples.get(operation)
+            if samples is None:
+                samples = self._samples[operation] = _Samples(self.window)
+            samples.add(duration)
+
+    def timed_out(self, operation):
+        """Record that an `operation` timed out
+
+        Its deadline is not a duration, so the deadline of further
+        RPCs is not affected.
+        """
+        with self._lock:
+            samples = self._samples.get(operation)
+            if samples is None:
+                samples = self._samples[operation] = _Samples(self.window)
+            samples.timeouts += 1
+
+    def timeouts(self, operation):
+        """Return how many RPCs of `operation` timed out"""
+        with self._lock:
+            samples = self._samples.get(operation)
+            return 0 if samples is None else samples.timeouts
+
+    def observed(self, operation):
+        """Return the percentile of the recorded durations of
+        `operation`, or ``None`` if there are fewer than
+        `min_samples`"""
+        with self._lock:
+            samples = self._samples.get(operation)
+            if samples is None or len(samples.durations) < self.min_samples:
+                return None
+            # Sorting is only repeated after new samples have arrived
+            if samples.percentile is None:
+                ordered = sorted(samples.durations)
+                index = math.ceil(self.percentile * len(ordered)) - 1
+                samples.percentile = ordered[max(index, 0)]
+            return samples.percentile
+
+    def timeout_for(self, operation, default):
+        """Return the deadline in seconds for the next `operation`
+
+        :param float default: The timeout used while too few durations
+                              are known
+
+        :return: tuple(deadline, source), where source is one of
+                 :data:`SOURCE_ADAPTIVE`, :data:`SOURCE_DEFAULT`,
+                 :data:`SOURCE_FLOOR` or :data:`SOURCE_CEILING`
+        """
+        observed = self.observed(operation)
+        if observed is None:
+            return (default, SOURCE_DEFAULT)
+        deadline = observed * self.multiplier
+        if deadline < self.floor:
+            return (self.floor, SOURCE_FLOOR)
+        if deadline > self.ceiling:
+            return (self.ceiling, SOURCE_CEILING)
+        return (deadline, SOURCE_ADAPTIVE)
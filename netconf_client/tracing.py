@@ -0,0 +1,183 @@
+"""Pluggable tracing of connections, RPCs and notifications
+
+Nothing is traced by default. To trace, subclass :class:`Tracer` and
+:class:`Span` (usually as a thin adapter around the tracing library
+already in use) and install the tracer with :func:`set_tracer`.
+Sessions use the tracer installed when they are created.
+
+Example of an adapter for OpenTelemetry:
+
+.. code-block:: python
+
+   from opentelemetry import trace
+   from opentelemetry.trace.propagation.tracecontext import (
+       TraceContextTextMapPropagator,
+   )
+
+   class OtelSpan(Span):
+       def __init__(self, span):
+           self.span = span
+
+       def set_attribute(self, key, value):
+           self.span.set_attribute(key, value)
+
+       def record_exception(self, exception):
+           self.span.record_exception(exception)
+
+       def end(self):
+           self.span.end()
+
+       def traceparent(self):
+           carrier = {}
+           ctx = trace.set_span_in_context(self.span)
+           TraceContextTextMapPropagator().inject(carrier, ctx)
+           return carrier.get("traceparent")
+
+   class OtelTracer(Tracer):
+       enabled = True
+       propagate = True
+
+       def start_span(self, name, attributes=None):
+           tracer = trace.get_tracer("netconf_client")
+           return OtelSpan(tracer.start_span(name, attributes=attributes))
+
+   set_tracer(OtelTracer())
+
+The following spans are created:
+
+``netconf.connect``
+    Around :func:`netconf_client.connect.connect_ssh` and
+    :func:`netconf_client.connect.connect_tls`
+``netconf.hello``
+    The ``<hello>`` exchange of a new
+    :class:`netconf_client.session.Session`
+``netconf.rpc``
+    Each RPC sent through a :class:`netconf_client.ncclient.Manager`,
+    from building the request until the reply was received
+``netconf.notification``
+    Each notification received
+
+Attributes use the keys defined as constants in this module.
+"""
+import uuid
+
+ATTR_TRANSPORT = "netconf.transport"
+ATTR_TARGET = "netconf.target"
+ATTR_SESSION_ID = "netconf.session_id"
+ATTR_OPERATION = "netconf.operation"
+ATTR_MESSAGE_ID = "netconf.message_id"
+ATTR_BYTES_SENT = "netconf.bytes_sent"
+ATTR_BYTES_RECEIVED = "netconf.bytes_received"
+ATTR_ERROR_TAG = "netconf.error_tag"
+
+_TRACEPARENT_SEP = ";traceparent="
+
+
+class Span:
+    """A unit of traced work
+
+    This base class records nothing. A span is a context manager that
+    records any exception raised in the ``with`` block and ends the
+    span on exit.
+    """
+
+    def set_attribute(self, key, value):
+        pass
+
+    def record_exception(self, exception):
+        pass
+
+    def end(self):
+        pass
+
+    def traceparent(self):
+        """Return the W3C ``traceparent`` header value identifying this
+        span, or ``None`` if trace context cannot be propagated"""
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, _, exception, __):
+        if exception is not None:
+            self.record_exception(exception)
+        self.end()
+
+
+_NOOP_SPAN = Span()
+
+
+class Tracer:
+    """Creates spans; this base class is the no-op tracer
+
+    :cvar bool enabled: Whether spans are wanted at all; instrumented
+                        code does not even collect attributes while
+                        this is ``False``
+
+    :cvar bool propagate: Whether the trace context of each RPC span
+                          is embedded into the ``message-id`` of the
+                          request (see :func:`message_id`)
+    """
+
+    enabled = False
+    propagate = False
+
+    def start_span(self, name, attributes=None):
+        """Start and return a new :class:`Span`
+
+        :param str name: The name of the span, e.g. ``"netconf.rpc"``
+
+        :param dict attributes: Initial attributes of the span
+        """
+        return _NOOP_SPAN
+
+
+NOOP_TRACER = Tracer()
+
+_tracer = NOOP_TRACER
+
+
+def set_tracer(tracer):
+    """Install `tracer` for all sessions created from now on
+
+    Pass ``None`` to restore the no-op tracer.
+    """
+    global _tracer
+    _tracer = NOOP_TRACER if tracer is None else tracer
+
+
+def get_tracer():
+    """Return the currently installed :class:`Tracer`"""
+    return _tracer
+
+
+def message_id(span=None):
+    """Return a new unique ``message-id``
+
+    If `span` provides a ``traceparent`` it is appended to the
+    identifier, so that a server (or a capture of the traffic) can
+    correlate the request with the client's trace.
+    """
+    msg_id = str(uuid.uuid4())
+    traceparent = span.traceparent() if span is not None else None
+    if traceparent:
+        msg_id += _TRACEPARENT_SEP + traceparent
+    return msg_id
+
+
+def trace_context(msg_id):
+    """Return the ``traceparent`` embedded by :func:`message_id`, or ``None``"""
+    (_, sep, traceparent) = str(msg_id).partition(_TRACEPARENT_SEP)
+    return traceparent if sep else None
+
+
+def peer_address(sock):
+    """Return ``"host:port"`` of the server `sock` is connected to, or ``None``"""
+    for s in (sock, getattr(sock, "sock", None)):
+        try:
+            peer = s.getpeername()
+        except Exception:
+            continue
+        if isinstance(peer, tuple) and len(peer) >= 2:
+            return "{}:{}".format(peer[0], peer[1])
+    return None
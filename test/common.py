@@ -1,3 +1,26 @@
+import re
+from queue import Queue
+
+from netconf_client.constants import DELIMITER_10
+
+SERVER_HELLO = b"""
+  <hello xmlns="urn:ietf:params:xml:ns:netconf:base:1.0">
+    <capabilities>
+      <capability>urn:ietf:params:netconf:base:1.0</capability>
+    </capabilities>
+    <session-id>4</session-id>
+  </hello>
+"""
+
+SERVER_HELLO_11 = b"""
+  <hello xmlns="urn:ietf:params:xml:ns:netconf:base:1.0">
+    <capabilities>
+      <capability>urn:ietf:params:netconf:base:1.1</capability>
+    </capabilities>
+    <session-id>4</session-id>
+  </hello>
+"""
+
 RPC_ERROR_WITH_MSG = b"""
 <rpc-reply message-id="101"
   xmlns="urn:ietf:params:xml:ns:netconf:base:1.0"
@@ -28,3 +51,52 @@ RPC_ERROR_WITHOUT_MSG = b"""
   </rpc-error>
 </rpc-reply>
 """
+
+
+def rpc_reply(message_id, body=b"<ok/>"):
+    return (
+        b'<rpc-reply xmlns="urn:ietf:params:xml:ns:netconf:base:1.0" message-id="'
+        + message_id
+        + b'">'
+        + body
+        + b"</rpc-reply>"
+    )
+
+
+class MockSock:
+    """Sends `hello`, then only what is pushed; records what is sent"""
+
+    def __init__(self, hello=SERVER_HELLO):
+        self.recvs = Queue()
+        self.recvs.put(hello + DELIMITER_10)
+        self.sent = []
+
+    def sendall(self, b):
+        self.sent.append(b)
+
+    def push(self, msg):
+        self.recvs.put(msg + DELIMITER_10)
+
+    def recv(self, _=-1):
+        return self.recvs.get()
+
+    def close(self):
+        self.recvs.put(b"")
+
+
+class AnsweringSock(MockSock):
+    """Answers every RPC, by default with <ok/>, and records its message-id"""
+
+    def __init__(self, hello=SERVER_HELLO):
+        super().__init__(hello)
+        self.message_ids = []
+
+    def sendall(self, b):
+        super().sendall(b)
+        match = re.search(rb'message-id="([^"]+)"', b)
+        if match is not None:
+            self.message_ids.append(match.group(1))
+            self.answer(match.group(1), b)
+
+    def answer(self, message_id, rpc):
+        self.push(rpc_reply(message_id))
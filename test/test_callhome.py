@@ -0,0 +1,135 @@
+import socket
+from queue import Queue
+from unittest.mock import patch
+
+import pytest
+
+from common import SERVER_HELLO
+
+from netconf_client.callhome import CallhomeDevice, CallhomeServer, DeviceRegistry
+from netconf_client.constants import DELIMITER_10
+from netconf_client.session import Session
+
+
+def plain_connect(sock=None, **kwds):
+    return Session(sock)
+
+
+def call_home(port):
+    device = socket.create_connection(("127.0.0.1", port))
+    device.sendall(SERVER_HELLO + DELIMITER_10)
+    return device
+
+
+def test_callhome_server_registers_devices():
+    ready = Queue()
+    with patch("netconf_client.callhome.connect_ssh", plain_connect):
+        with CallhomeServer(
+            "ssh", bind_to="127.0.0.1", port=0, on_connect=ready.put
+        ) as server:
+            devices = [call_home(server.port) for _ in range(5)]
+            connected = [ready.get(timeout=5) for _ in devices]
+
+    # All devices share 127.0.0.1, but not their port
+    assert len(server.registry) == 5
+    assert len(server.registry.by_host("127.0.0.1")) == 5
+    assert {d.address for d in connected} == {d.getsockname() for d in devices}
+    for device in connected:
+        assert server.registry.by_address(device.address) is device
+        assert device.protocol == "ssh"
+        assert device.identity is None
+        assert device.session.session_id == 4
+        device.session.close()
+    # Closed sessions are unregistered
+    assert len(server.registry) == 0
+    for d in devices:
+        d.close()
+
+
+def test_callhome_server_replaces_reconnecting_device():
+    ready = Queue()
+    with patch("netconf_client.callhome.connect_ssh", plain_connect), patch(
+        "netconf_client.callhome.peer_identity", lambda session: "SHA256:a"
+    ):
+        with CallhomeServer(
+            "ssh", bind_to="127.0.0.1", port=0, on_connect=ready.put
+        ) as server:
+            first = call_home(server.port)
+            old = ready.get(timeout=5)
+            second = call_home(server.port)
+            new = ready.get(timeout=5)
+
+    assert old.session.closed
+    assert server.registry.devices() == [new]
+    assert server.registry.by_identity("SHA256:a") is new
+    new.session.close()
+    assert len(server.registry) == 0
+    first.close()
+    second.close()
+
+
+def test_callhome_server_handshake_failure():
+    errors = Queue()
+
+    def failing_connect(sock=None, **kwds):
+        raise ValueError("bad handshake")
+
+    with patch("netconf_client.callhome.connect_tls", failing_connect):
+        with CallhomeServer(
+            "tls",
+            bind_to="127.0.0.1",
+            port=0,
+            on_error=lambda address, e: errors.put((address, e)),
+        ) as server:
+            device = call_home(server.port)
+            (address, e) = errors.get(timeout=5)
+
+    assert address == device.getsockname()
+    assert isinstance(e, ValueError)
+    assert len(server.registry) == 0
+    device.close()
+
+
+def test_callhome_server_default_ports():
+    assert CallhomeServer("ssh").port == 4334
+    assert CallhomeServer("tls").port == 4335
+    with pytest.raises(ValueError):
+        CallhomeServer("telnet")
+
+
+def test_callhome_server_stop_before_start():
+    CallhomeServer("ssh").stop()
+
+
+def test_device_registry():
+    registry = DeviceRegistry()
+    first = CallhomeDevice(None, "ssh", ("192.0.2.1", 1000), "SHA256:a")
+    second = CallhomeDevice(None, "ssh", ("192.0.2.2", 1000), None)
+    behind_nat = CallhomeDevice(None, "ssh", ("192.0.2.1", 1001), "SHA256:b")
+    assert registry.add(first) == []
+    assert registry.add(second) == []
+    assert registry.add(behind_nat) == []
+    assert registry.by_host("192.0.2.1") == [first, behind_nat]
+    assert registry.by_address(("192.0.2.1", 1000)) is first
+    assert registry.by_identity("SHA256:a") is first
+    assert registry.by_host("192.0.2.2") == [second]
+    assert len(registry) == 3
+
+    # A reconnect replaces the earlier entry; removing the stale one is a no-op
+    again = CallhomeDevice(None, "ssh", ("192.0.2.1", 2000), "SHA256:a")
+    assert registry.add(again) == [first]
+    registry.remove(first)
+    assert registry.by_address(("192.0.2.1", 1000)) is None
+    assert registry.by_identity("SHA256:a") is again
+
+    # So does a device connecting from the same address
+    reused = CallhomeDevice(None, "ssh", ("192.0.2.2", 1000), None)
+    assert registry.add(reused) == [second]
+
+    registry.remove(again)
+    assert registry.by_host("192.0.2.1") == [behind_nat]
+    assert registry.by_identity("SHA256:a") is None
+    assert sorted(registry.devices(), key=lambda d: d.address) == [
+        behind_nat,
+        reused,
+    ]
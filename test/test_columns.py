@@ -0,0 +1,75 @@
+import pickle
+from array import array
+
+import pytest
+from lxml import etree
+
+from netconf_client.columns import ColumnExtractor, Columns
+from netconf_client.simulator import make_data
+
+NS = "{urn:example:simulator}"
+
+REPLY = b"""<rpc-reply xmlns="urn:ietf:params:xml:ns:netconf:base:1.0" message-id="1">
+<data><queues xmlns="urn:x">
+  <queue><name>q0</name><stats><drops>5</drops></stats><rate>1.5</rate></queue>
+  <queue><name>q1</name><stats/></queue>
+</queues></data></rpc-reply>"""
+
+
+def counters():
+    return ColumnExtractor(
+        NS + "interface",
+        {
+            "name": (NS + "name", None),
+            "in": NS + "in-octets",
+            "out": NS + "out-octets",
+        },
+    )
+
+
+def test_extract_children():
+    data = etree.fromstring(make_data(1000))
+    columns = counters()(data)
+    assert columns.rows == len(data.findall(".//" + NS + "interface"))
+    assert columns["name"][:2] == ["eth0", "eth1"]
+    assert columns["in"][:2] == array("Q", [0, 1000003])
+    assert isinstance(columns["out"], array)
+
+
+def test_extract_paths_and_defaults():
+    extractor = ColumnExtractor(
+        "{urn:x}queue",
+        {
+            "name": ("{urn:x}name", None),
+            "drops": "{urn:x}stats/{urn:x}drops",
+            "rate": ("{urn:x}rate", "d"),
+        },
+        default=0,
+    )
+    for columns in (extractor(etree.fromstring(REPLY)), extractor.parse(REPLY)):
+        assert columns.rows == 2
+        assert columns["drops"] == array("Q", [5, 0])
+        assert columns["rate"] == array("d", [1.5, 0.0])
+        assert columns["name"] == ["q0", "q1"]
+
+
+def test_streaming_matches_tree():
+    raw = make_data(100000)
+    assert counters().parse(raw) == counters()(etree.fromstring(raw))
+
+
+def test_picklable():
+    extractor = counters()
+    extractor(etree.fromstring(make_data(300)))
+    columns = pickle.loads(pickle.dumps(extractor))(etree.fromstring(make_data(300)))
+    columns = pickle.loads(pickle.dumps(columns))
+    assert isinstance(columns, Columns)
+    assert columns.rows == len(columns["in"])
+
+
+def test_to_numpy():
+    numpy = pytest.importorskip("numpy")
+    columns = counters()(etree.fromstring(make_data(1000)))
+    arrays = columns.to_numpy()
+    assert arrays["in"].dtype == numpy.uint64
+    assert arrays["in"][1] == 1000003
@@ -0,0 +1,315 @@
+import os
+import ssl
+from threading import Barrier, Thread
+from unittest.mock import patch
+
+import paramiko
+import pytest
+
+from common import SERVER_HELLO_11, MockSock
+
+from netconf_client.connect import (
+    CONNECT_PHASES,
+    SshSessionSock,
+    TlsContext,
+    clear_key_cache,
+    connect_many,
+    connect_ssh,
+    connect_ssh_channel,
+    _tls_endpoint,
+    _try_load_hostkey_b64,
+    _try_load_pkey,
+)
+from netconf_client.error import SessionClosedException
+from netconf_client.session import Session
+from netconf_client.simulator import NetconfSimulator
+
+
+class MockChannel(MockSock):
+    def __init__(self):
+        super().__init__(SERVER_HELLO_11)
+        self.closed = False
+        self.subsystem = None
+        self.timeout = None
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def invoke_subsystem(self, name):
+        self.subsystem = name
+
+    def recv(self, _=-1):
+        if self.closed:
+            raise Exception()
+        return super().recv()
+
+    def close(self):
+        self.closed = True
+        super().close()
+
+
+class MockTransport:
+    def __init__(self, sock=None):
+        self.sock = sock
+        self.channels = []
+        self.closed = False
+        self.joined = None
+        self.handshake_timeout = 15
+        self.auth_timeout = 30
+        self.banner_timeout = 15
+        self.username = None
+
+    def connect(self, username=None, password=None, pkey=None):
+        if password == "wrong":
+            raise paramiko.AuthenticationException()
+        self.username = username
+
+    def open_session(self, timeout=None):
+        channel = MockChannel()
+        self.channels.append(channel)
+        return channel
+
+    def close(self):
+        self.closed = True
+
+    # Stands in for the transport thread
+    def is_alive(self):
+        return not self.joined
+
+    def join(self, timeout=None):
+        self.joined = timeout
+
+
+class MockSocket:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_ssh_channels_share_transport():
+    sock = MockSocket()
+    transport = MockTransport()
+    first = Session(SshSessionSock(sock, transport, transport.open_session()))
+    second = connect_ssh_channel(first, general_timeout=5)
+    third = connect_ssh_channel(second)
+
+    assert len(transport.channels) == 3
+    assert transport.channels[1].subsystem == "netconf"
+    assert transport.channels[1].timeout == 5
+    assert second.sock.transport is transport
+    assert first.sock.refs.count == 3
+
+    first.close()
+    second.close()
+    assert transport.channels[0].closed
+    assert transport.channels[1].closed
+    assert not transport.closed
+    assert not sock.closed
+    assert transport.joined is None
+
+    # Closing the same session twice must not release the transport
+    second.close()
+    assert first.sock.refs.count == 1
+
+    third.close()
+    assert transport.closed
+    assert sock.closed
+    assert transport.joined == Session.JOIN_TIMEOUT
+
+    with pytest.raises(SessionClosedException):
+        connect_ssh_channel(third)
+
+
+def test_ssh_session_concurrent_close():
+    sock = MockSocket()
+    transport = MockTransport()
+    first = Session(SshSessionSock(sock, transport, transport.open_session()))
+    second = connect_ssh_channel(first)
+
+    barrier = Barrier(32)
+
+    def close():
+        barrier.wait()
+        second.sock.close()
+
+    threads = [Thread(target=close) for _ in range(32)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert first.sock.refs.count == 1
+    assert not transport.closed
+    first.close()
+    assert transport.closed
+    assert transport.joined == Session.JOIN_TIMEOUT
+
+
+def test_ssh_channel_requires_ssh_session():
+    class FakeSession:
+        sock = MockSocket()
+
+    with pytest.raises(TypeError):
+        connect_ssh_channel(FakeSession())
+
+
+class MockSslSock:
+    def __init__(self, session):
+        self.session = session
+
+    def getpeername(self):
+        return ("192.0.2.1", 50123)
+
+
+def test_tls_context_defaults():
+    context = TlsContext()
+    assert context.ssl_context.verify_mode == ssl.CERT_NONE
+    assert not context.ssl_context.check_hostname
+    assert context.ssl_context.minimum_version == ssl.TLSVersion.TLSv1_2
+    assert context.ssl_context.maximum_version == ssl.TLSVersion.MAXIMUM_SUPPORTED
+
+    context = TlsContext(maximum_version=ssl.TLSVersion.TLSv1_2)
+    assert context.ssl_context.maximum_version == ssl.TLSVersion.TLSv1_2
+
+
+def test_tls_context_sessions():
+    context = TlsContext()
+    assert context.get_session(("a", 6513)) is None
+
+    context.store_session(("a", 6513), MockSslSock("session-a"))
+    context.store_session(("b", 6513), MockSslSock(None))
+    context.store_session(None, MockSslSock("no-endpoint"))
+    assert context.get_session(("a", 6513)) == "session-a"
+    assert context.get_session(("b", 6513)) is None
+    assert context.get_session(None) is None
+
+    context.clear_sessions()
+    assert context.get_session(("a", 6513)) is None
+
+
+def test_tls_context_without_resumption():
+    context = TlsContext(resume_sessions=False)
+    context.store_session(("a", 6513), MockSslSock("session-a"))
+    assert context.get_session(("a", 6513)) is None
+
+
+def test_tls_endpoint():
+    assert _tls_endpoint("device", 6513, None) == ("device", 6513)
+    assert _tls_endpoint(None, 6513, MockSslSock(None)) == ("192.0.2.1", None)
+    assert _tls_endpoint(None, 6513, object()) is None
+
+
+@pytest.fixture()
+def key_file(tmp_path):
+    clear_key_cache()
+    path = str(tmp_path / "id_ecdsa")
+    paramiko.ECDSAKey.generate().write_private_key_file(path, password="secret")
+    yield path
+    clear_key_cache()
+
+
+def test_pkey_cache(key_file):
+    with patch.object(
+        paramiko.RSAKey,
+        "from_private_key_file",
+        side_effect=paramiko.SSHException(),
+    ) as rsa:
+        key = _try_load_pkey(key_file, "secret")
+        assert isinstance(key, paramiko.ECDSAKey)
+        assert rsa.call_count == 1
+
+        # Unchanged file: served from the cache
+        assert _try_load_pkey(key_file, "secret") is key
+
+        # Rewritten file: reparsed, but starting with the class that worked
+        stat = os.stat(key_file)
+        os.utime(key_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+        reloaded = _try_load_pkey(key_file, "secret")
+        assert reloaded is not key
+        assert reloaded == key
+        assert rsa.call_count == 1
+
+
+def test_pkey_cache_passphrase(key_file):
+    assert _try_load_pkey(key_file, "wrong") is None
+    assert _try_load_pkey(key_file, "secret") is not None
+    assert _try_load_pkey(key_file, "wrong") is None
+
+
+def test_pkey_missing_file(tmp_path):
+    assert _try_load_pkey(str(tmp_path / "missing")) is None
+
+
+def test_hostkey_cache():
+    clear_key_cache()
+    data = paramiko.ECDSAKey.generate().get_base64()
+    key = _try_load_hostkey_b64(data)
+    assert isinstance(key, paramiko.ECDSAKey)
+    assert _try_load_hostkey_b64(data) is key
+    clear_key_cache()
+    assert _try_load_hostkey_b64(data) is not key
+
+
+def mock_create_connection(address, timeout=None):
+    if address[0] == "unreachable":
+        raise ConnectionRefusedError()
+    sock = MockSocket()
+    sock.timeout = timeout
+    return sock
+
+
+def test_connect_many():
+    endpoints = [
+        dict(host="a", username="admin", password="pw", general_timeout=30),
+        dict(host="unreachable", port=1830),
+        dict(host="b", password="wrong"),
+        dict(host="c"),
+    ]
+    with patch("socket.create_connection", mock_create_connection), patch(
+        "paramiko.transport.Transport", MockTransport
+    ):
+        results = list(
+            connect_many(endpoints, max_parallel=2, timeouts={"tcp": 3, "ssh": 7})
+        )
+
+    by_host = {r.endpoint["host"]: r for r in results}
+    assert set(by_host) == {"a", "b", "c", "unreachable"}
+
+    ok = by_host["a"]
+    assert ok.error is None and ok.failed_phase is None
+    assert set(ok.timings) == set(CONNECT_PHASES)
+    assert ok.session.session_id == 4
+    assert ok.session.sock.sock.timeout == 3
+    assert ok.session.sock.transport.handshake_timeout == 7
+    assert ok.session.sock.transport.auth_timeout == 7
+    assert ok.session.sock.transport.username == "admin"
+    assert ok.session.sock.channel.timeout == 30
+    ok.session.close()
+    assert ok.session.sock.transport.joined == Session.JOIN_TIMEOUT
+    by_host["c"].session.close()
+
+    refused = by_host["unreachable"]
+    assert isinstance(refused.error, ConnectionRefusedError)
+    assert refused.failed_phase == "tcp"
+    assert refused.session is None
+    assert refused.timings == {}
+
+    denied = by_host["b"]
+    assert isinstance(denied.error, paramiko.AuthenticationException)
+    assert denied.failed_phase == "ssh"
+    assert set(denied.timings) == {"tcp"}
+
+
+def test_ssh_teardown_joins_threads():
+    with NetconfSimulator("ssh") as server:
+        session = connect_ssh(
+            host="127.0.0.1", port=server.port, username="u", password="p"
+        )
+        second = connect_ssh_channel(session)
+        transport = session.sock.transport
+        session.close(timeout=5)
+        assert transport.is_alive()
+        second.close()
+        assert not transport.is_alive()
+        assert not session.thread.is_alive() and not second.thread.is_alive()
@@ -0,0 +1,75 @@
+import socket
+import time
+
+import pytest
+
+from common import AnsweringSock, MockSock
+
+from netconf_client.connect import connect_ssh
+from netconf_client.error import PeerUnreachableException
+from netconf_client.keepalive import Keepalive, set_tcp_keepalive
+from netconf_client.session import Session
+from netconf_client.simulator import NetconfSimulator
+
+TEST_RPC = b'<rpc message-id="101" xmlns="urn:ietf:params:xml:ns:netconf:base:1.0"/>'
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_set_tcp_keepalive():
+    with socket.socket() as sock:
+        set_tcp_keepalive(sock, 7)
+        assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE)
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            assert sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE) == 7
+
+
+def test_probes_keep_session_open():
+    with NetconfSimulator() as server:
+        session = Session(socket.create_connection(("127.0.0.1", server.port)))
+        with session, Keepalive(session, interval=0.05, timeout=2) as keepalive:
+            wait_for(lambda: keepalive.probes >= 3)
+            assert not session.closed
+        assert server.rpc_count >= 3
+
+
+def test_probes_have_distinct_message_ids():
+    sock = AnsweringSock()
+    with Session(sock) as session:
+        with Keepalive(session, interval=0.05, timeout=2):
+            wait_for(lambda: len(sock.message_ids) >= 3)
+    assert len(set(sock.message_ids)) == len(sock.message_ids) >= 3
+
+
+def test_unanswered_probe_closes_session():
+    with Session(MockSock()) as session:
+        with Keepalive(session, interval=0.05, timeout=0.3) as keepalive:
+            wait_for(lambda: keepalive.probes)
+            f = session.send_rpc(TEST_RPC)
+            with pytest.raises(PeerUnreachableException):
+                f.result(timeout=5)
+            assert session.closed
+
+
+def test_silence_with_pending_rpc_closes_session():
+    with Session(MockSock()) as session:
+        with Keepalive(session, interval=0.1, timeout=0.2) as keepalive:
+            f = session.send_rpc(TEST_RPC)
+            with pytest.raises(PeerUnreachableException):
+                f.result(timeout=5)
+            assert session.closed
+            assert keepalive.probes == 0
+
+
+def test_connect_ssh_keepalive():
+    with NetconfSimulator(transport="ssh") as server:
+        with connect_ssh(
+            host="127.0.0.1", port=server.port, username="u", password="p", keepalive=5
+        ) as session:
+            sock = session.sock.sock
+            assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE)
@@ -9,6 +9,8 @@ from queue import Empty
 from lxml import etree
 import pytest
 
+from netconf_client.constants import CAP_XPATH
+from netconf_client.error import UnsupportedCapabilityException
 from netconf_client.ncclient import Manager, convert_filter, from_ele, to_ele
 
 RPC_REPLY_DATA = """
@@ -1035,14 +1037,43 @@ def test_exceptions(fake_id, log_enabled, session_exception, log_content):
     [
         (None, None),
         (("subtree", "data"), "<filter>data</filter>"),
+        (("xpath", "/a/b"), '<filter type="xpath" select="/a/b"/>'),
+        (
+            ("xpath", "/x:a[x:b='<&>']", {"x": "urn:x"}),
+            '<filter type="xpath" xmlns:x="urn:x" select="/x:a[x:b=\'&lt;&amp;&gt;\']"/>',
+        ),
         ("as-it-is", "as-it-is"),
     ],
-    ids=["None", "subtree", "pass-through"],
+    ids=["None", "subtree", "xpath", "xpath-nsmap", "pass-through"],
 )
 def test_convert_filter(inp, result):
     assert convert_filter(inp) == result
 
 
+def test_convert_filter_cached():
+    f = ("xpath", "/x:a", {"x": "urn:x"})
+    assert convert_filter(f) is convert_filter(("xpath", "/x:a", {"x": "urn:x"}))
+
+
+def test_xpath_filter(session, fake_id):
+    session.server_capabilities = [CAP_XPATH]
+    session.replies.append((RPC_REPLY_DATA, etree.fromstring(RPC_REPLY_DATA)))
+    session.replies.append(None)
+    with Manager(session, timeout=1) as mgr:
+        mgr.get_config(filter=("xpath", "/a"))
+        mgr.create_subscription(filter=("xpath", "/b"))
+    assert b'<filter type="xpath" select="/a"/>' in session.sent[0]
+    assert b'<filter type="xpath" select="/b"/>' in session.sent[1]
+
+
+def test_xpath_filter_requires_capability(session):
+    session.server_capabilities = []
+    with Manager(session, timeout=1) as mgr:
+        with pytest.raises(UnsupportedCapabilityException):
+            mgr.get(filter=("xpath", "/a"))
+    assert session.sent == []
+
+
 def test_convert_filter_unimplemented():
     caught = None
     try:
@@ -1154,6 +1185,45 @@ class MockSession:
         self.notifications.set(msg, ele)
 
 
+class MockTimedSession(MockSession):
+    def __init__(self, replies):
+        super().__init__(replies)
+        self.rpc_hooks = []
+        self.timings = []
+
+    def add_rpc_hook(self, hook):
+        self.rpc_hooks.append(hook)
+
+    def remove_rpc_hook(self, hook):
+        self.rpc_hooks.remove(hook)
+
+    def send_rpc(self, rpc, timing=None):
+        self.timings.append(timing)
+        return super().send_rpc(rpc)
+
+
+def test_rpc_hooks_build_stage(fake_id):
+    session = MockTimedSession([(RPC_REPLY_DATA, etree.fromstring(RPC_REPLY_DATA))])
+    with Manager(session) as mgr:
+        mgr.get()
+        assert session.timings == [None]
+
+        hook = object()
+        mgr.add_rpc_hook(hook)
+        assert session.rpc_hooks == [hook]
+        session.replies.append((RPC_REPLY_DATA, etree.fromstring(RPC_REPLY_DATA)))
+        mgr.get_config(source="running")
+        session.replies.append((RPC_REPLY_DATA, etree.fromstring(RPC_REPLY_DATA)))
+        mgr.dispatch("<my-rpc/>")
+        mgr.remove_rpc_hook(hook)
+        assert session.rpc_hooks == []
+
+    (timing, dispatched) = session.timings[1:]
+    assert timing.operation == "get_config"
+    assert timing.build_start <= timing.build_end
+    assert dispatched.operation == "dispatch"
+
+
 @pytest.fixture()
 def session():
     return MockSession([])
@@ -0,0 +1,133 @@
+import socket
+from concurrent.futures import TimeoutError
+from queue import Queue
+
+import pytest
+from lxml import etree
+
+from common import RPC_ERROR_WITHOUT_MSG
+
+from netconf_client.error import RpcError
+from netconf_client.metrics import MetricsRegistry, NetconfMetrics
+from netconf_client.ncclient import Manager
+from netconf_client.session import Session
+from netconf_client.simulator import NetconfSimulator
+
+
+def test_counter_and_gauge_render():
+    registry = MetricsRegistry()
+    c = registry.counter("requests_total", "Requests", ("path",))
+    c.labels("/a").inc()
+    c.labels("/a").inc(2)
+    c.labels('say "hi"\n').inc()
+    g = registry.gauge("depth", "Depth")
+    g.labels().set(4)
+
+    assert registry.render() == (
+        "# HELP requests_total Requests\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{path="/a"} 3\n'
+        'requests_total{path="say \\"hi\\"\\n"} 1\n'
+        "# HELP depth Depth\n"
+        "# TYPE depth gauge\n"
+        "depth 4\n"
+    )
+    assert registry.counter("requests_total", "Requests", ("path",)) is c
+    with pytest.raises(ValueError):
+        registry.gauge("requests_total", "Requests")
+    with pytest.raises(ValueError):
+        c.labels("/a", "extra")
+
+
+def test_histogram():
+    registry = MetricsRegistry()
+    h = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for v in (0.05, 0.1, 0.5, 3.0):
+        h.labels().observe(v)
+
+    assert registry.render().splitlines()[2:] == [
+        'latency_seconds_bucket{le="0.1"} 2',
+        'latency_seconds_bucket{le="1"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        "latency_seconds_sum 3.65",
+        "latency_seconds_count 4",
+    ]
+    [sample] = registry.snapshot()["latency_seconds"]["samples"]
+    assert sample["count"] == 4
+    assert sample["buckets"] == {0.1: 2, 1.0: 3, float("inf"): 4}
+
+
+def test_queue_depth_of_collected_session():
+    class MockSession:
+        def __init__(self):
+            self.notifications = Queue()
+
+    metrics = NetconfMetrics()
+    session = MockSession()
+    metrics.attach(session, "mock")
+    session.notifications.put(None)
+    assert metrics.registry.snapshot()["netconf_notification_queue_depth"] == {
+        "type": "gauge",
+        "samples": [{"labels": {"session": "mock"}, "value": 1}],
+    }
+    del session
+    assert "netconf_notification_queue_depth{" not in metrics.registry.render()
+
+
+def test_session_and_manager_metrics():
+    metrics = NetconfMetrics()
+    with NetconfSimulator(reply_size=1000, notification_rate=100) as server:
+        session = Session(socket.create_connection(("127.0.0.1", server.port)))
+        metrics.attach(session, "sim")
+        with Manager(session) as mgr:
+            mgr.get()
+            mgr.get()
+            mgr.create_subscription()
+            mgr.take_notification(timeout=5)
+
+    snapshot = metrics.registry.snapshot()
+
+    def value(name, **labels):
+        for sample in snapshot[name]["samples"]:
+            if sample["labels"] == dict(session="sim", **labels):
+                return sample.get("value", sample.get("count"))
+        return None
+
+    assert value("netconf_rpcs_total", operation="get", outcome="ok") == 2
+    assert value("netconf_rpcs_total", operation="create_subscription", outcome="ok")
+    assert value("netconf_rpc_duration_seconds", operation="get") == 2
+    assert value("netconf_bytes_sent_total") > 0
+    assert value("netconf_bytes_received_total") > 2000
+    assert value("netconf_messages_received_total", type="rpc-reply") >= 3
+    assert value("netconf_messages_received_total", type="notification") >= 1
+    assert 'netconf_rpcs_total{session="sim",operation="get",outcome="ok"} 2' in (
+        metrics.registry.render()
+    )
+
+
+def test_rpc_outcomes():
+    class MockSession:
+        rpc_hooks = []
+
+        def __init__(self, error):
+            self.error = error
+            self.notifications = Queue()
+
+        def send_rpc(self, rpc):
+            raise self.error
+
+    metrics = NetconfMetrics()
+    session = MockSession(
+        RpcError(RPC_ERROR_WITHOUT_MSG, etree.fromstring(RPC_ERROR_WITHOUT_MSG))
+    )
+    session_metrics = metrics.attach(session, "mock")
+    with pytest.raises(RpcError):
+        Manager(session).lock("running")
+    session.error = TimeoutError()
+    with pytest.raises(TimeoutError):
+        Manager(session).unlock("running")
+
+    assert session_metrics.parent is metrics
+    render = metrics.registry.render()
+    assert 'operation="lock",outcome="rpc_error"} 1' in render
+    assert 'operation="unlock",outcome="timeout"} 1' in render
@@ -0,0 +1,93 @@
+import socket
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from lxml import etree
+
+from common import RPC_ERROR_WITHOUT_MSG, MockSock
+
+from netconf_client.constants import DELIMITER_10
+from netconf_client.error import RpcError
+from netconf_client.ncclient import DataReply, Manager
+from netconf_client.offload import (
+    ExtractedReply,
+    ParseOffload,
+    parse_reply,
+    root_name,
+)
+from netconf_client.session import Session
+from netconf_client.simulator import NetconfSimulator
+
+TEST_RPC = b'<rpc message-id="101" xmlns="urn:ietf:params:xml:ns:netconf:base:1.0"/>'
+
+TEST_RPC_REPLY = b"""
+<rpc-reply message-id="101" xmlns="urn:ietf:params:xml:ns:netconf:base:1.0">
+  <data><x/></data>
+</rpc-reply>
+"""
+
+
+def count_interfaces(reply):
+    return len(reply.findall(".//{urn:example:simulator}interface"))
+
+
+@pytest.fixture(scope="module")
+def offload():
+    with ParseOffload(threshold=50000, max_workers=1) as offload:
+        yield offload
+
+
+def test_root_name():
+    assert root_name(b'<?xml version="1.0"?>\n<!-- x --><nc:rpc-reply/>') == (
+        "rpc-reply"
+    )
+    assert root_name(b"<notification/>") == "notification"
+    assert root_name(b"garbage") is None
+
+
+def test_parse_reply():
+    assert parse_reply(RPC_ERROR_WITHOUT_MSG) == (True, None)
+    expected = DataReply(TEST_RPC_REPLY, etree.fromstring(TEST_RPC_REPLY)).data_xml
+    assert parse_reply(TEST_RPC_REPLY) == (False, expected)
+    assert parse_reply(TEST_RPC_REPLY, len) == (False, 1)
+
+
+def test_manager_offload(offload):
+    with NetconfSimulator(reply_size=100000) as server:
+        session = Session(socket.create_connection(("127.0.0.1", server.port)))
+        with Manager(session) as mgr:
+            inline = mgr.get()
+            session.parse_offload = offload
+            offloaded = mgr.get()
+            assert offloaded.data_xml == inline.data_xml
+            assert offloaded.extracted is None
+            assert len(offloaded.data_ele) == len(inline.data_ele)
+
+            extracted = mgr.get_config(extract=count_interfaces)
+            assert extracted.data_xml is None
+            assert extracted.extracted == count_interfaces(inline.data_ele.getparent())
+
+            # Small replies are still parsed in the receive thread
+            mgr.lock("running")
+
+            with ThreadPoolExecutor(8) as pool:
+                replies = list(pool.map(lambda _: mgr.get(), range(16)))
+            assert all(r.data_xml == inline.data_xml for r in replies)
+
+
+def test_offload_rpc_error(offload):
+    padding = b" " * offload.threshold
+    s = MockSock()
+    with Session(s) as session:
+        session.parse_offload = offload
+        f = session.send_rpc(TEST_RPC, extract=len)
+        s.recvs.put(RPC_ERROR_WITHOUT_MSG + padding + DELIMITER_10)
+        with pytest.raises(RpcError) as e:
+            f.result(timeout=30)
+        assert e.value.tag == "invalid-value"
+
+        f = session.send_rpc(TEST_RPC, extract=len)
+        s.recvs.put(TEST_RPC_REPLY + padding + DELIMITER_10)
+        (raw, result) = f.result(timeout=30)
+        assert isinstance(result, ExtractedReply)
+        assert result.value == 1
@@ -0,0 +1,101 @@
+from lxml import etree
+
+from netconf_client.ncclient import DataReply
+from netconf_client.pagination import (
+    NS_LIST_PAGINATION,
+    NS_LIST_PAGINATION_NC,
+    iter_list,
+    supports_pagination,
+)
+from netconf_client.rpc import get_data
+
+PATH = "{urn:x}routes/{urn:x}route"
+
+
+class MockSession:
+    def __init__(self, capabilities):
+        self.server_capabilities = capabilities
+
+
+class MockManager:
+    """Serves a list of routes, honoring limit, offset and cursor"""
+
+    def __init__(self, count, paginate=True, annotate=False):
+        caps = [NS_LIST_PAGINATION_NC + "?module=ietf-list-pagination-nc"]
+        self.session = MockSession(caps if paginate else [])
+        self.count = count
+        self.annotate = annotate
+        self.requests = []
+
+    def get_data(self, filter=None, limit=None, offset=None, cursor=None):
+        self.requests.append((limit, offset, cursor))
+        start = offset or (int(cursor) if cursor else 0)
+        end = self.count if limit is None else min(start + limit, self.count)
+        routes = "".join(
+            "<route><prefix>10.0.{}.0/24</prefix></route>".format(i)
+            for i in range(start, end)
+        )
+        attrs = ""
+        if self.annotate:
+            attrs = ' xmlns:lp="{}" lp:remaining="{}"'.format(
+                NS_LIST_PAGINATION, self.count - end
+            )
+            if end < self.count:
+                attrs += ' lp:next="{}"'.format(end)
+        xml = (
+            '<rpc-reply xmlns="urn:ietf:params:xml:ns:netconf:base:1.0">'
+            '<data><routes xmlns="urn:x"{}>{}</routes></data>'
+            "</rpc-reply>".format(attrs, routes)
+        )
+        return DataReply(xml.encode(), etree.fromstring(xml))
+
+
+def prefixes(entries):
+    return [e.findtext("{urn:x}prefix") for e in entries]
+
+
+def test_offset_pages():
+    mgr = MockManager(25)
+    result = prefixes(iter_list(mgr, PATH, page_size=10))
+    assert result == ["10.0.{}.0/24".format(i) for i in range(25)]
+    assert mgr.requests == [(10, 0, None), (10, 10, None), (10, 20, None)]
+
+
+def test_remaining_annotation_ends_walk():
+    mgr = MockManager(20, annotate=True)
+    assert len(list(iter_list(mgr, PATH, page_size=10, prefetch=False))) == 20
+    assert len(mgr.requests) == 2
+
+
+def test_cursor_pages():
+    mgr = MockManager(25, annotate=True)
+    assert len(list(iter_list(mgr, PATH, page_size=10, cursor=True))) == 25
+    assert mgr.requests == [(10, None, None), (10, None, "10"), (10, None, "20")]
+
+
+def test_fallback_to_full_fetch():
+    mgr = MockManager(25, paginate=False)
+    assert len(list(iter_list(mgr, PATH, page_size=10))) == 25
+    assert mgr.requests == [(None, None, None)]
+
+
+def test_entries_released():
+    mgr = MockManager(3, paginate=False)
+    entries = iter_list(mgr, PATH)
+    first = next(entries)
+    routes = first.getparent()
+    next(entries)
+    assert len(routes) == 2
+
+
+def test_supports_pagination():
+    assert not supports_pagination(MockSession([]))
+    assert supports_pagination(MockManager(0).session)
+
+
+def test_get_data_pagination_parameters():
+    rpc = get_data(limit=10, offset=20, msg_id=1)
+    assert (
+        b'<list-pagination xmlns="urn:ietf:params:xml:ns:yang:ietf-list-pagination-nc">'
+        b"<limit>10</limit><offset>20</offset></list-pagination>"
+    ) in rpc
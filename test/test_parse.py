@@ -299,3 +299,12 @@ def test_not_implemented_version():
     with pytest.raises(NotImplementedError) as excinfo:
         next(g)
     assert "Unsupported message framing mode 3.19" in str(excinfo)
+
+
+def test_mode_switch_with_buffered_message():
+    # The peer may send its first chunked message right behind the hello
+    g = parse_messages(MockStream([b"Hello]]>]]>\n#3\nFoo\n##\n"]), "1.0")
+    assert next(g) == b"Hello"
+    assert g.send("1.1") == b"Foo"
+    with pytest.raises(EndOfStream):
+        next(g)
@@ -0,0 +1,132 @@
+import socket
+
+import pytest
+from lxml import etree
+
+from netconf_client.ncclient import Manager, to_ele
+from netconf_client.planner import (
+    QueryPlanner,
+    apply_subtree_filter,
+    filter_nodes,
+    merge_nodes,
+)
+from netconf_client.session import Session
+from netconf_client.simulator import NetconfSimulator
+
+DATA = """
+<data xmlns="urn:ietf:params:xml:ns:netconf:base:1.0">
+  <interfaces xmlns="urn:x">
+    <interface><name>eth0</name><mtu>1500</mtu><speed>10</speed></interface>
+    <interface><name>eth1</name><mtu>9000</mtu><speed>100</speed></interface>
+  </interfaces>
+  <system xmlns="urn:y"><hostname>r1</hostname><location>lab</location></system>
+</data>
+"""
+
+
+def merged(*filters):
+    nodes = merge_nodes([n for f in filters for n in filter_nodes(f)])
+    return "".join(etree.tostring(n).decode() for n in nodes)
+
+
+def selected(filter):
+    result = apply_subtree_filter(to_ele(DATA), filter)
+    return etree.tostring(result, method="c14n").decode()
+
+
+def test_merge_containment():
+    assert merged(
+        (
+            "subtree",
+            '<interfaces xmlns="urn:x"><interface><mtu/></interface></interfaces>',
+        ),
+        (
+            "subtree",
+            '<interfaces xmlns="urn:x"><interface><name/></interface></interfaces>',
+        ),
+    ) == ('<interfaces xmlns="urn:x"><interface><mtu/><name/></interface></interfaces>')
+
+
+def test_merge_keeps_content_match_separate():
+    eth0 = '<interfaces xmlns="urn:x"><interface><name>eth0</name></interface></interfaces>'
+    eth1 = '<interfaces xmlns="urn:x"><interface><name>eth1</name></interface></interfaces>'
+    assert merged(("subtree", eth0), ("subtree", eth1), ("subtree", eth0)) == (
+        '<interfaces xmlns="urn:x">'
+        "<interface><name>eth0</name></interface>"
+        "<interface><name>eth1</name></interface>"
+        "</interfaces>"
+    )
+
+
+def test_merge_selection_subsumes():
+    assert merged(
+        (
+            "subtree",
+            '<interfaces xmlns="urn:x"><interface><mtu/></interface></interfaces>',
+        ),
+        '<filter type="subtree"><interfaces xmlns="urn:x"/></filter>',
+    ) == ('<interfaces xmlns="urn:x"/>')
+
+
+def test_merge_rejects_xpath():
+    with pytest.raises(ValueError):
+        filter_nodes(("xpath", "/a"))
+    with pytest.raises(ValueError):
+        filter_nodes('<filter type="xpath" select="/a"/>')
+
+
+def test_apply_selection():
+    assert "<hostname>r1</hostname><location>lab</location>" in selected(
+        ("subtree", '<system xmlns="urn:y"/>')
+    )
+    assert "interfaces" not in selected(("subtree", '<system xmlns="urn:y"/>'))
+
+
+def test_apply_content_match():
+    result = selected(
+        (
+            "subtree",
+            '<interfaces xmlns="urn:x"><interface><name>eth1</name><mtu/></interface></interfaces>',
+        )
+    )
+    assert "<interface><name>eth1</name><mtu>9000</mtu></interface>" in result
+    assert "eth0" not in result
+    assert "speed" not in result
+
+
+def test_apply_content_match_only_selects_instance():
+    result = selected(
+        ("subtree", "<interfaces><interface><name>eth0</name></interface></interfaces>")
+    )
+    assert "<name>eth0</name><mtu>1500</mtu><speed>10</speed>" in result
+    assert "eth1" not in result
+
+
+def test_apply_namespace_mismatch():
+    assert "interface" not in selected(("subtree", '<interfaces xmlns="urn:z"/>'))
+
+
+def test_planner_get():
+    with NetconfSimulator(reply_size=500) as server:
+        session = Session(socket.create_connection(("127.0.0.1", server.port)))
+        with Manager(session) as mgr:
+            (eth1, names) = QueryPlanner(mgr).get(
+                [
+                    (
+                        "subtree",
+                        '<interfaces xmlns="urn:example:simulator">'
+                        "<interface><name>eth1</name></interface></interfaces>",
+                    ),
+                    (
+                        "subtree",
+                        '<interfaces xmlns="urn:example:simulator">'
+                        "<interface><name/></interface></interfaces>",
+                    ),
+                ]
+            )
+        assert server.rpc_count == 1
+    ns = {"s": "urn:example:simulator"}
+    assert eth1.data_ele.xpath("//s:interface/s:name/text()", namespaces=ns) == ["eth1"]
+    assert eth1.data_ele.xpath("//s:in-octets/text()", namespaces=ns) == ["1000003"]
+    assert len(names.data_ele.xpath("//s:name", namespaces=ns)) > 2
+    assert not names.data_ele.xpath("//s:in-octets", namespaces=ns)
@@ -0,0 +1,149 @@
+import socket
+import threading
+
+import pytest
+
+from netconf_client.error import SessionClosedException
+from netconf_client.metrics import NetconfMetrics
+from netconf_client.ncclient import Manager, Notification, to_ele
+from netconf_client.reconnect import CAP_REPLAY, ReconnectingManager, event_time
+from netconf_client.session import Session
+from netconf_client.simulator import NetconfSimulator
+
+
+def connector(server):
+    def connect():
+        return Session(socket.create_connection(("127.0.0.1", server.port)))
+
+    return connect
+
+
+def notification(when, seq):
+    xml = (
+        '<notification xmlns="urn:ietf:params:xml:ns:netconf:notification:1.0">'
+        "<eventTime>{}</eventTime><tick><seq>{}</seq></tick>"
+        "</notification>".format(when, seq)
+    )
+    return Notification(xml.encode(), to_ele(xml))
+
+
+def restart(server):
+    server.stop()
+    server.start()
+
+
+def test_reads_retried_after_reconnect():
+    metrics = NetconfMetrics()
+    with NetconfSimulator() as server:
+        with ReconnectingManager(
+            connector(server), min_delay=0.01, metrics=metrics, name="r1"
+        ) as mgr:
+            first = mgr.session_id
+            mgr.lock("running")
+            restart(server)
+            assert mgr.get_config().data_ele is not None
+            assert mgr.session_id != first
+            assert mgr.reconnects == 1
+            # The lock, taken again, then the retried read
+            assert server.rpc_count == 3
+    samples = metrics.registry.snapshot()
+    assert samples["netconf_reconnects_total"]["samples"][0]["value"] == 1
+    assert samples["netconf_reconnect_duration_seconds"]["samples"][0]["count"] == 1
+
+
+def test_writes_raise_after_reconnect():
+    with NetconfSimulator() as server:
+        with ReconnectingManager(connector(server), min_delay=0.01) as mgr:
+            restart(server)
+            with pytest.raises(SessionClosedException):
+                mgr.edit_config("<config/>")
+            mgr.edit_config("<config/>")
+            assert mgr.reconnects == 1
+
+
+def test_backoff_until_server_returns():
+    metrics = NetconfMetrics()
+    with NetconfSimulator() as server:
+        mgr = ReconnectingManager(
+            connector(server), min_delay=0.05, max_delay=0.1, metrics=metrics, name="r1"
+        )
+        server.stop()
+        restarted = threading.Timer(0.5, server.start)
+        restarted.start()
+        assert mgr.get().data_ele is not None
+        restarted.join()
+        mgr.close()
+    samples = metrics.registry.snapshot()
+    assert samples["netconf_reconnect_failures_total"]["samples"][0]["value"] >= 1
+    assert mgr.last_reconnect_duration >= 0.4
+
+
+def test_max_attempts():
+    with NetconfSimulator() as server:
+        mgr = ReconnectingManager(connector(server), min_delay=0.01, max_attempts=2)
+        server.stop()
+        with pytest.raises(ConnectionRefusedError):
+            mgr.get()
+        mgr.close()
+
+
+def test_subscription_replayed_from_last_event(monkeypatch):
+    subscriptions = []
+    create_subscription = Manager.create_subscription
+
+    def record(self, **kwds):
+        subscriptions.append(kwds)
+        return create_subscription(self, **kwds)
+
+    monkeypatch.setattr(Manager, "create_subscription", record)
+    with NetconfSimulator(notification_rate=100, capabilities=[CAP_REPLAY]) as server:
+        with ReconnectingManager(connector(server), min_delay=0.01) as mgr:
+            mgr.create_subscription(stream="NETCONF")
+            last = event_time(mgr.take_notification(timeout=5).notification_ele)
+            restart(server)
+            n = mgr.take_notification(timeout=10)
+            assert n is not None
+            assert mgr.reconnects == 1
+    assert subscriptions[0]["start_time"] is None
+    assert subscriptions[1]["stream"] == "NETCONF"
+    assert subscriptions[1]["start_time"] >= last
+
+
+def test_identical_notifications_delivered():
+    with NetconfSimulator() as server:
+        with ReconnectingManager(connector(server)) as mgr:
+            for seq in (1, 2, 1):
+                assert not mgr._is_replayed(notification("2024-01-01T00:00:00Z", seq))
+
+
+def test_replayed_notifications_dropped():
+    with NetconfSimulator(capabilities=[CAP_REPLAY]) as server:
+        with ReconnectingManager(connector(server), min_delay=0.01) as mgr:
+            mgr.create_subscription(stream="NETCONF")
+            for seq in (1, 1, 2):
+                assert not mgr._is_replayed(notification("2024-01-01T00:00:00Z", seq))
+            restart(server)
+            mgr.get()
+            assert mgr.reconnects == 1
+            # Replayed from the last eventTime: those taken are dropped
+            # once each, new ones with the same time are delivered
+            for seq in (1, 2, 1):
+                assert mgr._is_replayed(notification("2024-01-01T00:00:00Z", seq))
+            assert not mgr._is_replayed(notification("2024-01-01T00:00:00Z", 1))
+            assert not mgr._is_replayed(notification("2024-01-01T00:00:00Z", 3))
+            assert not mgr._is_replayed(notification("2024-01-01T00:00:01Z", 2))
+            assert mgr.last_event_time == "2024-01-01T00:00:01Z"
+            # The replay window is closed
+            assert not mgr._is_replayed(notification("2024-01-01T00:00:01Z", 2))
+
+
+def test_delay_for():
+    with NetconfSimulator() as server:
+        with ReconnectingManager(connector(server), min_delay=1, max_delay=5) as mgr:
+            assert 0 <= mgr.delay_for(1) <= 1
+            assert all(0 <= mgr.delay_for(10) <= 5 for _ in range(100))
+
+
+def test_metrics_require_name():
+    with pytest.raises(ValueError):
+        ReconnectingManager(lambda: None, metrics=NetconfMetrics())
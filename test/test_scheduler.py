@@ -0,0 +1,166 @@
+import socket
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from threading import Lock, Thread, current_thread
+
+import pytest
+
+from netconf_client.error import SessionClosedException
+from netconf_client.metrics import NetconfMetrics
+from netconf_client.ncclient import Manager
+from netconf_client.rpc import lock
+from netconf_client.scheduler import HIGH, LOW, NORMAL, SendScheduler
+from netconf_client.session import Session
+from netconf_client.simulator import NetconfSimulator
+
+
+def wait_for(condition):
+    while not condition():
+        time.sleep(0.001)
+
+
+def test_send_scheduler():
+    sent = []
+
+    def submit(scheduler, name, priority=NORMAL):
+        f = Future()
+        scheduler.submit(f, lambda _: sent.append((name, f)), priority)
+        return f
+
+    scheduler = SendScheduler(max_in_flight=2)
+    submit(scheduler, "a")
+    submit(scheduler, "b", LOW)
+    submit(scheduler, "c", LOW)
+    submit(scheduler, "d")
+    cancelled = submit(scheduler, "e", HIGH)
+    submit(scheduler, "f", HIGH)
+    assert [name for (name, _) in sent] == ["a", "b"]
+    assert (scheduler.in_flight, scheduler.queued) == (2, 4)
+
+    cancelled.cancel()
+    sent[0][1].set_result(None)
+    sent[1][1].set_exception(OSError())
+    wait_for(lambda: len(sent) == 4)
+    assert [name for (name, _) in sent] == ["a", "b", "f", "d"]
+    assert scheduler.in_flight == 2
+
+    assert len(scheduler.close()) == 1
+    for (_, f) in sent[2:]:
+        f.set_result(None)
+    assert (scheduler.in_flight, scheduler.queued) == (0, 0)
+    assert len(sent) == 4
+
+
+def test_queued_rpcs_not_sent_by_resolving_thread():
+    threads = []
+
+    def submit(scheduler):
+        f = Future()
+        scheduler.submit(f, lambda _: threads.append(current_thread()))
+        return f
+
+    scheduler = SendScheduler(max_in_flight=1)
+    first = submit(scheduler)
+    submit(scheduler)
+    # Stands in for the receive thread resolving the first reply
+    receiver = Thread(target=first.set_result, args=(None,))
+    receiver.start()
+    receiver.join()
+    wait_for(lambda: len(threads) == 2)
+    assert threads[0] is current_thread()
+    assert threads[1] not in (receiver, current_thread())
+    assert threads[1].name.startswith("netconf-send")
+
+
+def test_closed_scheduler_rejects_rpcs():
+    scheduler = SendScheduler(max_in_flight=1)
+    scheduler.submit(Future(), lambda _: None)
+    queued = Future()
+    scheduler.submit(queued, lambda _: None)
+    assert scheduler.close() == [queued]
+    with pytest.raises(SessionClosedException):
+        scheduler.submit(Future(), lambda _: None)
+    assert scheduler.queued == 0
+
+
+def test_priority_for():
+    scheduler = SendScheduler()
+    assert scheduler.priority_for("commit") == HIGH
+    assert scheduler.priority_for("get") == NORMAL
+    assert scheduler.priority_for(None) == NORMAL
+    assert SendScheduler(priorities={"get": LOW}).priority_for("get") == LOW
+
+
+def test_manager_priority():
+    order = []
+    order_lock = Lock()
+    metrics = NetconfMetrics()
+
+    with NetconfSimulator(reply_size=1000, latency=0.1) as server:
+        session = Session(socket.create_connection(("127.0.0.1", server.port)))
+        session.scheduler = SendScheduler(max_in_flight=1)
+        metrics.attach(session, "s")
+        with Manager(session) as mgr:
+
+            def call(name, method, priority=None):
+                if priority is None:
+                    method()
+                else:
+                    with mgr.priority(priority):
+                        method()
+                with order_lock:
+                    order.append(name)
+
+            with ThreadPoolExecutor(8) as pool:
+                pool.submit(call, "first", mgr.get)
+                wait_for(lambda: session.scheduler.in_flight)
+                reads = [pool.submit(call, "read", mgr.get) for _ in range(4)]
+                wait_for(lambda: session.scheduler.queued >= 4)
+                pool.submit(call, "bulk", mgr.get_config, LOW)
+                pool.submit(call, "lock", lambda: mgr.lock("running"))
+                pool.submit(call, "urgent", mgr.get, HIGH)
+                wait_for(lambda: session.scheduler.queued >= 7)
+                assert metrics.registry.snapshot()["netconf_send_queue_depth"][
+                    "samples"
+                ] == [{"labels": {"session": "s"}, "value": 7}]
+                for r in reads:
+                    r.result()
+            assert order == ["first", "lock", "urgent"] + ["read"] * 4 + ["bulk"]
+
+    waits = metrics.registry.render()
+    assert 'netconf_send_queue_wait_seconds_count{session="s",priority="high"} 2' in (
+        waits
+    )
+    assert 'netconf_send_queue_wait_seconds_count{session="s",priority="low"} 1' in (
+        waits
+    )
+
+
+def test_timed_out_rpc_is_not_sent():
+    with NetconfSimulator(latency=1.5) as server:
+        session = Session(socket.create_connection(("127.0.0.1", server.port)))
+        session.scheduler = SendScheduler(max_in_flight=1)
+        with Manager(session, timeout=1) as mgr:
+            busy = session.send_rpc(lock("running"))
+            with pytest.raises(TimeoutError):
+                mgr.get()
+            assert session.scheduler.queued == 1
+            busy.result(timeout=5)
+            mgr.set_rpc_timeout(5)
+            mgr.unlock("running")
+            assert server.rpc_count == 2
+            assert (session.scheduler.in_flight, session.scheduler.queued) == (0, 0)
+
+
+def test_close_fails_queued_rpcs():
+    with NetconfSimulator(latency=0.2) as server:
+        session = Session(socket.create_connection(("127.0.0.1", server.port)))
+        session.scheduler = SendScheduler(max_in_flight=1)
+        futures = [session.send_rpc(lock("running")) for _ in range(3)]
+        assert session.scheduler.queued == 2
+        session.close()
+        for f in futures:
+            with pytest.raises(SessionClosedException):
+                f.result(timeout=5)
+        with pytest.raises(SessionClosedException):
+            session.send_rpc(lock("running"))
@@ -1,3 +1,4 @@
+import socket
 from queue import Queue
 
 import pytest
@@ -5,8 +6,13 @@ import pytest
 from common import RPC_ERROR_WITHOUT_MSG
 
 from netconf_client.session import Session, frame_message_11
+from netconf_client.simulator import NetconfSimulator
 from netconf_client.constants import DEFAULT_HELLO, DELIMITER_10
-from netconf_client.error import RpcError, SessionClosedException
+from netconf_client.error import (
+    ReplyTooLargeException,
+    RpcError,
+    SessionClosedException,
+)
 
 
 SERVER_HELLO = b"""
@@ -162,3 +168,127 @@ def test_session_close_breaks_promises():
 
     with pytest.raises(SessionClosedException):
         response_f.result()
+
+
+def test_connection_loss_breaks_promises():
+    s = MockSock([SERVER_HELLO + DELIMITER_10])
+    with Session(s) as session:
+        response_f = session.send_rpc(TEST_RPC)
+        # The server closes the connection
+        s.recvs.put(b"")
+
+        with pytest.raises(SessionClosedException):
+            response_f.result(timeout=5)
+        assert session.closed
+
+
+def test_rpc_hooks():
+    timings = []
+    s = MockSock([SERVER_HELLO + DELIMITER_10])
+    with Session(s) as session:
+        f = session.send_rpc(TEST_RPC)
+        assert f.timing is None
+
+        session.add_rpc_hook(timings.append)
+        f = session.send_rpc(TEST_RPC)
+        s.recvs.put(frame_message_11(TEST_RPC_REPLY) + frame_message_11(TEST_RPC_REPLY))
+        f.result(timeout=1)
+        f2 = session.send_rpc(TEST_RPC)
+        s.recvs.put(frame_message_11(RPC_ERROR_WITHOUT_MSG))
+        with pytest.raises(RpcError):
+            f2.result(timeout=1)
+        f3 = session.send_rpc(TEST_RPC)
+        session.remove_rpc_hook(timings.append)
+        session.add_rpc_hook(timings.append)
+
+    assert len(timings) == 3
+    t = timings[0]
+    assert t is f.timing
+    assert t.operation is None and t.build_start is None
+    assert t.send_start <= t.send_end <= t.first_byte <= t.last_byte
+    assert t.last_byte <= t.parse_done <= t.resolved
+    assert t.bytes_sent == len(frame_message_11(TEST_RPC))
+    assert t.bytes_received == len(TEST_RPC_REPLY)
+    assert t.error is None
+    assert set(t.durations()) == {"send", "wait", "receive", "parse", "resolve"}
+
+    assert isinstance(timings[1].error, RpcError)
+    assert timings[2] is f3.timing
+    assert isinstance(timings[2].error, SessionClosedException)
+    assert timings[2].first_byte is None
+
+
+def test_max_reply_size():
+    reply = frame_message_11(TEST_RPC_REPLY)
+    s = MockSock([SERVER_HELLO + DELIMITER_10])
+    with Session(s) as session:
+        session.max_reply_size = len(reply)
+        f = session.send_rpc(TEST_RPC)
+        s.recvs.put(reply)
+        assert f.result(timeout=1)[0] == TEST_RPC_REPLY
+
+        progress = []
+        f = session.send_rpc(TEST_RPC, max_reply_size=100, progress=progress.append)
+        f2 = session.send_rpc(TEST_RPC)
+        for i in range(0, len(reply), 40):
+            s.recvs.put(reply[i : i + 40])
+        with pytest.raises(ReplyTooLargeException) as e:
+            f.result(timeout=1)
+        assert (e.value.limit, e.value.received) == (100, 120)
+        assert progress == [40, 80, 120]
+        with pytest.raises(SessionClosedException):
+            f2.result(timeout=1)
+        assert session.closed and s.closed
+
+
+def test_close_joins_receive_thread():
+    with NetconfSimulator() as server:
+        session = Session(socket.create_connection(("127.0.0.1", server.port)))
+        f = session.send_rpc(TEST_RPC)
+        f.result(timeout=5)
+        session.close()
+        assert not session.thread.is_alive()
+        session.close()
+
+        session = Session(socket.create_connection(("127.0.0.1", server.port)))
+        session.close(timeout=5)
+        assert server.rpc_count == 2
+        assert not session.thread.is_alive()
+
+
+def test_close_hooks():
+    closed = []
+    s = MockSock([SERVER_HELLO + DELIMITER_10])
+    with Session(s) as session:
+        session.add_close_hook(closed.append)
+        session.add_close_hook(lambda _: 1 / 0)
+        session.add_close_hook(closed.append)
+    session.close()
+    assert closed == [session, session]
+    session.add_close_hook(closed.append)
+    assert closed == [session] * 3
+
+
+def test_failed_write_closes_session():
+    class BrokenSock(MockSock):
+        def sendall(self, b):
+            if self.sent:
+                raise OSError("broken pipe")
+            super().sendall(b)
+
+    with Session(BrokenSock([SERVER_HELLO_10 + DELIMITER_10])) as session:
+        with pytest.raises(OSError):
+            session.send_rpc(TEST_RPC)
+        assert session.closed
+        assert session.rpc_reply_futures.empty()
+
+
+def test_reply_to_failed_rpc_is_dropped():
+    s = MockSock([SERVER_HELLO_10 + DELIMITER_10])
+    with Session(s) as session:
+        failed = session.send_rpc(TEST_RPC)
+        failed.set_exception(OSError())
+        f = session.send_rpc(TEST_RPC)
+        s.recvs.put(TEST_RPC_REPLY + DELIMITER_10 + TEST_RPC_REPLY + DELIMITER_10)
+        assert f.result(timeout=5)[0] == TEST_RPC_REPLY
+        assert session.thread.is_alive()
@@ -0,0 +1,59 @@
+import socket
+
+import pytest
+
+from netconf_client.connect import connect_ssh
+from netconf_client.ncclient import Manager
+from netconf_client.session import Session
+from netconf_client.simulator import NetconfSimulator, frame, make_data
+
+
+def connect_tcp(server):
+    return Session(socket.create_connection(("127.0.0.1", server.port)))
+
+
+@pytest.mark.parametrize("base11", [True, False], ids=["1.1", "1.0"])
+def test_simulator_tcp(base11):
+    with NetconfSimulator(base11=base11, reply_size=5000, chunk_size=512) as server:
+        with Manager(connect_tcp(server)) as mgr:
+            assert mgr.session.mode == ("1.1" if base11 else "1.0")
+            reply = mgr.get(filter=("subtree", "<interfaces/>"))
+            assert len(reply.data_ele[0]) > 10
+            mgr.lock("running")
+            mgr.get_config()
+        assert server.rpc_count == 3
+
+
+def test_simulator_notifications():
+    with NetconfSimulator(notification_rate=200) as server:
+        with Manager(connect_tcp(server)) as mgr:
+            mgr.create_subscription()
+            for _ in range(3):
+                n = mgr.take_notification(timeout=5)
+                assert n.notification_ele.find(
+                    "{urn:example:simulator}tick/{urn:example:simulator}seq"
+                ).text
+
+
+def test_simulator_ssh():
+    with NetconfSimulator("ssh", reply_size=100) as server:
+        with Manager(
+            connect_ssh(host="127.0.0.1", port=server.port, username="u", password="p")
+        ) as mgr:
+            assert mgr.get().data_ele is not None
+
+
+def test_simulator_requires_ssl_context():
+    with pytest.raises(ValueError):
+        NetconfSimulator("tls")
+
+
+def test_frame():
+    assert frame(b"abc", "1.0") == b"abc]]>]]>"
+    assert frame(b"abc", "1.1") == b"\n#3\nabc\n##\n"
+    assert frame(b"abcde", "1.1", chunk_size=2) == (b"\n#2\nab\n#2\ncd\n#1\ne\n##\n")
+
+
+def test_make_data():
+    assert len(make_data(10000)) >= 10000
+    assert make_data(0).startswith(b"<data")
@@ -0,0 +1,76 @@
+import socket
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Barrier
+
+import pytest
+
+from netconf_client.ncclient import Manager
+from netconf_client.rpc import get
+from netconf_client.session import Session
+from netconf_client.simulator import NetconfSimulator
+from netconf_client.singleflight import SingleFlight
+
+
+def test_key_ignores_message_id():
+    assert SingleFlight.key(get(msg_id="1")) == SingleFlight.key(get(msg_id="2"))
+    assert SingleFlight.key(get(msg_id="1")) != SingleFlight.key(
+        get(filter="<filter/>", msg_id="1")
+    )
+    assert SingleFlight.key(get(msg_id="1"), len) != SingleFlight.key(get(msg_id="1"))
+
+
+def test_submit():
+    sent = []
+
+    def send():
+        f = Future()
+        sent.append(f)
+        return f
+
+    flight = SingleFlight()
+    first = flight.submit("k", send)
+    second = flight.submit("k", send)
+    other = flight.submit("other", send)
+    assert first is second and first is not other
+    assert len(sent) == 2 and flight.hits == 1
+
+    sent[0].set_exception(ValueError())
+    with pytest.raises(ValueError):
+        second.result()
+    assert not flight.submit("k", send).done()
+    assert len(sent) == 3
+
+    def fail():
+        raise OSError()
+
+    with pytest.raises(OSError):
+        flight.submit("failing", fail)
+    assert flight.submit("failing", send) is not None
+
+
+@pytest.mark.parametrize("single_flight", [True, False])
+def test_manager_single_flight(single_flight):
+    callers = 12
+    barrier = Barrier(callers)
+
+    with NetconfSimulator(reply_size=1000, latency=0.3) as server:
+        session = Session(socket.create_connection(("127.0.0.1", server.port)))
+        with Manager(session, single_flight=single_flight) as mgr:
+
+            def read(_):
+                barrier.wait()
+                return mgr.get(filter="<filter/>")
+
+            with ThreadPoolExecutor(callers) as pool:
+                replies = list(pool.map(read, range(callers)))
+            assert len({r.data_xml for r in replies}) == 1
+            if single_flight:
+                assert server.rpc_count == 1
+                assert mgr.single_flight.hits == callers - 1
+            else:
+                assert server.rpc_count == callers
+
+            # Once answered, the same request is sent again
+            mgr.get(filter="<filter/>")
+            mgr.lock("running")
+            assert server.rpc_count == (3 if single_flight else callers + 2)
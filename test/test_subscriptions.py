@@ -0,0 +1,174 @@
+import pytest
+
+from common import SERVER_HELLO, AnsweringSock, rpc_reply
+
+from netconf_client.error import UnsupportedCapabilityException
+from netconf_client.ncclient import Manager, to_ele
+from netconf_client.rpc import establish_subscription, modify_subscription
+from netconf_client.session import Session
+from netconf_client.subscriptions import SubscriptionRouter, decode
+
+NS_YP = "urn:ietf:params:xml:ns:yang:ietf-yang-push"
+NS_SN = "urn:ietf:params:xml:ns:yang:ietf-subscribed-notifications"
+
+
+def notification(body):
+    return (
+        '<notification xmlns="urn:ietf:params:xml:ns:netconf:notification:1.0">'
+        "<eventTime>2024-01-01T00:00:00Z</eventTime>{}</notification>".format(body)
+    ).encode()
+
+
+def push_update(id, value):
+    return notification(
+        '<push-update xmlns="{}"><id>{}</id><datastore-contents>'
+        '<counter xmlns="urn:x">{}</counter>'
+        "</datastore-contents></push-update>".format(NS_YP, id, value)
+    )
+
+
+class PublisherSock(AnsweringSock):
+    """Answers <establish-subscription> with the next ID, followed
+    immediately by a first push-update, and any other RPC with <ok/>"""
+
+    def __init__(self, hello=SERVER_HELLO):
+        super().__init__(hello)
+        self.next_id = 7
+
+    def answer(self, message_id, rpc):
+        if b"establish-subscription" in rpc:
+            id = self.next_id
+            self.next_id += 1
+            body = '<id xmlns="{}">{}</id>'.format(NS_SN, id).encode()
+            self.push(rpc_reply(message_id, body))
+            self.push(push_update(id, 0))
+        else:
+            super().answer(message_id, rpc)
+
+
+def test_establish_subscription_rpc():
+    rpc = establish_subscription(
+        datastore="ds:operational",
+        datastore_filter=("xpath", "/x:a", {"x": "urn:x"}),
+        period=500,
+        msg_id=1,
+    )
+    assert (
+        b'<yp:datastore>ds:operational</yp:datastore><yp:datastore-xpath-filter xmlns:x="urn:x">'
+        b"/x:a</yp:datastore-xpath-filter><yp:periodic><yp:period>500</yp:period></yp:periodic>"
+    ) in rpc
+    rpc = establish_subscription(
+        datastore="ds:running", on_change=True, dampening_period=10, msg_id=1
+    )
+    assert (
+        b"<yp:on-change><yp:dampening-period>10</yp:dampening-period></yp:on-change>"
+        in rpc
+    )
+    assert b"<id>7</id><yp:periodic><yp:period>100</yp:period>" in (
+        modify_subscription(7, period=100, msg_id=1)
+    )
+    rpc = establish_subscription(
+        stream="NETCONF",
+        stream_filter=("xpath", "/x:a", {"x": "urn:x?a=b&c=d"}),
+        msg_id=1,
+    )
+    (xpath_filter,) = to_ele(rpc).iter("{*}stream-xpath-filter")
+    assert xpath_filter.nsmap["x"] == "urn:x?a=b&c=d"
+
+
+def test_decode():
+    n = decode(b"", to_ele(push_update(3, 42)))
+    assert (n.kind, n.id, n.event_time) == ("push-update", 3, "2024-01-01T00:00:00Z")
+    assert n.content[0].text == "42"
+    terminated = notification(
+        '<subscription-terminated xmlns="{}"><id>3</id>'
+        "<reason>no-such-subscription</reason></subscription-terminated>".format(NS_SN)
+    )
+    assert decode(b"", to_ele(terminated)).kind == "subscription-terminated"
+    assert decode(b"", to_ele(notification("<other/>"))) is None
+
+
+def test_routing_by_subscription_id():
+    sock = PublisherSock()
+    with Manager(Session(sock)) as mgr:
+        router = SubscriptionRouter(mgr.session)
+        first = router.establish(mgr, datastore="ds:operational", period=100)
+        second = router.establish(mgr, datastore="ds:operational", on_change=True)
+        assert (first.id, second.id) == (7, 8)
+        sock.push(push_update(8, 1))
+        sock.push(push_update(7, 2))
+        sock.push(notification("<other/>"))
+        assert [first.take(timeout=5).content[0].text for _ in range(2)] == ["0", "2"]
+        assert [second.take(timeout=5).content[0].text for _ in range(2)] == ["0", "1"]
+        assert mgr.take_notification(timeout=5) is not None
+
+        sock.push(
+            notification(
+                '<subscription-terminated xmlns="{}"><id>7</id>'
+                "<reason>filter-unavailable</reason>"
+                "</subscription-terminated>".format(NS_SN)
+            )
+        )
+        assert [n.kind for n in first] == ["subscription-terminated"]
+        assert first.terminated
+        router.delete(mgr, second)
+        assert b"<delete-subscription" in sock.sent[-1]
+        assert second.terminated
+
+
+def test_subscription_completed():
+    sock = PublisherSock()
+    with Manager(Session(sock)) as mgr:
+        router = SubscriptionRouter(mgr.session)
+        subscription = router.establish(
+            mgr,
+            datastore="ds:operational",
+            period=100,
+            stop_time="2024-01-02T00:00:00Z",
+        )
+        sock.push(
+            notification(
+                '<subscription-completed xmlns="{}"><id>7</id>'
+                "</subscription-completed>".format(NS_SN)
+            )
+        )
+        assert [n.kind for n in subscription] == [
+            "push-update",
+            "subscription-completed",
+        ]
+        assert subscription.terminated
+        assert not router._subscriptions
+
+
+def hello_with_features(features):
+    return SERVER_HELLO.replace(
+        b"</capabilities>",
+        "<capability>{}?module=ietf-subscribed-notifications&amp;features={}"
+        "</capability></capabilities>".format(NS_SN, features).encode(),
+    )
+
+
+def test_xpath_filter_requires_feature():
+    sock = PublisherSock(hello_with_features("replay,configured"))
+    with Manager(Session(sock)) as mgr:
+        with pytest.raises(UnsupportedCapabilityException):
+            mgr.establish_subscription(
+                datastore="ds:operational", datastore_filter=("xpath", "/a")
+            )
+        with pytest.raises(UnsupportedCapabilityException):
+            mgr.establish_subscription(stream="NETCONF", stream_filter=("xpath", "/a"))
+        with pytest.raises(UnsupportedCapabilityException):
+            mgr.modify_subscription(7, datastore_filter=("xpath", "/a"))
+    assert not any(b"subscription" in b for b in sock.sent)
+
+
+def test_xpath_filter_allowed():
+    # With the feature, or when the module is only in the YANG library
+    for hello in (hello_with_features("replay,xpath"), SERVER_HELLO):
+        with Manager(Session(PublisherSock(hello))) as mgr:
+            assert (
+                mgr.establish_subscription(
+                    stream="NETCONF", stream_filter=("xpath", "/a")
+                )
+                == 7
+            )
@@ -0,0 +1,106 @@
+from concurrent.futures import Future, TimeoutError
+from queue import Queue
+
+import pytest
+
+from netconf_client.metrics import NetconfMetrics
+from netconf_client.ncclient import Manager
+from netconf_client.timeouts import (
+    SOURCE_ADAPTIVE,
+    SOURCE_CEILING,
+    SOURCE_DEFAULT,
+    SOURCE_FLOOR,
+    AdaptiveTimeout,
+)
+
+
+class MockSession:
+    rpc_hooks = []
+
+    def __init__(self):
+        self.notifications = Queue()
+        self.reply = None
+
+    def send_rpc(self, rpc):
+        f = Future()
+        if self.reply is not None:
+            f.set_result((self.reply, None))
+        return f
+
+
+def test_adaptive_timeout():
+    adaptive = AdaptiveTimeout(multiplier=2, floor=1, ceiling=30, min_samples=10)
+    for _ in range(9):
+        adaptive.observe("get", 4.0)
+    assert adaptive.timeout_for("get", 120) == (120, SOURCE_DEFAULT)
+    adaptive.observe("get", 5.0)
+    assert adaptive.observed("get") == 5.0
+    assert adaptive.timeout_for("get", 120) == (10.0, SOURCE_ADAPTIVE)
+    assert adaptive.timeout_for("lock", 120) == (120, SOURCE_DEFAULT)
+
+    for _ in range(10):
+        adaptive.observe("lock", 0.01)
+        adaptive.observe("get_config", 100)
+    assert adaptive.timeout_for("lock", 120) == (1, SOURCE_FLOOR)
+    assert adaptive.timeout_for("get_config", 120) == (30, SOURCE_CEILING)
+
+
+def test_percentile_of_window():
+    adaptive = AdaptiveTimeout(percentile=0.9, window=10, min_samples=1)
+    for duration in range(1, 21):
+        adaptive.observe("get", float(duration))
+    # Only 11..20 are kept, and 19 is their 90th percentile
+    assert adaptive.observed("get") == 19.0
+
+
+def test_manager_adaptive_timeout():
+    session = MockSession()
+    metrics = NetconfMetrics()
+    metrics.attach(session, "mock")
+    adaptive = AdaptiveTimeout(multiplier=1, floor=1, min_samples=1)
+    mgr = Manager(session, timeout=1, adaptive_timeout=adaptive)
+
+    # No samples yet: the static timeout applies, and a timeout is
+    # counted but not recorded as a sample
+    with pytest.raises(TimeoutError):
+        mgr.lock("running")
+    assert adaptive.observed("lock") is None
+    assert adaptive.timeouts("lock") == 1
+
+    session.reply = b"<rpc-reply/>"
+    for _ in range(2):
+        mgr.unlock("running")
+    assert adaptive.observed("unlock") < 1
+    assert adaptive.timeout_for("unlock", 120)[1] == SOURCE_FLOOR
+
+    render = metrics.registry.render()
+    assert (
+        'netconf_rpc_timeout_decisions_total{session="mock",operation="lock",'
+        'source="default"} 1'
+    ) in render
+    assert (
+        'netconf_rpc_timeout_decisions_total{session="mock",operation="unlock",'
+        'source="floor"} 1'
+    ) in render
+    assert 'netconf_rpc_timeout_seconds{session="mock",operation="lock"} 1' in render
+
+
+def test_timeouts_do_not_raise_deadline():
+    session = MockSession()
+    adaptive = AdaptiveTimeout(multiplier=2, floor=0.01, min_samples=1)
+    adaptive.observe("get", 0.01)
+    mgr = Manager(session, timeout=120, adaptive_timeout=adaptive)
+    for _ in range(12):
+        with pytest.raises(TimeoutError):
+            mgr.get()
+    assert adaptive.timeouts("get") == 12
+    assert adaptive.observed("get") == 0.01
+    assert adaptive.timeout_for("get", 120) == (0.02, SOURCE_ADAPTIVE)
+
+
+def test_explicit_timeout_is_not_adapted():
+    session = MockSession()
+    adaptive = AdaptiveTimeout(min_samples=1)
+    with pytest.raises(TimeoutError):
+        Manager(session, adaptive_timeout=adaptive).get(timeout=1)
+    assert adaptive.observed("get") is None
@@ -0,0 +1,128 @@
+import pytest
+from lxml import etree
+
+from common import RPC_ERROR_WITHOUT_MSG
+
+from netconf_client import tracing
+from netconf_client.connect import connect_ssh
+from netconf_client.error import RpcError
+from netconf_client.ncclient import Manager
+from netconf_client.simulator import NetconfSimulator
+from netconf_client.tracing import Span, Tracer, message_id, trace_context
+
+
+TRACEPARENT = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+
+class RecordingSpan(Span):
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.exceptions = []
+        self.ended = False
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_exception(self, exception):
+        self.exceptions.append(exception)
+
+    def end(self):
+        self.ended = True
+
+    def traceparent(self):
+        return TRACEPARENT
+
+
+class RecordingTracer(Tracer):
+    enabled = True
+
+    def __init__(self, propagate=False):
+        self.propagate = propagate
+        self.spans = []
+
+    def start_span(self, name, attributes=None):
+        span = RecordingSpan(name, attributes)
+        self.spans.append(span)
+        return span
+
+    def named(self, name):
+        return [s for s in self.spans if s.name == name]
+
+
+@pytest.fixture
+def tracer():
+    tracer = RecordingTracer(propagate=True)
+    tracing.set_tracer(tracer)
+    yield tracer
+    tracing.set_tracer(None)
+
+
+def test_noop_tracer_by_default():
+    assert tracing.get_tracer() is tracing.NOOP_TRACER
+    with tracing.get_tracer().start_span("netconf.rpc") as span:
+        assert span.traceparent() is None
+
+
+def test_message_id():
+    assert trace_context(message_id()) is None
+    msg_id = message_id(RecordingSpan("netconf.rpc", None))
+    assert trace_context(msg_id) == TRACEPARENT
+    assert msg_id != message_id(RecordingSpan("netconf.rpc", None))
+
+
+def test_trace_session(tracer):
+    with NetconfSimulator("ssh", reply_size=500, notification_rate=100) as server:
+        session = connect_ssh(
+            host="127.0.0.1", port=server.port, username="u", password="p"
+        )
+        with Manager(session) as mgr:
+            raw = mgr.get().raw_reply
+            mgr.create_subscription()
+            mgr.take_notification(timeout=5)
+
+    [connect] = tracer.named("netconf.connect")
+    assert connect.ended and not connect.exceptions
+    assert connect.attributes[tracing.ATTR_TRANSPORT] == "ssh"
+    assert connect.attributes[tracing.ATTR_TARGET] == "127.0.0.1:{}".format(server.port)
+    session_id = connect.attributes[tracing.ATTR_SESSION_ID]
+
+    [hello] = tracer.named("netconf.hello")
+    assert hello.ended
+    assert hello.attributes[tracing.ATTR_SESSION_ID] == session_id
+
+    rpc = tracer.named("netconf.rpc")[0]
+    assert rpc.ended
+    assert rpc.attributes[tracing.ATTR_OPERATION] == "get"
+    assert rpc.attributes[tracing.ATTR_TARGET].startswith("127.0.0.1:")
+    assert rpc.attributes[tracing.ATTR_BYTES_RECEIVED] == len(raw)
+    assert rpc.attributes[tracing.ATTR_BYTES_SENT] > 0
+    msg_id = rpc.attributes[tracing.ATTR_MESSAGE_ID]
+    assert trace_context(msg_id) == TRACEPARENT
+    assert 'message-id="{}"'.format(msg_id).encode() in raw
+
+    notification = tracer.named("netconf.notification")[0]
+    assert notification.ended
+    assert notification.attributes[tracing.ATTR_SESSION_ID] == session_id
+
+
+def test_trace_rpc_error(tracer):
+    error = RpcError(RPC_ERROR_WITHOUT_MSG, etree.fromstring(RPC_ERROR_WITHOUT_MSG))
+
+    class MockSession:
+        def __init__(self):
+            self.tracer = tracer
+
+        def send_rpc(self, rpc):
+            raise error
+
+    tracer.propagate = False
+    with pytest.raises(RpcError):
+        Manager(MockSession()).lock("running")
+
+    [span] = tracer.named("netconf.rpc")
+    assert span.ended
+    assert span.exceptions == [error]
+    assert span.attributes[tracing.ATTR_OPERATION] == "lock"
+    assert span.attributes[tracing.ATTR_ERROR_TAG] == error.tag
+    assert trace_context(span.attributes[tracing.ATTR_MESSAGE_ID]) is None